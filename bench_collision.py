@@ -0,0 +1,40 @@
+import sys
+import time
+from bench_physics import make_objects
+from cle_lang import CleParser
+from collision import SpatialHash, auto_cell_size
+from physics import ArrayPhysicsEngine, np
+
+def load_objects(source):
+    if source.isdigit():
+        return make_objects(int(source))
+    parser = CleParser()
+    parser.parse_file(source)
+    return list(parser.get_objects().values())
+
+def main(source="10000", factors=(0.5, 1.0, 2.0, 4.0)):
+    objects = load_objects(source)
+    base = auto_cell_size(objects)
+    engine = None
+    if np is not None:
+        engine = ArrayPhysicsEngine(collisions=False)
+        for obj in objects:
+            engine.add_object(obj)
+    print(f"{len(objects)} bodies, auto cell size {base:.1f}")
+    print(f"{'cell':>8} {'pairs':>8} {'hash ms':>9} {'grid ms':>9}")
+    for factor in factors:
+        cell_size = base * factor
+        start = time.perf_counter()
+        pairs = SpatialHash(cell_size).pairs(objects)
+        hashed = (time.perf_counter() - start) * 1000
+        grid = ""
+        if engine is not None and factor >= 1.0:
+            start = time.perf_counter()
+            engine._find_pairs(cell_size)
+            grid = f"{(time.perf_counter() - start) * 1000:.2f}"
+        print(f"{cell_size:>8.1f} {len(pairs):>8} {hashed:>9.2f} {grid:>9}")
+    if engine is not None:
+        engine.clear()
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,73 @@
+import random
+import sys
+import time
+from physics import PhysicsEngine, ArrayPhysicsEngine, PHYSICS_STEP
+from sceneSet import SceneObject
+
+SIZES = (1_000, 10_000, 100_000)
+COLLIDING_SIZES = (1_000, 10_000)
+STEPS = 12
+SHAPES = ("cube", "sphere", "cylinder")
+
+def make_objects(count, seed=0):
+    rng = random.Random(seed)
+    objects = []
+    for i in range(count):
+        obj = SceneObject(f"obj{i}", "cube", (rng.uniform(-6000, 6000), rng.uniform(0, 2000), rng.uniform(-5000, 5000)), (1, 1, 1))
+        obj.velocity = (rng.uniform(-500, 500), rng.uniform(-100, 100), rng.uniform(-500, 500))
+        objects.append(obj)
+    return objects
+
+def make_pile(count, seed=0):
+    rng = random.Random(seed)
+    spread = int(count ** 0.5) * 70
+    objects = [SceneObject("floor", "plane", (0, 0, 0), (spread / 50, 1, spread / 50))]
+    for i in range(count):
+        obj = SceneObject(f"obj{i}", SHAPES[i % 3], (rng.uniform(-spread, spread), rng.uniform(0, 1500), rng.uniform(-spread, spread)), (1, 1, 1))
+        obj.velocity = (rng.uniform(-200, 200), 0, rng.uniform(-200, 200))
+        objects.append(obj)
+    return objects
+
+def time_engine(engine, objects, steps):
+    for obj in objects:
+        engine.add_object(obj)
+    engine._step(PHYSICS_STEP)
+    start = time.perf_counter()
+    for _ in range(steps):
+        engine._step(PHYSICS_STEP)
+    return (time.perf_counter() - start) / steps
+
+def time_settled(engine, count, steps):
+    for i in range(count):
+        engine.add_object(SceneObject(f"obj{i}", "cube", (i % 100 * 100 - 5000, 0, i // 100 * 100), (1, 1, 1)))
+    for _ in range(engine.sleep_steps + 1):
+        engine._step(PHYSICS_STEP)
+    start = time.perf_counter()
+    for _ in range(steps):
+        engine._step(PHYSICS_STEP)
+    return (time.perf_counter() - start) / steps, engine.awake_count
+
+def main(sizes=SIZES):
+    print(f"{'bodies':>8} {'python ms/step':>15} {'numpy ms/step':>14} {'speedup':>8}")
+    for count in sizes:
+        loop = time_engine(PhysicsEngine(collisions=False), make_objects(count), STEPS)
+        arrays = time_engine(ArrayPhysicsEngine(collisions=False), make_objects(count), STEPS)
+        print(f"{count:>8} {loop * 1000:>15.3f} {arrays * 1000:>14.3f} {loop / arrays:>7.1f}x")
+    print()
+    print(f"{'settled':>8} {'python ms/step':>15} {'numpy ms/step':>14} {'awake':>8}")
+    for count in sizes:
+        loop, _ = time_settled(PhysicsEngine(collisions=False), count, STEPS)
+        arrays, awake = time_settled(ArrayPhysicsEngine(collisions=False), count, STEPS)
+        print(f"{count:>8} {loop * 1000:>15.4f} {arrays * 1000:>14.4f} {awake:>8}")
+    print()
+    print(f"{'pile':>8} {'python ms/step':>15} {'numpy ms/step':>14} {'speedup':>8} {'contacts':>9}")
+    for count in sizes:
+        if count not in COLLIDING_SIZES:
+            continue
+        loop = time_engine(PhysicsEngine(), make_pile(count), STEPS)
+        engine = ArrayPhysicsEngine()
+        arrays = time_engine(engine, make_pile(count), STEPS)
+        print(f"{count:>8} {loop * 1000:>15.3f} {arrays * 1000:>14.3f} {loop / arrays:>7.1f}x {engine.collisions.stats.contacts:>9}")
+
+if __name__ == "__main__":
+    main(tuple(int(a) for a in sys.argv[1:]) or SIZES)
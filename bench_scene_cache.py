@@ -0,0 +1,83 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from cle_lang import CleParser, default_workers
+from scene_cache import SceneCache, cache_path
+from scene_store import ObjectHandle, SceneStore
+
+SIZES = (10000, 100000, 500000)
+TYPES = ("cube", "sphere", "cylinder", "plane", "light")
+
+def write_scene(path, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for i in range(count):
+            f.write(f"CREATE obj{i} TYPE {rng.choice(TYPES)} POSITION {rng.uniform(-6000, 6000):.2f} {rng.uniform(0, 2000):.2f} {rng.uniform(-5000, 5000):.2f} "
+                    f"SCALE {rng.uniform(0.2, 3):.2f} {rng.uniform(0.2, 3):.2f} {rng.uniform(0.2, 3):.2f} "
+                    f"COLOR {rng.random():.3f} {rng.random():.3f} {rng.random():.3f} MATERIAL mat{i % 16}\n")
+
+def time_load(path, use_cache, workers=1):
+    parser = CleParser(use_cache=use_cache, workers=workers, parallel_min_bytes=0)
+    start = time.perf_counter()
+    count = sum(1 for _ in parser.iter_file(path))
+    return time.perf_counter() - start, count, parser.cache_hit
+
+def time_open(path):
+    start = time.perf_counter()
+    with SceneCache(cache_path(path)) as cache:
+        count = cache.count
+    return time.perf_counter() - start, count
+
+def time_store(path):
+    parser = CleParser(workers=1)
+    start = time.perf_counter()
+    with parser.read_columns(path) as columns:
+        objects = ObjectHandle.from_columns(columns, SceneStore())
+    return time.perf_counter() - start, len(objects)
+
+def time_columns(path, workers):
+    parser = CleParser(use_cache=False, workers=workers, parallel_min_bytes=0)
+    start = time.perf_counter()
+    with parser.read_columns(path):
+        pass
+    return time.perf_counter() - start
+
+def scaling(path, counts):
+    times = [time_columns(path, workers) for workers in counts]
+    return "".join(f" {t * 1000:>9.1f} {times[0] / t:>5.2f}x" for t in times)
+
+def bench(path):
+    text, count, _ = time_load(path, False)
+    parallel, _, _ = time_load(path, False, max(2, default_workers()))
+    if os.path.exists(cache_path(path)):
+        os.remove(cache_path(path))
+    build, _, _ = time_load(path, True)
+    cached, _, hit = time_load(path, True)
+    columns, _ = time_open(path)
+    store, _ = time_store(path)
+    size = os.path.getsize(cache_path(path)) / 1e6
+    print(f"{count:>8} {text * 1000:>9.1f} {parallel * 1000:>13.1f} {build * 1000:>10.1f} {cached * 1000:>10.1f} {columns * 1000:>11.2f} {store * 1000:>9.1f} {text / cached:>7.1f}x {size:>8.1f}{'' if hit else ' (miss)'}")
+
+def main(sources=SIZES):
+    print(f"{'records':>8} {'text ms':>9} {'parallel ms':>13} {'build ms':>10} {'cache ms':>10} {'columns ms':>11} {'store ms':>9} {'speedup':>8} {'cache MB':>8}")
+    counts = sorted({1, 2, 4, default_workers()})
+    rows = []
+    for source in sources:
+        if os.path.exists(str(source)):
+            bench(str(source))
+            rows.append(f"{source:>8}" + scaling(str(source), counts))
+            continue
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "bench.cle")
+            write_scene(path, int(source))
+            bench(path)
+            rows.append(f"{source:>8}" + scaling(path, counts))
+    print(f"\nparse scaling, {default_workers()} cores available")
+    print(f"{'records':>8}" + "".join(f" {f'{workers} proc ms':>9} {'':>6}" for workers in counts))
+    for row in rows:
+        print(row)
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or SIZES)
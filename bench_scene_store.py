@@ -0,0 +1,74 @@
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from sceneSet import SceneObject
+from physics import create_physics_engine
+
+COUNTS = (10000, 100000)
+TYPES = ("cube", "sphere", "cylinder", "plane", "light")
+
+class DictSceneObject:
+    def __init__(self, name, obj_type, position, scale, color=(1.0, 1.0, 1.0), texture=None, material="default", emissive=0.0):
+        self.body = None
+        self.slot = None
+        self.physics = None
+        self.sleeping = False
+        self.rest_steps = 0
+        self.name = name
+        self.type = obj_type
+        self._position = position
+        self.scale = scale
+        self.color = color
+        self.texture = texture
+        self.material = material
+        self.emissive = emissive
+        self._velocity = (0.0, 0.0, 0.0)
+        self.texture_id = None
+
+def make_records(count, seed=0):
+    rng = random.Random(seed)
+    return [(f"obj{i}", rng.choice(TYPES), (rng.uniform(-6000, 6000), rng.uniform(0, 2000), rng.uniform(-5000, 5000)),
+             (rng.uniform(0.2, 3), rng.uniform(0.2, 3), rng.uniform(0.2, 3)), (rng.random(), rng.random(), rng.random()),
+             None, f"mat{i % 16}", 0.0) for i in range(count)]
+
+def build(create, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = make_records(count)
+    start = time.perf_counter()
+    objects = create(records)
+    elapsed = time.perf_counter() - start
+    del records
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return objects, used / count, elapsed * 1e6 / count
+
+def measure(count):
+    reference, dict_bytes, dict_create = build(lambda records: [DictSceneObject(*record) for record in records], count)
+    del reference
+    objects, used, elapsed = build(lambda records: [SceneObject(*record) for record in records], count)
+    for obj in objects:
+        obj.release()
+    objects, _, bulk = build(lambda records: list(SceneObject.from_records(records).values()), count)
+    physics = create_physics_engine("python")
+    for obj in objects[:10000]:
+        physics.add_object(obj)
+    start = time.perf_counter()
+    physics.update(1 / 60)
+    step = time.perf_counter() - start
+    print(f"{count:>8} {dict_bytes:>11.0f} {used:>12.0f} {dict_create:>12.2f} {elapsed:>13.2f} {bulk:>12.2f} {step * 1000:>12.1f}")
+    physics.clear()
+    for obj in objects:
+        obj.release()
+
+def main(counts=COUNTS):
+    print(f"{'objects':>8} {'dict bytes':>11} {'store bytes':>12} {'dict create':>12} {'store create':>13} {'bulk create':>12} {'10k step ms':>12}")
+    for count in counts:
+        measure(int(count))
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or COUNTS)
@@ -0,0 +1,67 @@
+import sys
+import time
+import numpy as np
+from bvh import BVH, ray_boxes
+
+def make_scene(count, seed=1):
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack((rng.uniform(-5000, 5000, count), rng.uniform(0, 2000, count), rng.uniform(-5000, 5000, count)))
+    halves = np.repeat(rng.uniform(5, 50, (count, 1)), 3, axis=1)
+    return centers, halves
+
+def brute_ray(origin, direction, centers, halves):
+    inverse = 1.0 / np.where(np.abs(direction) < 1e-12, 1e-12, direction)
+    near, far = ray_boxes(origin, inverse, centers - halves, centers + halves)
+    near[near > far] = np.inf
+    i = int(np.argmin(near))
+    return (i, float(near[i])) if np.isfinite(near[i]) else (-1, np.inf)
+
+def brute_within(point, radius, centers):
+    offset = centers - point
+    return np.flatnonzero(np.einsum("ij,ij->i", offset, offset) <= radius * radius)
+
+def brute_box(lo, hi, centers):
+    return np.flatnonzero(np.all((centers >= lo) & (centers <= hi), axis=1))
+
+def brute_nearest(point, k, centers):
+    offset = centers - point
+    distances = np.einsum("ij,ij->i", offset, offset)
+    chosen = np.argpartition(distances, k - 1)[:k]
+    return chosen[np.argsort(distances[chosen], kind="stable")]
+
+def timed(function, queries):
+    start = time.perf_counter()
+    results = [function(*query) for query in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+def main(count="100000", queries="200"):
+    count, queries = int(count), int(queries)
+    centers, halves = make_scene(count)
+    start = time.perf_counter()
+    bvh = BVH(centers, halves)
+    print(f"{count} objects, BVH built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    rng = np.random.default_rng(2)
+    points = np.column_stack((rng.uniform(-5000, 5000, queries), rng.uniform(0, 2000, queries), rng.uniform(-5000, 5000, queries)))
+    origins = points + rng.normal(0, 1, (queries, 3)) * 3000
+    directions = points - origins
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    cases = (
+        ("ray", [(o, d, centers, halves) for o, d in zip(origins, directions)], bvh.ray, brute_ray),
+        ("radius 200", [(p, 200.0, centers) for p in points], bvh.within, brute_within),
+        ("box 400", [(p - 200, p + 200, centers) for p in points], bvh.in_box, brute_box),
+        ("10-nearest", [(p, 10, centers) for p in points], bvh.nearest, brute_nearest),
+    )
+    print(f"{'query':>12} {'bvh ms':>9} {'brute ms':>9} {'speedup':>8} {'match':>6}")
+    for name, arguments, indexed, brute in cases:
+        indexed_ms, indexed_results = timed(indexed, arguments)
+        brute_ms, brute_results = timed(brute, arguments)
+        if name == "ray":
+            match = all(a[0] == b[0] or abs(a[1] - b[1]) < 1e-9 for a, b in zip(indexed_results, brute_results))
+        elif name == "10-nearest":
+            match = all(np.array_equal(a, b) for a, b in zip(indexed_results, brute_results))
+        else:
+            match = all(np.array_equal(np.sort(a), b) for a, b in zip(indexed_results, brute_results))
+        print(f"{name:>12} {indexed_ms:>9.3f} {brute_ms:>9.3f} {brute_ms / indexed_ms:>7.1f}x {'yes' if match else 'NO':>6}")
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import gl_stub
+gl_stub.install()
+
+from benchmarks.cases import CASES, FRAMES
+from benchmarks.scenes import parse_mix, write_scene
+from physics import np
+
+DEFAULT_SIZES = "1000,10000"
+DEFAULT_THRESHOLD = 0.10
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"{'case':<44} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<44} {'-':>12} {current['best'] * 1000:>12.3f} {'new':>7}")
+            continue
+        ratio = current["best"] / previous["best"] if previous["best"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<44} {previous['best'] * 1000:>12.3f} {current['best'] * 1000:>12.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="CleEngine benchmark suite (runs against a stub GL).")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated object counts")
+    parser.add_argument("--mix", default="", help="type weights, e.g. cube=4,sphere=2,light=1")
+    parser.add_argument("--cases", default=",".join(CASES), help="subset of " + ",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=FRAMES, help="physics updates / draw calls per sample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    mix = parse_mix(args.mix)
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    for case in cases:
+        if case not in CASES:
+            parser.error(f"unknown case {case}")
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            path = write_scene(os.path.join(folder, f"bench{size}.cle"), size, mix, args.seed)
+            for case in cases:
+                start = time.perf_counter()
+                found = CASES[case](path, size, args.repeat, args.frames)
+                results.update(found)
+                print(f"{case} {size}: {len(found)} results in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "numpy": np.__version__ if np is not None else None,
+                 "sizes": sizes, "mix": mix, "repeat": args.repeat, "frames": args.frames, "seed": args.seed},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import gc
+import os
+import statistics
+import time
+from cle_lang import CleParser
+from physics import create_physics_engine, np
+from scene_cache import cache_path
+from scene_store import ObjectHandle, SceneStore
+
+PHYSICS_DTS = (1 / 240, 1 / 120, 1 / 60, 1 / 30)
+PYTHON_PHYSICS_LIMIT = 2000
+FRAMES = 5
+
+def measure(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        fn(state) if setup else fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summary(samples, items=None, frames=1, **extra):
+    best = min(samples) / frames
+    result = {"best": best, "median": statistics.median(samples) / frames, "repeat": len(samples)}
+    if items:
+        result["items"] = items
+        result["per_item_us"] = best / items * 1e6
+    result.update(extra)
+    return result
+
+def bench_parse(path, size, repeat, frames):
+    parser = CleParser(use_cache=False, workers=1)
+    return {f"parse/{size}": summary(measure(lambda: parser.parse_file(path), repeat), size)}
+
+def bench_physics(path, size, repeat, frames):
+    records = list(CleParser(use_cache=False, workers=1).iter_file(path))
+    backends = ["numpy"] if np is not None else []
+    if size <= PYTHON_PHYSICS_LIMIT or not backends:
+        backends.insert(0, "python")
+    results = {}
+    for backend in backends:
+        for dt in PHYSICS_DTS:
+            def setup():
+                store = SceneStore()
+                physics = create_physics_engine(backend)
+                for record in records:
+                    physics.add_object(ObjectHandle(*record[:8], store=store))
+                physics.update(dt)
+                return physics
+            def run(physics):
+                for _ in range(frames):
+                    physics.update(dt)
+            results[f"physics/{backend}/dt={dt:.4f}/{size}"] = summary(measure(run, repeat, setup), size, frames)
+    return results
+
+def bench_load(path, size, repeat, frames):
+    import engine
+    def cold():
+        if os.path.exists(cache_path(path)):
+            os.remove(cache_path(path))
+        engine.build_scene(path)
+    results = {f"load/cold/{size}": summary(measure(cold, repeat), size)}
+    results[f"load/cached/{size}"] = summary(measure(lambda: engine.build_scene(path), repeat), size)
+    return results
+
+def bench_draw(path, size, repeat, frames):
+    import engine
+    from renderer import RenderEngine
+    from OpenGL import recorder
+    engine.build_scene(path)
+    scene = engine.scene_renderer
+    camera = RenderEngine(scene)
+    results = {}
+    for mode, instancing in (("instanced", True), ("immediate", False)):
+        scene.use_instancing = instancing
+        scene.draw_scene(camera.width, camera.height, camera=camera)
+        def run():
+            for _ in range(frames):
+                scene.draw_scene(camera.width, camera.height, camera=camera)
+        recorder.reset()
+        samples = measure(run, repeat)
+        calls = recorder.total / (repeat * frames)
+        results[f"draw/{mode}/{size}"] = summary(samples, size, frames, gl_calls=calls, visible=scene.visible_count)
+    scene.use_instancing = True
+    return results
+
+CASES = {"parse": bench_parse, "physics": bench_physics, "load": bench_load, "draw": bench_draw}
@@ -0,0 +1,79 @@
+import glob
+import os
+import re
+import sys
+import types
+
+GL_NAME = re.compile(r"\b(?:glut|glu|gl)[A-Z]\w*|\b(?:GLUT|GLU|GL)_\w+")
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class GLRecorder:
+    def __init__(self):
+        self.counts = {}
+        self.next_id = 1
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts = {}
+
+    def new_ids(self, count=1):
+        first = self.next_id
+        self.next_id += count
+        return first if count == 1 else list(range(first, first + count))
+
+    def call(self, name):
+        results = {
+            "glGenBuffers": self.new_ids, "glGenTextures": self.new_ids, "glGenLists": self.new_ids,
+            "compileShader": lambda *args: self.new_ids(), "compileProgram": lambda *args: self.new_ids(),
+        }
+        result = results.get(name)
+        def record(*args, **kwargs):
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if result is not None:
+                return result(*args[:1]) if name.startswith("glGen") else result(*args)
+            if name == "glIsEnabled":
+                return False
+            if name in ("glGetUniformLocation", "glGetAttribLocation", "glGetError"):
+                return 0
+            return None
+        record.__name__ = name
+        return record
+
+def gl_names(root=SOURCE_ROOT):
+    names = set()
+    for path in glob.glob(os.path.join(root, "*.py")):
+        with open(path, encoding="utf-8") as f:
+            names.update(GL_NAME.findall(f.read()))
+    return names
+
+def _module(name, recorder, names):
+    module = types.ModuleType(name)
+    for index, symbol in enumerate(sorted(names)):
+        setattr(module, symbol, recorder.call(symbol) if symbol[0].islower() else 0x10000 + index)
+    def missing(symbol):
+        if symbol.startswith("__"):
+            raise AttributeError(symbol)
+        return recorder.call(symbol)
+    module.__getattr__ = missing
+    return module
+
+def install(recorder=None):
+    if "OpenGL" in sys.modules and not getattr(sys.modules["OpenGL"], "stub", False):
+        raise RuntimeError("the GL stub must be installed before OpenGL is imported")
+    recorder = recorder or GLRecorder()
+    names = gl_names()
+    package = types.ModuleType("OpenGL")
+    package.stub = True
+    package.recorder = recorder
+    package.__path__ = []
+    gl = _module("OpenGL.GL", recorder, [n for n in names if n.startswith(("gl", "GL_")) and not n.startswith(("glu", "glut", "GLU", "GLUT"))])
+    gl.__path__ = []
+    gl.shaders = _module("OpenGL.GL.shaders", recorder, ["compileShader", "compileProgram"])
+    glu = _module("OpenGL.GLU", recorder, [n for n in names if n.startswith(("glu", "GLU_")) and not n.startswith(("glut", "GLUT"))])
+    glut = _module("OpenGL.GLUT", recorder, [n for n in names if n.startswith(("glut", "GLUT_"))])
+    package.GL, package.GLU, package.GLUT = gl, glu, glut
+    sys.modules.update({"OpenGL": package, "OpenGL.GL": gl, "OpenGL.GL.shaders": gl.shaders, "OpenGL.GLU": glu, "OpenGL.GLUT": glut})
+    return recorder
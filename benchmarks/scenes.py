@@ -0,0 +1,35 @@
+import random
+
+DEFAULT_MIX = {"cube": 4, "sphere": 3, "cylinder": 2, "plane": 1, "light": 1}
+WORLD_SPREAD = (6000.0, 2000.0, 5000.0)
+
+def parse_mix(text):
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight) if weight else 1.0
+    return mix
+
+def scene_lines(count, mix=None, seed=0, spread=WORLD_SPREAD, textures=()):
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    sx, sy, sz = spread
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        line = (f"CREATE obj{i} TYPE {kind} POSITION {rng.uniform(-sx, sx):.2f} {rng.uniform(0, sy):.2f} {rng.uniform(-sz, sz):.2f} "
+                f"SCALE {rng.uniform(0.2, 3):.2f} {rng.uniform(0.2, 3):.2f} {rng.uniform(0.2, 3):.2f} "
+                f"COLOR {rng.random():.3f} {rng.random():.3f} {rng.random():.3f} MATERIAL mat{i % 16}")
+        if kind == "light":
+            line += f" EMISSIVE {rng.random():.2f}"
+        if textures and rng.random() < 0.1:
+            line += f" TEXTURE {rng.choice(textures)}"
+        yield line + "\n"
+
+def write_scene(path, count, mix=None, seed=0, spread=WORLD_SPREAD, textures=()):
+    with open(path, 'w') as f:
+        f.writelines(scene_lines(count, mix, seed, spread, textures))
+    return path
@@ -0,0 +1,307 @@
+import numpy as np
+
+LEAF_SIZE = 8
+START_DEPTH = 8
+DESCEND_LEVELS = 2
+MORTON_BITS = 10
+REBUILD_GROWTH = 2.0
+
+def _spread_bits(values):
+    values = values.astype(np.uint64) & 0x3FF
+    values = (values | (values << 16)) & 0x030000FF
+    values = (values | (values << 8)) & 0x0300F00F
+    values = (values | (values << 4)) & 0x030C30C3
+    values = (values | (values << 2)) & 0x09249249
+    return values
+
+def morton_codes(centers, lo, span):
+    cells = np.clip((centers - lo) / span * ((1 << MORTON_BITS) - 1), 0, (1 << MORTON_BITS) - 1).astype(np.uint64)
+    return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1) | (_spread_bits(cells[:, 2]) << 2)
+
+def _ranges(order, starts, ends):
+    counts = ends - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    step = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return order[np.repeat(starts, counts) + step]
+
+def boxes_outside(lo, hi, planes):
+    normals = planes[:, :3]
+    positive = normals > 0
+    far = np.where(positive[None], hi[:, None, :], lo[:, None, :])
+    return np.any(np.einsum("kpj,pj->kp", far, normals) + planes[:, 3] < 0, axis=1)
+
+def boxes_inside(lo, hi, planes):
+    normals = planes[:, :3]
+    positive = normals > 0
+    near = np.where(positive[None], lo[:, None, :], hi[:, None, :])
+    return np.all(np.einsum("kpj,pj->kp", near, normals) + planes[:, 3] >= 0, axis=1)
+
+def ray_boxes(origin, inverse, lo, hi):
+    t1 = (lo - origin) * inverse
+    t2 = (hi - origin) * inverse
+    near = np.maximum(np.minimum(t1, t2).max(axis=1), 0.0)
+    return near, np.maximum(t1, t2).min(axis=1)
+
+def box_distances(point, lo, hi):
+    gap = np.maximum(np.maximum(lo - point, point - hi), 0.0)
+    return np.einsum("ij,ij->i", gap, gap)
+
+def corner_distances(point, lo, hi):
+    span = np.maximum(np.abs(lo - point), np.abs(hi - point))
+    return np.einsum("ij,ij->i", span, span)
+
+class BVH:
+    def __init__(self, centers, halves, leaf_size=LEAF_SIZE):
+        count = len(centers)
+        self.count = count
+        self.leaf_size = leaf_size
+        self.order = np.empty(0, dtype=np.int64)
+        self.codes = np.empty(0, dtype=np.uint64)
+        if count:
+            self.code_lo = centers.min(axis=0)
+            self.code_span = np.maximum(centers.max(axis=0) - self.code_lo, 1e-9)
+            codes = morton_codes(centers, self.code_lo, self.code_span)
+            self.order = np.argsort(codes, kind="stable")
+            self.codes = codes[self.order]
+        leaves = 1
+        while leaves * leaf_size < count:
+            leaves *= 2
+        self.leaf_count = leaves
+        self.first_leaf = leaves - 1
+        self.depth = leaves.bit_length() - 1
+        nodes = 2 * leaves - 1
+        self.start = np.empty(nodes, dtype=np.int64)
+        self.end = np.empty(nodes, dtype=np.int64)
+        leaf_starts = np.minimum(np.arange(leaves) * leaf_size, count)
+        self.start[self.first_leaf:] = leaf_starts
+        self.end[self.first_leaf:] = np.minimum(leaf_starts + leaf_size, count)
+        self.levels = []
+        level = np.arange(self.first_leaf, nodes)
+        while len(level) > 1:
+            parents = (level[::2] - 1) // 2
+            self.start[parents] = self.start[level[::2]]
+            self.end[parents] = self.end[level[1::2]]
+            self.levels.append(parents)
+            level = parents
+        self.leaf_of = np.empty(count, dtype=np.int64)
+        self.leaf_of[self.order] = self.first_leaf + np.arange(count) // leaf_size
+        self.lo = np.full((nodes, 3), np.inf)
+        self.hi = np.full((nodes, 3), -np.inf)
+        self.refit(centers, halves)
+        self.built_volume = self.leaf_volume()
+
+    def refit(self, centers, halves, moved=None):
+        if self.count == 0:
+            return
+        if moved is not None:
+            leaves = np.unique(self.leaf_of[moved])
+            if len(leaves) * 4 > self.leaf_count:
+                moved = None
+        if moved is None:
+            self._refit_all(centers, halves)
+            return
+        leaves = leaves[self.start[leaves] < self.end[leaves]]
+        members = _ranges(self.order, self.start[leaves], self.end[leaves])
+        offsets = np.concatenate(([0], np.cumsum(self.end[leaves] - self.start[leaves])[:-1]))
+        self.lo[leaves] = np.minimum.reduceat(centers[members] - halves[members], offsets)
+        self.hi[leaves] = np.maximum.reduceat(centers[members] + halves[members], offsets)
+        nodes = leaves
+        for _ in self.levels:
+            nodes = np.unique((nodes - 1) // 2)
+            left, right = 2 * nodes + 1, 2 * nodes + 2
+            self.lo[nodes] = np.minimum(self.lo[left], self.lo[right])
+            self.hi[nodes] = np.maximum(self.hi[left], self.hi[right])
+
+    def _refit_all(self, centers, halves):
+        filled = -(-self.count // self.leaf_size)
+        leaves = slice(self.first_leaf, self.first_leaf + filled)
+        starts = self.start[leaves]
+        ordered = centers[self.order]
+        extent = halves[self.order]
+        self.lo[leaves] = np.minimum.reduceat(ordered - extent, starts)
+        self.hi[leaves] = np.maximum.reduceat(ordered + extent, starts)
+        for level in self.levels:
+            first, last = int(level[0]), int(level[-1]) + 1
+            self.lo[first:last] = np.minimum(self.lo[2 * first + 1:2 * last:2], self.lo[2 * first + 2:2 * last + 1:2])
+            self.hi[first:last] = np.maximum(self.hi[2 * first + 1:2 * last:2], self.hi[2 * first + 2:2 * last + 1:2])
+
+    def leaf_volume(self):
+        leaves = slice(self.first_leaf, None)
+        size = np.maximum(self.hi[leaves] - self.lo[leaves], 0)
+        return float(np.prod(size, axis=1).sum())
+
+    def degraded(self):
+        return self.leaf_volume() > self.built_volume * REBUILD_GROWTH + 1e-9
+
+    def _roots(self):
+        if self.count == 0:
+            return np.empty(0, dtype=np.int64)
+        first = (1 << min(START_DEPTH, self.depth)) - 1
+        return np.arange(first, 2 * first + 1)
+
+    def _children(self, nodes):
+        if not len(nodes):
+            return nodes
+        depth = int(nodes[0] + 1).bit_length() - 1
+        width = 1 << min(DESCEND_LEVELS, self.depth - depth)
+        return (((nodes + 1) * width - 1)[:, None] + np.arange(width)).ravel()
+
+    def frustum_mask(self, planes, centers, halves):
+        planes = np.asarray(planes, dtype=np.float64)
+        mask = np.zeros(self.count, dtype=bool)
+        frontier = self._roots()
+        while len(frontier):
+            frontier = frontier[self.start[frontier] < self.end[frontier]]
+            lo, hi = self.lo[frontier], self.hi[frontier]
+            keep = ~boxes_outside(lo, hi, planes)
+            frontier, lo, hi = frontier[keep], lo[keep], hi[keep]
+            inside = boxes_inside(lo, hi, planes)
+            whole = frontier[inside]
+            mask[_ranges(self.order, self.start[whole], self.end[whole])] = True
+            partial = frontier[~inside]
+            leaves = partial[partial >= self.first_leaf]
+            if len(leaves):
+                members = _ranges(self.order, self.start[leaves], self.end[leaves])
+                c, h = centers[members], halves[members]
+                mask[members[~boxes_outside(c - h, c + h, planes)]] = True
+            inner = partial[partial < self.first_leaf]
+            frontier = self._children(inner)
+        return mask
+
+    def ray(self, origin, direction, centers, halves, max_distance=np.inf):
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        inverse = 1.0 / np.where(np.abs(direction) < 1e-12, 1e-12, direction)
+        best, best_t = -1, max_distance
+        frontier = self._roots()
+        while len(frontier):
+            frontier = frontier[self.start[frontier] < self.end[frontier]]
+            near, far = ray_boxes(origin, inverse, self.lo[frontier], self.hi[frontier])
+            frontier = frontier[(near <= far) & (near < best_t)]
+            leaves = frontier[frontier >= self.first_leaf]
+            if len(leaves):
+                members = _ranges(self.order, self.start[leaves], self.end[leaves])
+                c, h = centers[members], halves[members]
+                near, far = ray_boxes(origin, inverse, c - h, c + h)
+                near[near > far] = np.inf
+                i = int(np.argmin(near))
+                if near[i] < best_t:
+                    best, best_t = int(members[i]), float(near[i])
+            inner = frontier[frontier < self.first_leaf]
+            frontier = self._children(inner)
+        return best, best_t
+
+    def _collect(self, centers, node_outside, node_inside, member_inside):
+        found = []
+        frontier = self._roots()
+        while len(frontier):
+            frontier = frontier[self.start[frontier] < self.end[frontier]]
+            lo, hi = self.lo[frontier], self.hi[frontier]
+            keep = ~node_outside(lo, hi)
+            frontier, lo, hi = frontier[keep], lo[keep], hi[keep]
+            inside = node_inside(lo, hi)
+            whole = frontier[inside]
+            found.append(_ranges(self.order, self.start[whole], self.end[whole]))
+            partial = frontier[~inside]
+            leaves = partial[partial >= self.first_leaf]
+            if len(leaves):
+                members = _ranges(self.order, self.start[leaves], self.end[leaves])
+                found.append(members[member_inside(centers[members])])
+            inner = partial[partial < self.first_leaf]
+            frontier = self._children(inner)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def within(self, point, radius, centers):
+        point = np.asarray(point, dtype=np.float64)
+        limit = radius * radius
+        return self._collect(centers, lambda lo, hi: box_distances(point, lo, hi) > limit,
+                             lambda lo, hi: corner_distances(point, lo, hi) <= limit,
+                             lambda c: np.einsum("ij,ij->i", c - point, c - point) <= limit)
+
+    def in_box(self, lo, hi, centers):
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        return self._collect(centers, lambda a, b: np.any((b < lo) | (a > hi), axis=1),
+                             lambda a, b: np.all((a >= lo) & (b <= hi), axis=1),
+                             lambda c: np.all((c >= lo) & (c <= hi), axis=1))
+
+    def nearest(self, point, k, centers):
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, self.count)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        at = int(np.searchsorted(self.codes, morton_codes(point[None], self.code_lo, self.code_span)[0]))
+        first = max(0, min(at - k, self.count - 2 * k))
+        seed = self.order[first:first + 2 * k]
+        offset = centers[seed] - point
+        bound = np.partition(np.einsum("ij,ij->i", offset, offset), k - 1)[k - 1]
+        candidates = self.within(point, np.sqrt(bound) * (1 + 1e-9), centers)
+        offset = centers[candidates] - point
+        distances = np.einsum("ij,ij->i", offset, offset)
+        chosen = np.argpartition(distances, k - 1)[:k]
+        return candidates[chosen[np.argsort(distances[chosen], kind="stable")]]
+
+class SpatialIndex:
+    def __init__(self, reader_factory):
+        self.reader_factory = reader_factory
+        self.objects = []
+        self.bvh = None
+        self.reader = None
+        self.centers = None
+        self.halves = None
+        self.index = {}
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self.objects = []
+
+    def refresh(self, objects):
+        if self.bvh is None:
+            return
+        rows = [self.index[obj] for obj in objects if obj in self.index]
+        for row in rows:
+            self.halves[row] = max(self.objects[row].scale) * 50
+        if rows:
+            self.bvh.refit(self.centers, self.halves, np.array(rows))
+
+    def sync(self, objects, positions=None):
+        if objects != self.objects:
+            self._rebuild(objects, positions)
+            return
+        centers = self.reader.read(positions)
+        moved = np.flatnonzero(np.any(centers != self.centers, axis=1))
+        if len(moved):
+            self.centers = centers
+            self.bvh.refit(centers, self.halves, moved)
+            if self.bvh.degraded():
+                self._rebuild(objects, positions)
+
+    def pick(self, origin, direction, max_distance=np.inf):
+        index, distance = self.bvh.ray(origin, direction, self.centers, self.halves, max_distance)
+        return (self.objects[index], distance) if index >= 0 else (None, None)
+
+    def within(self, point, radius):
+        return [self.objects[i] for i in self.bvh.within(point, radius, self.centers).tolist()]
+
+    def in_box(self, lo, hi):
+        return [self.objects[i] for i in self.bvh.in_box(lo, hi, self.centers).tolist()]
+
+    def nearest(self, point, k=1):
+        return [self.objects[i] for i in self.bvh.nearest(point, k, self.centers).tolist()]
+
+    def _rebuild(self, objects, positions):
+        self.objects = list(objects)
+        self.index = {obj: i for i, obj in enumerate(self.objects)}
+        self.reader = self.reader_factory(self.objects)
+        self.centers = self.reader.read(positions)
+        sizes = np.array([max(o.scale) * 50 for o in self.objects], dtype=np.float64).reshape(-1, 1)
+        self.halves = np.repeat(sizes, 3, axis=1)
+        self.bvh = BVH(self.centers, self.halves)
+        self.rebuilds += 1
+
+class FrustumCuller(SpatialIndex):
+    def visible(self, objects, planes, positions=None):
+        self.sync(objects, positions)
+        return self.bvh.frustum_mask(planes, self.centers, self.halves)
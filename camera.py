@@ -0,0 +1,84 @@
+import math
+
+FIELD_OF_VIEW = 45.0
+NEAR_PLANE = 0.1
+FAR_PLANE = 10000.0
+ORTHO_VIEW_SIZE = 1000
+ORTHO_DEPTH = 10000
+
+def _multiply(a, b):
+    return [[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+
+def _translation(x, y, z):
+    return [[1, 0, 0, x], [0, 1, 0, y], [0, 0, 1, z], [0, 0, 0, 1]]
+
+def _rotation_x(degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    return [[1, 0, 0, 0], [0, c, -s, 0], [0, s, c, 0], [0, 0, 0, 1]]
+
+def _rotation_y(degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    return [[c, 0, s, 0], [0, 1, 0, 0], [-s, 0, c, 0], [0, 0, 0, 1]]
+
+def _inverse(m):
+    rows = [list(map(float, row)) + [1.0 if i == j else 0.0 for j in range(4)] for i, row in enumerate(m)]
+    for col in range(4):
+        pivot = max(range(col, 4), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = rows[col][col]
+        rows[col] = [v / scale for v in rows[col]]
+        for r in range(4):
+            if r != col and rows[r][col]:
+                factor = rows[r][col]
+                rows[r] = [v - factor * p for v, p in zip(rows[r], rows[col])]
+    return [row[4:] for row in rows]
+
+def _transform_point(m, x, y, z):
+    out = [m[i][0] * x + m[i][1] * y + m[i][2] * z + m[i][3] for i in range(4)]
+    return out[0] / out[3], out[1] / out[3], out[2] / out[3]
+
+def aspect_ratio(camera):
+    return camera.width / camera.height if camera.height != 0 else 1
+
+def view_matrix(camera):
+    view = _translation(-camera.camera_pos_x, -camera.camera_pos_y, -camera.camera_distance - camera.camera_pos_z)
+    view = _multiply(view, _rotation_x(camera.camera_rot_x))
+    return _multiply(view, _rotation_y(camera.camera_rot_y))
+
+def projection_matrix(camera):
+    aspect = aspect_ratio(camera)
+    if camera.ortho_mode:
+        right = ORTHO_VIEW_SIZE * aspect
+        top = ORTHO_VIEW_SIZE
+        return [[1 / right, 0, 0, 0], [0, 1 / top, 0, 0], [0, 0, -1 / ORTHO_DEPTH, 0], [0, 0, 0, 1]]
+    f = 1 / math.tan(math.radians(FIELD_OF_VIEW) / 2)
+    near, far = NEAR_PLANE, FAR_PLANE
+    return [[f / aspect, 0, 0, 0], [0, f, 0, 0],
+            [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)], [0, 0, -1, 0]]
+
+def view_projection(camera):
+    return _multiply(projection_matrix(camera), view_matrix(camera))
+
+def frustum_planes(camera):
+    m = view_projection(camera)
+    planes = []
+    for row, sign in ((0, 1), (0, -1), (1, 1), (1, -1), (2, 1), (2, -1)):
+        plane = [m[3][j] + sign * m[row][j] for j in range(4)]
+        length = math.sqrt(plane[0] ** 2 + plane[1] ** 2 + plane[2] ** 2)
+        planes.append([v / length for v in plane])
+    return planes
+
+def pixel_scale(camera):
+    if camera.ortho_mode:
+        return camera.height / (2 * ORTHO_VIEW_SIZE)
+    return camera.height / (2 * math.tan(math.radians(FIELD_OF_VIEW) / 2))
+
+def pick_ray(camera, x, y):
+    inverse = _inverse(view_projection(camera))
+    nx = 2.0 * x / camera.width - 1.0
+    ny = 1.0 - 2.0 * y / camera.height
+    near = _transform_point(inverse, nx, ny, -1.0)
+    far = _transform_point(inverse, nx, ny, 1.0)
+    direction = [f - n for f, n in zip(far, near)]
+    length = math.sqrt(sum(d * d for d in direction)) or 1.0
+    return near, tuple(d / length for d in direction)
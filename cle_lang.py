@@ -1,41 +1,221 @@
-from sceneSet import SceneObject
+from collections import namedtuple
+from array import array
+from scene_cache import CacheWriter, cache_path, new_hasher, open_cache, source_stamp
 import math
+import multiprocessing
+import os
+
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+CHUNK_BYTES = 2 * 1024 * 1024
+CHUNKS_PER_WORKER = 4
+
+CleRecord = namedtuple("CleRecord", "name type position scale color texture material emissive line")
+CleError = namedtuple("CleError", "line message text")
+
+def _numbers(parts, start, count, field):
+    values = parts[start:start + count]
+    if len(values) < count:
+        raise ValueError(f"{field} expects {count} numbers")
+    try:
+        return tuple(map(float, values))
+    except ValueError:
+        raise ValueError(f"{field} has a non-numeric value: {' '.join(values)}")
+
+def _vector(values):
+    return " ".join(repr(float(v)) for v in values)
+
+def format_record(record):
+    line = (f"CREATE {record.name} TYPE {record.type} POSITION {_vector(record.position)} "
+            f"SCALE {_vector(record.scale)} COLOR {_vector(record.color)}")
+    if record.texture:
+        line += f" TEXTURE {record.texture}"
+    return f"{line} MATERIAL {record.material} EMISSIVE {float(record.emissive)!r}"
+
+def read_chunks(path, chunk_bytes=CHUNK_BYTES, hasher=None):
+    rest = b""
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_bytes), b""):
+            if hasher is not None:
+                hasher.update(data)
+            if rest:
+                data = rest + data
+            cut = data.rfind(b"\n") + 1
+            rest = data[cut:]
+            if cut:
+                yield data[:cut]
+    if rest:
+        yield rest
+
+def parse_chunk(data):
+    parser = CleParser(use_cache=False)
+    columns = CacheWriter()
+    columns.extend(parser.parse_block(data))
+    columns.line_count = parser.lines_read
+    return columns, [tuple(error) for error in parser.errors], parser.bytes_read
+
+def default_workers():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
 class CleParser:
-    def __init__(self):
+    def __init__(self, use_cache=True, workers=None, parallel_min_bytes=PARALLEL_MIN_BYTES, store=None):
+        self.use_cache = use_cache
+        self.store = store
+        self.workers = workers
+        self.parallel_min_bytes = parallel_min_bytes
+        self.parallel = False
+        self.cache_hit = False
         self.objects = {}
+        self.errors = []
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.total_bytes = 0
 
     def parse_file(self, filepath):
-        with open(filepath, 'r') as f:
-            for line in f:
-                self.parse_line(line)
+        from sceneSet import SceneObject
+        with self.read_columns(filepath) as columns:
+            self.objects = SceneObject.from_columns(columns, self.store)
+
+    def iter_file(self, filepath, progress=None):
+        cache = self._open_cache(filepath, progress)
+        if cache is not None:
+            with cache:
+                yield from cache.records(CleRecord)
+            return
+        for records, part in self._iter_blocks(filepath, progress, CacheWriter() if self.use_cache else None):
+            yield from part.records(CleRecord) if records is None else records
+
+    def read_columns(self, filepath, progress=None):
+        cache = self._open_cache(filepath, progress)
+        if cache is not None:
+            return cache
+        columns = CacheWriter()
+        for _ in self._iter_blocks(filepath, progress, columns):
+            pass
+        return columns
+
+    def _open_cache(self, filepath, progress):
+        self.errors = []
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.total_bytes = os.path.getsize(filepath)
+        self.cache_hit = False
+        self.parallel = False
+        cache = open_cache(filepath) if self.use_cache else None
+        if cache is None:
+            return None
+        self.cache_hit = True
+        self.errors = cache.errors(CleError)
+        self.lines_read = cache.line_count
+        self.bytes_read = self.total_bytes
+        if progress:
+            progress(self.bytes_read, self.total_bytes, self.lines_read)
+        return cache
 
-    def parse_line(self, line):
+    def _iter_blocks(self, filepath, progress, columns):
+        stamp = source_stamp(filepath)
+        hasher = new_hasher() if self.use_cache else None
+        workers = self.workers or default_workers()
+        if workers > 1 and self.total_bytes >= self.parallel_min_bytes:
+            self.parallel = True
+            blocks = self._iter_parallel(filepath, workers, progress, hasher)
+        else:
+            blocks = self._iter_serial(filepath, progress, hasher)
+        for records, part in blocks:
+            if columns is not None:
+                if part is None:
+                    columns.extend(records)
+                else:
+                    columns.merge(part)
+            yield records, part
+        if progress:
+            progress(self.bytes_read, self.total_bytes, self.lines_read)
+        if columns is not None:
+            columns.line_count = self.lines_read
+        if self.use_cache:
+            try:
+                columns.write(cache_path(filepath), stamp, hasher.digest(), self.errors)
+            except OSError as e:
+                print(f"Warning: could not write scene cache for {filepath}: {e}")
+
+    def _iter_serial(self, filepath, progress, hasher=None):
+        for data in read_chunks(filepath, CHUNK_BYTES, hasher):
+            yield self.parse_block(data), None
+            if progress:
+                progress(self.bytes_read, self.total_bytes, self.lines_read)
+
+    def _iter_parallel(self, filepath, workers, progress, hasher=None):
+        chunk_bytes = max(CHUNK_BYTES, self.total_bytes // (workers * CHUNKS_PER_WORKER) + 1)
+        try:
+            pool = multiprocessing.Pool(max(1, min(workers, math.ceil(self.total_bytes / chunk_bytes))))
+        except OSError as e:
+            print(f"Warning: parallel parsing unavailable ({e}), parsing {filepath} serially")
+            self.parallel = False
+            yield from self._iter_serial(filepath, progress, hasher)
+            return
+        with pool:
+            for part, errors, size in pool.imap(parse_chunk, read_chunks(filepath, chunk_bytes, hasher)):
+                offset = self.lines_read
+                if offset:
+                    part.lines = array('I', [line + offset for line in part.lines])
+                self.errors.extend(CleError(line + offset, message, text) for line, message, text in errors)
+                self.lines_read += part.line_count
+                self.bytes_read += size
+                yield None, part
+                if progress:
+                    progress(self.bytes_read, self.total_bytes, self.lines_read)
+
+    def parse_block(self, data):
+        lines = data.split(b"\n")
+        if lines and not lines[-1]:
+            lines.pop()
+        records = []
+        for raw in lines:
+            self.lines_read += 1
+            record = self.parse_raw(raw, self.lines_read)
+            if record is not None:
+                records.append(record)
+        self.bytes_read += len(data)
+        return records
+
+    def parse_raw(self, raw, line_number=0):
+        try:
+            return self.parse_line(raw.decode('utf-8'), line_number)
+        except (ValueError, UnicodeDecodeError) as e:
+            self.errors.append(CleError(line_number, str(e), raw.decode('utf-8', 'replace').strip()))
+            return None
+
+    def parse_line(self, line, line_number=0):
         line = line.strip()
         if not line or line.startswith("#"):
-            return
+            return None
         parts = line.split()
         if parts[0].upper() == "CREATE":
-            self.parse_create_command(parts[1:])
+            return self.parse_create_command(parts[1:], line_number)
+        raise ValueError(f"unknown command {parts[0]}")
+
+    def parse_create_command(self, parts, line_number=0):
+        if len(parts) < 11:
+            raise ValueError("CREATE expects <name> TYPE <type> POSITION <x> <y> <z> SCALE <sx> <sy> <sz>")
+        for index, keyword in ((1, "TYPE"), (3, "POSITION"), (7, "SCALE")):
+            if parts[index].upper() != keyword:
+                raise ValueError(f"expected {keyword}, got {parts[index]}")
 
-    def parse_create_command(self, parts):
-        if len(parts) < 8:
-            return
-        
         name = parts[0]
         obj_type = parts[2]
-        pos = tuple(map(float, parts[4:7]))
-        scale = tuple(map(float, parts[8:11]))
-        
+        pos = _numbers(parts, 4, 3, "POSITION")
+        scale = _numbers(parts, 8, 3, "SCALE")
+
         color = (1.0, 1.0, 1.0)
         texture = None
         material = "default"
         emissive = 0.0
-        
+
         i = 11
         while i < len(parts):
             if parts[i].upper() == "COLOR" and i + 3 < len(parts):
-                color = tuple(map(float, parts[i+1:i+4]))
+                color = _numbers(parts, i + 1, 3, "COLOR")
                 i += 4
             elif parts[i].upper() == "TEXTURE" and i + 1 < len(parts):
                 texture = parts[i+1]
@@ -44,13 +224,12 @@ class CleParser:
                 material = parts[i+1]
                 i += 2
             elif parts[i].upper() == "EMISSIVE" and i + 1 < len(parts):
-                emissive = float(parts[i+1])
+                emissive = _numbers(parts, i + 1, 1, "EMISSIVE")[0]
                 i += 2
             else:
                 i += 1
-        
-        obj = SceneObject(name, obj_type, pos, scale, color, texture, material, emissive)
-        self.objects[name] = obj
+
+        return CleRecord(name, obj_type, pos, scale, color, texture, material, emissive, line_number)
 
     def get_objects(self):
         return self.objects
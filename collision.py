@@ -0,0 +1,607 @@
+import math
+import time
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SPHERE = 0
+BOX = 1
+CYLINDER = 2
+NON_SOLID_TYPES = ("light",)
+STATIC_TYPES = ("plane",)
+DEFAULT_RESTITUTION = 0.2
+SOLVER_ITERATIONS = 4
+WAKE_SPEED = 30.0
+CELL_BIAS = 1 << 19
+CELL_SPAN = 1 << 20
+HALF_NEIGHBOURS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)]
+
+def body_size(obj):
+    return max(obj.scale) * 100
+
+def is_solid(obj):
+    return obj.type.lower() not in NON_SOLID_TYPES
+
+def is_static(obj):
+    return obj.type.lower() in STATIC_TYPES
+
+def inverse_mass(obj):
+    return 0.0 if obj.sleeping or is_static(obj) else 1.0
+
+def body_shape(obj):
+    half = body_size(obj) / 2
+    kind = obj.type.lower()
+    if kind in ("sphere", "light"):
+        return SPHERE, (half, half, half)
+    if kind == "cylinder":
+        return CYLINDER, (half, half, half)
+    if kind == "plane":
+        return BOX, (half, 0.0, half)
+    return BOX, (half, half, half)
+
+def body_bounds(obj):
+    x, y, z = obj.position
+    hx, hy, hz = body_shape(obj)[1]
+    return (x - hx, y - hy, z - hz), (x + hx, y + hy, z + hz)
+
+def auto_cell_size(objects):
+    sizes = [body_size(o) for o in objects if is_solid(o) and not is_static(o)]
+    return max(sizes) if sizes else 100.0
+
+def _overlaps(lo, hi, lo_o, hi_o):
+    return (lo[0] <= hi_o[0] and lo_o[0] <= hi[0] and
+            lo[1] <= hi_o[1] and lo_o[1] <= hi[1] and
+            lo[2] <= hi_o[2] and lo_o[2] <= hi[2])
+
+def _cells(lo, hi, inv, pad=0):
+    floor = math.floor
+    for cx in range(floor(lo[0] * inv) - pad, floor(hi[0] * inv) + 1 + pad):
+        for cy in range(floor(lo[1] * inv) - pad, floor(hi[1] * inv) + 1 + pad):
+            for cz in range(floor(lo[2] * inv) - pad, floor(hi[2] * inv) + 1 + pad):
+                yield cx, cy, cz
+
+def _footprint_contact(kind_a, ha, kind_b, hb, dx, dz):
+    if kind_a == BOX and kind_b == BOX:
+        ox = ha[0] + hb[0] - abs(dx)
+        oz = ha[2] + hb[2] - abs(dz)
+        if ox <= 0 or oz <= 0:
+            return None
+        if ox < oz:
+            return (1.0 if dx >= 0 else -1.0), 0.0, ox
+        return 0.0, (1.0 if dz >= 0 else -1.0), oz
+    if kind_a != BOX and kind_b != BOX:
+        dist = math.hypot(dx, dz)
+        depth = ha[0] + hb[0] - dist
+        if depth <= 0:
+            return None
+        if dist == 0:
+            return 1.0, 0.0, depth
+        return dx / dist, dz / dist, depth
+    if kind_a == BOX:
+        rect, radius, cx, cz, sign = ha, hb[0], dx, dz, 1.0
+    else:
+        rect, radius, cx, cz, sign = hb, ha[0], -dx, -dz, -1.0
+    px = max(-rect[0], min(rect[0], cx))
+    pz = max(-rect[2], min(rect[2], cz))
+    ex, ez = cx - px, cz - pz
+    dist = math.hypot(ex, ez)
+    if dist > 0:
+        depth = radius - dist
+        if depth <= 0:
+            return None
+        return sign * ex / dist, sign * ez / dist, depth
+    gap_x = rect[0] - abs(cx)
+    gap_z = rect[2] - abs(cz)
+    if gap_x < gap_z:
+        return sign * (1.0 if cx >= 0 else -1.0), 0.0, gap_x + radius
+    return 0.0, sign * (1.0 if cz >= 0 else -1.0), gap_z + radius
+
+def _prism_contact(kind_a, ha, kind_b, hb, dx, dy, dz):
+    oy = ha[1] + hb[1] - abs(dy)
+    if oy <= 0:
+        return None
+    footprint = _footprint_contact(kind_a, ha, kind_b, hb, dx, dz)
+    if footprint is None:
+        return None
+    nx, nz, depth = footprint
+    if oy < depth:
+        return 0.0, (1.0 if dy >= 0 else -1.0), 0.0, oy
+    return nx, 0.0, nz, depth
+
+def _sphere_prism_contact(radius, kind, half, dx, dy, dz):
+    cy = max(-half[1], min(half[1], dy))
+    if kind == BOX:
+        cx = max(-half[0], min(half[0], dx))
+        cz = max(-half[2], min(half[2], dz))
+    else:
+        radial = math.hypot(dx, dz)
+        if radial > half[0]:
+            cx, cz = dx * half[0] / radial, dz * half[0] / radial
+        else:
+            cx, cz = dx, dz
+    ex, ey, ez = dx - cx, dy - cy, dz - cz
+    dist = math.sqrt(ex * ex + ey * ey + ez * ez)
+    if dist == 0:
+        return _prism_contact(kind, half, CYLINDER, (radius, radius, radius), dx, dy, dz)
+    depth = radius - dist
+    if depth <= 0:
+        return None
+    return ex / dist, ey / dist, ez / dist, depth
+
+def contact(a, b):
+    kind_a, ha = body_shape(a)
+    kind_b, hb = body_shape(b)
+    ax, ay, az = a.position
+    bx, by, bz = b.position
+    dx, dy, dz = bx - ax, by - ay, bz - az
+    if kind_a == SPHERE and kind_b == SPHERE:
+        dist = math.sqrt(dx * dx + dy * dy + dz * dz)
+        depth = ha[0] + hb[0] - dist
+        if depth <= 0:
+            return None
+        if dist == 0:
+            return 0.0, 1.0, 0.0, depth
+        return dx / dist, dy / dist, dz / dist, depth
+    if kind_a == SPHERE:
+        hit = _sphere_prism_contact(ha[0], kind_b, hb, -dx, -dy, -dz)
+        if hit is None:
+            return None
+        nx, ny, nz, depth = hit
+        return -nx, -ny, -nz, depth
+    if kind_b == SPHERE:
+        return _sphere_prism_contact(hb[0], kind_a, ha, dx, dy, dz)
+    return _prism_contact(kind_a, ha, kind_b, hb, dx, dy, dz)
+
+def _sign(values):
+    return np.where(values >= 0, 1.0, -1.0)
+
+def _footprint_arrays(box_a, ha, box_b, hb, dx, dz):
+    ox = ha[0] + hb[0] - np.abs(dx)
+    oz = ha[2] + hb[2] - np.abs(dz)
+    along_x = ox < oz
+    boxes = (np.where(along_x, _sign(dx), 0.0), np.where(along_x, 0.0, _sign(dz)),
+             np.where(along_x, ox, oz), (ox > 0) & (oz > 0))
+
+    dist = np.hypot(dx, dz)
+    centred = dist == 0
+    safe = np.where(centred, 1.0, dist)
+    depth = ha[0] + hb[0] - dist
+    rounds = (np.where(centred, 1.0, dx / safe), np.where(centred, 0.0, dz / safe), depth, depth > 0)
+
+    sign = np.where(box_a, 1.0, -1.0)
+    rx = np.where(box_a, ha[0], hb[0])
+    rz = np.where(box_a, ha[2], hb[2])
+    radius = np.where(box_a, hb[0], ha[0])
+    cx, cz = dx * sign, dz * sign
+    ex = cx - np.clip(cx, -rx, rx)
+    ez = cz - np.clip(cz, -rz, rz)
+    dist = np.hypot(ex, ez)
+    inside = dist == 0
+    safe = np.where(inside, 1.0, dist)
+    gap_x = rx - np.abs(cx)
+    gap_z = rz - np.abs(cz)
+    along_x = gap_x < gap_z
+    depth = np.where(inside, np.where(along_x, gap_x, gap_z) + radius, radius - dist)
+    mixed = (np.where(inside, np.where(along_x, sign * _sign(cx), 0.0), sign * ex / safe),
+             np.where(inside, np.where(along_x, 0.0, sign * _sign(cz)), sign * ez / safe),
+             depth, inside | (depth > 0))
+
+    both_boxes = box_a & box_b
+    both_round = ~box_a & ~box_b
+    return [np.where(both_boxes, x, np.where(both_round, y, z)) for x, y, z in zip(boxes, rounds, mixed)]
+
+def _prism_arrays(box_a, ha, box_b, hb, d):
+    oy = ha[1] + hb[1] - np.abs(d[1])
+    nx, nz, depth, hit = _footprint_arrays(box_a, ha, box_b, hb, d[0], d[2])
+    vertical = oy < depth
+    normal = np.array([np.where(vertical, 0.0, nx), np.where(vertical, _sign(d[1]), 0.0), np.where(vertical, 0.0, nz)])
+    return normal, np.where(vertical, oy, depth), hit & (oy > 0)
+
+def _sphere_prism_arrays(radius, box, half, d):
+    radial = np.hypot(d[0], d[2])
+    scale = np.where(radial > half[0], half[0] / np.where(radial > 0, radial, 1.0), 1.0)
+    closest = np.array([np.where(box, np.clip(d[0], -half[0], half[0]), d[0] * scale),
+                        np.clip(d[1], -half[1], half[1]),
+                        np.where(box, np.clip(d[2], -half[2], half[2]), d[2] * scale)])
+    e = d - closest
+    dist = np.sqrt((e * e).sum(axis=0))
+    depth = radius - dist
+    normal = e / np.where(dist > 0, dist, 1.0)
+    hit = depth > 0
+    inside = dist == 0
+    if inside.any():
+        rounded = np.array([radius, radius, radius])
+        fallback = _prism_arrays(box, half, np.zeros(len(radius), dtype=bool), rounded, d)
+        normal = np.where(inside, fallback[0], normal)
+        depth = np.where(inside, fallback[1], depth)
+        hit = np.where(inside, fallback[2], hit)
+    return normal, depth, hit
+
+def contact_arrays(kinds, halves, positions, first, second):
+    kind_a, kind_b = kinds[first], kinds[second]
+    ha, hb = halves[:, first], halves[:, second]
+    d = positions[:, second] - positions[:, first]
+    normal = np.zeros_like(d)
+    depth = np.zeros(len(first))
+    hit = np.zeros(len(first), dtype=bool)
+    sphere_a = kind_a == SPHERE
+    sphere_b = kind_b == SPHERE
+    cases = ((sphere_a & sphere_b, None), (sphere_a & ~sphere_b, "a"), (~sphere_a & sphere_b, "b"), (~sphere_a & ~sphere_b, "prism"))
+    for mask, case in cases:
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            continue
+        dr, a, b = d[:, rows], ha[:, rows], hb[:, rows]
+        if case is None:
+            dist = np.sqrt((dr * dr).sum(axis=0))
+            centred = dist == 0
+            n = np.where(centred, np.array([[0.0], [1.0], [0.0]]), dr / np.where(centred, 1.0, dist))
+            result = n, a[0] + b[0] - dist, a[0] + b[0] - dist > 0
+        elif case == "a":
+            n, dep, h = _sphere_prism_arrays(a[0], kind_b[rows] == BOX, b, -dr)
+            result = -n, dep, h
+        elif case == "b":
+            result = _sphere_prism_arrays(b[0], kind_a[rows] == BOX, a, dr)
+        else:
+            result = _prism_arrays(kind_a[rows] == BOX, a, kind_b[rows] == BOX, b, dr)
+        normal[:, rows], depth[rows], hit[rows] = result
+    return normal, depth, hit
+
+def resolve_arrays(positions, velocities, inverse, first, second, normal, depth, restitution=DEFAULT_RESTITUTION):
+    inv_a, inv_b = inverse[first], inverse[second]
+    total = inv_a + inv_b
+    live = total > 0
+    if not live.all():
+        first, second, normal, depth = first[live], second[live], normal[:, live], depth[live]
+        inv_a, inv_b, total = inv_a[live], inv_b[live], total[live]
+    if not len(first):
+        return
+    n = positions.shape[1]
+    shares = (np.bincount(first, weights=inv_a, minlength=n) + np.bincount(second, weights=inv_b, minlength=n))
+    shares = 1.0 / np.maximum(shares, 1.0)
+    push_a = depth * inv_a / total
+    push_b = depth * inv_b / total
+    relative = velocities[:, second] - velocities[:, first]
+    closing = (relative * normal).sum(axis=0)
+    impulse = np.where(closing < 0, -(1 + restitution) * closing / total, 0.0)
+    for axis in range(3):
+        nx = normal[axis]
+        positions[axis] += (np.bincount(second, weights=nx * push_b, minlength=n)
+                            - np.bincount(first, weights=nx * push_a, minlength=n)) * shares
+        velocities[axis] += (np.bincount(second, weights=nx * impulse * inv_b, minlength=n)
+                             - np.bincount(first, weights=nx * impulse * inv_a, minlength=n)) * shares
+
+def closing_speed(a, b, hit):
+    nx, ny, nz = hit[0], hit[1], hit[2]
+    avx, avy, avz = a.velocity
+    bvx, bvy, bvz = b.velocity
+    return -((bvx - avx) * nx + (bvy - avy) * ny + (bvz - avz) * nz)
+
+def resolve_contact(a, b, restitution=DEFAULT_RESTITUTION, hit=None):
+    inv_a = inverse_mass(a)
+    inv_b = inverse_mass(b)
+    total = inv_a + inv_b
+    if total == 0:
+        return False
+    if hit is None:
+        hit = contact(a, b)
+        if hit is None:
+            return False
+    nx, ny, nz, depth = hit
+
+    ax, ay, az = a.position
+    bx, by, bz = b.position
+    share_a = depth * inv_a / total
+    share_b = depth * inv_b / total
+    if inv_a:
+        a.position = (ax - nx * share_a, ay - ny * share_a, az - nz * share_a)
+    if inv_b:
+        b.position = (bx + nx * share_b, by + ny * share_b, bz + nz * share_b)
+
+    avx, avy, avz = a.velocity
+    bvx, bvy, bvz = b.velocity
+    closing = (bvx - avx) * nx + (bvy - avy) * ny + (bvz - avz) * nz
+    if closing < 0:
+        impulse = -(1 + restitution) * closing / total
+        if inv_a:
+            a.velocity = (avx - nx * impulse * inv_a, avy - ny * impulse * inv_a, avz - nz * impulse * inv_a)
+        if inv_b:
+            b.velocity = (bvx + nx * impulse * inv_b, bvy + ny * impulse * inv_b, bvz + nz * impulse * inv_b)
+    return True
+
+class CollisionStats:
+    def __init__(self):
+        self.cell_size = 0.0
+        self.candidate_pairs = 0
+        self.contacts = 0
+        self.broadphase_ms = 0.0
+        self.narrowphase_ms = 0.0
+
+    def __repr__(self):
+        return (f"CollisionStats(cell_size={self.cell_size:.1f}, candidate_pairs={self.candidate_pairs}, "
+                f"contacts={self.contacts}, broadphase_ms={self.broadphase_ms:.3f}, narrowphase_ms={self.narrowphase_ms:.3f})")
+
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+
+    def pairs(self, objects):
+        inv = 1.0 / self.cell_size
+        floor = math.floor
+        cells = {}
+        large_cells = {}
+        small = []
+        large = []
+        bounds = {}
+        for obj in objects:
+            if not is_solid(obj):
+                continue
+            lo, hi = body_bounds(obj)
+            bounds[id(obj)] = (lo, hi)
+            if max(hi[0] - lo[0], hi[1] - lo[1], hi[2] - lo[2]) > self.cell_size:
+                large.append(obj)
+                for key in _cells(lo, hi, inv, 1):
+                    large_cells.setdefault(key, []).append(obj)
+                continue
+            x, y, z = obj.position
+            key = (floor(x * inv), floor(y * inv), floor(z * inv))
+            small.append((obj, key, lo, hi))
+            members = cells.get(key)
+            if members is None:
+                cells[key] = [obj]
+            else:
+                members.append(obj)
+
+        result = []
+        for obj, key, lo, hi in small:
+            kx, ky, kz = key
+            for dx, dy, dz in HALF_NEIGHBOURS:
+                members = cells.get((kx + dx, ky + dy, kz + dz))
+                if members:
+                    _collect(result, obj, lo, hi, members, bounds)
+            members = cells[key]
+            if len(members) > 1:
+                index = members.index(obj)
+                _collect(result, obj, lo, hi, members[index + 1:], bounds)
+            members = large_cells.get(key)
+            if members:
+                _collect(result, obj, lo, hi, members, bounds)
+        seen = set()
+        for members in large_cells.values():
+            for index in range(len(members) - 1):
+                obj = members[index]
+                lo, hi = bounds[id(obj)]
+                for other in members[index + 1:]:
+                    key = (id(obj), id(other))
+                    if key not in seen:
+                        seen.add(key)
+                        _collect(result, obj, lo, hi, (other,), bounds)
+        return result
+
+def _collect(result, obj, lo, hi, others, bounds):
+    for other in others:
+        lo_o, hi_o = bounds[id(other)]
+        if _overlaps(lo, hi, lo_o, hi_o):
+            result.append((obj, other))
+
+class RestingIndex:
+    def __init__(self, cell_size=100.0):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def insert(self, obj):
+        if obj in self.entries or not is_solid(obj):
+            return
+        lo, hi = body_bounds(obj)
+        keys = list(_cells(lo, hi, 1.0 / self.cell_size))
+        for key in keys:
+            self.cells.setdefault(key, []).append(obj)
+        self.entries[obj] = (lo, hi, keys)
+
+    def remove(self, obj):
+        entry = self.entries.pop(obj, None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            members = self.cells[key]
+            members.remove(obj)
+            if not members:
+                del self.cells[key]
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def rebuild(self, cell_size):
+        objects = list(self.entries)
+        self.clear()
+        self.cell_size = cell_size
+        for obj in objects:
+            self.insert(obj)
+
+    def pairs(self, objects):
+        inv = 1.0 / self.cell_size
+        cells = self.cells
+        entries = self.entries
+        result = []
+        for obj in objects:
+            if not is_solid(obj):
+                continue
+            lo, hi = body_bounds(obj)
+            seen = set()
+            for key in _cells(lo, hi, inv):
+                for other in cells.get(key, ()):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    lo_o, hi_o = entries[other][:2]
+                    if _overlaps(lo, hi, lo_o, hi_o):
+                        result.append((obj, other))
+        return result
+
+def cell_keys(positions, cell_size):
+    cells = np.floor(positions / cell_size).astype(np.int64) + CELL_BIAS
+    return (cells[0] * CELL_SPAN + cells[1]) * CELL_SPAN + cells[2]
+
+def _offset_key(offset):
+    return (offset[0] * CELL_SPAN + offset[1]) * CELL_SPAN + offset[2]
+
+def _expand(owners, start, end):
+    counts = np.maximum(end - start, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return None
+    step = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(owners, counts), np.repeat(start, counts) + step
+
+def _split_large(slots, extents, cell_size):
+    large_mask = extents[:, slots].max(axis=0) * 2 > cell_size
+    return slots[~large_mask], slots[large_mask]
+
+def _overlapping(first, second, positions, extents):
+    lo = positions - extents
+    hi = positions + extents
+    overlap = np.all((lo[:, first] <= hi[:, second]) & (lo[:, second] <= hi[:, first]), axis=0)
+    return first[overlap], second[overlap]
+
+def _join(firsts, seconds, positions, extents):
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return _overlapping(np.concatenate(firsts), np.concatenate(seconds), positions, extents)
+
+def grid_pairs(positions, extents, solid, cell_size):
+    small, large = _split_large(np.flatnonzero(solid), extents, cell_size)
+    firsts = []
+    seconds = []
+
+    if len(small) > 1:
+        keys = cell_keys(positions[:, small], cell_size)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        members = small[order]
+        position = np.arange(len(order))
+        for offset in [(0, 0, 0)] + HALF_NEIGHBOURS:
+            neighbour = sorted_keys + _offset_key(offset)
+            start = np.searchsorted(sorted_keys, neighbour, "left")
+            end = np.searchsorted(sorted_keys, neighbour, "right")
+            if offset == (0, 0, 0):
+                start = np.maximum(start, position + 1)
+            found = _expand(members, start, end)
+            if found is not None:
+                firsts.append(found[0])
+                seconds.append(members[found[1]])
+
+    for k, index in enumerate(large):
+        others = np.concatenate((small, large[k + 1:]))
+        firsts.append(np.full(len(others), index))
+        seconds.append(others)
+
+    return _join(firsts, seconds, positions, extents)
+
+class GridIndex:
+    def __init__(self, slots, positions, extents, solid, cell_size):
+        self.cell_size = cell_size
+        self.small, self.large = _split_large(slots[solid[slots]], extents, cell_size)
+        keys = cell_keys(positions[:, self.small], cell_size)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.members = self.small[order]
+
+    def query(self, slots, positions, extents, solid):
+        small, large = _split_large(slots[solid[slots]], extents, self.cell_size)
+        firsts = []
+        seconds = []
+        if len(small) and len(self.members):
+            keys = cell_keys(positions[:, small], self.cell_size)
+            for offset in [(0, 0, 0)] + HALF_NEIGHBOURS + [(-dx, -dy, -dz) for dx, dy, dz in HALF_NEIGHBOURS]:
+                neighbour = keys + _offset_key(offset)
+                start = np.searchsorted(self.keys, neighbour, "left")
+                end = np.searchsorted(self.keys, neighbour, "right")
+                found = _expand(small, start, end)
+                if found is not None:
+                    firsts.append(found[0])
+                    seconds.append(self.members[found[1]])
+        everything = np.concatenate((self.small, self.large))
+        for index in self.large:
+            firsts.append(small)
+            seconds.append(np.full(len(small), index))
+        for index in large:
+            firsts.append(np.full(len(everything), index))
+            seconds.append(everything)
+        return _join(firsts, seconds, positions, extents)
+
+class CollisionStage:
+    def __init__(self, cell_size=None, restitution=DEFAULT_RESTITUTION, wake_speed=WAKE_SPEED, iterations=SOLVER_ITERATIONS):
+        self.cell_size = cell_size
+        self.restitution = restitution
+        self.iterations = iterations
+        self.wake_speed = wake_speed
+        self.stats = CollisionStats()
+
+    def run(self, cell_size, find_pairs, wake=None):
+        start = time.perf_counter()
+        pairs = find_pairs(cell_size)
+        mid = time.perf_counter()
+        touching = []
+        for a, b in pairs:
+            hit = contact(a, b)
+            if hit is None:
+                continue
+            touching.append((a, b))
+            if wake is not None and (a.sleeping or b.sleeping) and closing_speed(a, b, hit) > self.wake_speed:
+                for obj in (a, b):
+                    if obj.sleeping and not is_static(obj):
+                        wake(obj)
+            resolve_contact(a, b, self.restitution, hit)
+        for _ in range(self.iterations - 1):
+            for a, b in touching:
+                resolve_contact(a, b, self.restitution)
+        end = time.perf_counter()
+        self._record(cell_size, len(pairs), len(touching), start, mid, end)
+        return pairs
+
+    def run_arrays(self, cell_size, find_pairs, bodies, wake=None):
+        start = time.perf_counter()
+        first, second = find_pairs(cell_size)
+        mid = time.perf_counter()
+        candidates = len(first)
+        n = bodies.count
+        positions = bodies.positions[:, :n]
+        velocities = bodies.velocities[:, :n]
+        kinds = bodies.kinds[:n]
+        extents = bodies.extents[:, :n]
+        normal, depth, hit = contact_arrays(kinds, extents, positions, first, second)
+        first, second, normal, depth = first[hit], second[hit], normal[:, hit], depth[hit]
+        hit = np.ones(len(first), dtype=bool)
+        if wake is not None and len(first):
+            asleep = (first >= bodies.awake) | (second >= bodies.awake)
+            if asleep.any():
+                closing = -((velocities[:, second] - velocities[:, first]) * normal).sum(axis=0)
+                rouse = asleep & (closing > self.wake_speed)
+                if rouse.any():
+                    first, second = wake(first, second, np.concatenate((first[rouse], second[rouse])))
+                    normal, depth, hit = contact_arrays(kinds, extents, positions, first, second)
+        touching = len(first)
+        inverse = np.where(bodies.static[:n], 0.0, 1.0)
+        inverse[bodies.awake:] = 0.0
+        for iteration in range(self.iterations if touching else 0):
+            if iteration:
+                normal, depth, hit = contact_arrays(kinds, extents, positions, first, second)
+                if not hit.any():
+                    break
+            resolve_arrays(positions, velocities, inverse, first[hit], second[hit], normal[:, hit], depth[hit], self.restitution)
+        self._record(cell_size, candidates, touching, start, mid, time.perf_counter())
+        return first, second
+
+    def _record(self, cell_size, candidates, contacts, start, mid, end):
+        stats = self.stats
+        stats.cell_size = cell_size
+        stats.candidate_pairs = candidates
+        stats.contacts = contacts
+        stats.broadphase_ms = (mid - start) * 1000
+        stats.narrowphase_ms = (end - mid) * 1000
@@ -1,24 +1,159 @@
-from physics import PhysicsEngine
+from startup import StartupTimer
+startup = StartupTimer()
+from physics import PHYSICS_STEP, PhysicsThread, create_physics_engine
 from renderer import RenderEngine
 from sceneSet import SceneRenderer, SceneObject
 from cle_lang import CleParser
 from hotkeys import HotkeyManager
+from hot_reload import SceneReloader, SceneWatcher
+from profiler import Profiler
+from pacing import FramePacer, TARGET_FPS
+from snapshots import create_history
+from streaming import STREAM_RADIUS, WorldStreamer
+import os
+import sys
 import time
-from tkinter import filedialog, Tk
-physics = PhysicsEngine()
+from contextlib import nullcontext
+physics = create_physics_engine()
+history = create_history(physics)
+simulation = None
 renderer = None
 cle_parser = CleParser()
 scene_renderer = SceneRenderer()
+registry = scene_renderer.registry
 hotkeys = HotkeyManager()
+profiler = Profiler()
+pacer = FramePacer()
 physics_enabled = True
 scene_file_path = None
+reloader = SceneReloader()
+watcher = None
+streamer = None
+watch_scene = False
+LARGE_SCENE_BYTES = 16 * 1024 * 1024
+MAX_REPORTED_ERRORS = 20
+SCRUB_SECONDS = 1.0
+startup.mark("import")
+def physics_lock():
+    return simulation.synchronized() if simulation else nullcontext()
 def toggle_physics():
     global physics_enabled
-    physics_enabled = not physics_enabled
+    with physics_lock():
+        physics_enabled = not physics_enabled
+        if simulation:
+            simulation.enabled = physics_enabled
     scene_renderer.physics_enabled = physics_enabled
     print(f"Physics enabled: {physics_enabled}")
+def create_object(record):
+    return SceneObject(record.name, record.type, record.position, record.scale, record.color, record.texture, record.material, record.emissive)
+def watch(file_path):
+    global watcher
+    if watch_scene and (watcher is None or watcher.path != file_path):
+        watcher = SceneWatcher(file_path)
+def parse_source_line(line, data=None):
+    try:
+        return cle_parser.parse_line(line.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        if data is not None:
+            line_number = data.count(b"\n", 0, data.find(line)) + 1
+            print(f"Warning: {scene_file_path}:{line_number}: {e}")
+        return None
+def apply_changes(changes, data):
+    added, removed, patched = [], set(), []
+    authored = history.authored() if history is not None else {}
+    for name, (old_line, new_line) in changes.items():
+        obj = registry.get(name)
+        if new_line is None:
+            if obj is not None:
+                removed.add(obj)
+                registry.remove(obj)
+            continue
+        record = parse_source_line(new_line, data)
+        if record is None:
+            continue
+        if obj is None:
+            obj = create_object(record)
+            registry.add(obj)
+            added.append(obj)
+            continue
+        old = parse_source_line(old_line) if old_line is not None else None
+        if record.type.lower() != obj.type.lower():
+            replacement = create_object(record)
+            removed.add(obj)
+            registry.remove(obj)
+            registry.add(replacement)
+            added.append(replacement)
+            continue
+        if old is None or record.position != old.position:
+            obj.position = record.position
+            obj.velocity = (0.0, 0.0, 0.0)
+            authored.pop(obj, None)
+        reshaped = old is None or record.scale != old.scale
+        obj.scale = record.scale
+        obj.color = record.color
+        obj.texture = record.texture
+        obj.material = record.material
+        obj.emissive = record.emissive
+        registry.update(obj)
+        if reshaped:
+            physics.refresh_object(obj)
+        patched.append(obj)
+    for obj in removed:
+        physics.remove_object(obj)
+        obj.release()
+    if removed:
+        scene_renderer.objects[:] = [o for o in scene_renderer.objects if o not in removed]
+        if scene_renderer.selected in removed:
+            scene_renderer.selected = None
+    for obj in added:
+        physics.add_object(obj)
+        scene_renderer.objects.append(obj)
+    scene_renderer.refresh_objects(patched)
+    if history is not None:
+        history.reset(authored)
+    pacer.request_redraw()
+    return len(added), len(patched), len(removed)
+def build_scene(file_path):
+    reported = [-1]
+    def progress(bytes_read, total_bytes, lines_read):
+        percent = bytes_read * 100 // total_bytes if total_bytes else 100
+        if percent // 10 != reported[0]:
+            reported[0] = percent // 10
+            print(f"Loading: {percent}% ({lines_read} lines)")
+    with physics_lock():
+        physics.clear()
+        if streamer is not None:
+            streamer.close()
+        for obj in scene_renderer.objects:
+            obj.release()
+        scene_renderer.objects.clear()
+        registry.clear()
+        scene_renderer.selected = None
+        scene_renderer.set_texture_root(os.path.dirname(os.path.abspath(file_path)))
+        large = os.path.getsize(file_path) > LARGE_SCENE_BYTES
+        if streamer is not None:
+            streamer.open(file_path, progress if large else None)
+        else:
+            with cle_parser.read_columns(file_path, progress if large else None) as columns:
+                objects = SceneObject.from_columns(columns)
+            scene_renderer.objects.extend(objects.values())
+            for obj in scene_renderer.objects:
+                registry.add(obj)
+                physics.add_object(obj)
+        physics.tick = 0
+        if history is not None:
+            history.reset()
+    reloader.track(file_path)
+    watch(file_path)
+    pacer.request_redraw()
+    errors = streamer.errors if streamer is not None else cle_parser.errors
+    for error in errors[:MAX_REPORTED_ERRORS]:
+        print(f"Warning: {file_path}:{error.line}: {error.message}")
+    if len(errors) > MAX_REPORTED_ERRORS:
+        print(f"Warning: {len(errors) - MAX_REPORTED_ERRORS} more errors in {file_path}")
 def load_scene():
     global scene_file_path
+    from tkinter import filedialog, Tk
     root = Tk()
     root.withdraw()
     file_path = filedialog.askopenfilename(filetypes=[("CLE files", "*.cle")])
@@ -29,51 +164,103 @@ def load_scene():
     print(f"Loading scene from {file_path}")
     scene_file_path = file_path
     scene_renderer.scene_name = file_path.split('/')[-1].split('\\')[-1]
-    cle_parser.parse_file(file_path)
-    physics.objects.clear()
-    scene_renderer.objects.clear()
-    for o in cle_parser.get_objects().values():
-        if isinstance(o, (tuple, list)):
-            obj = SceneObject(o[0], o[1], o[2], o[3])
-        else:
-            obj = SceneObject(o.name, o.type, o.position, o.scale, o.color, o.texture, o.material, o.emissive)
-        physics.add_object(obj)
-        scene_renderer.objects.append(obj)
+    build_scene(file_path)
 def reload_scene():
-    global scene_file_path
     if not scene_file_path:
         print("No scene loaded to reload")
         return
-    print(f"Reloading scene from {scene_file_path}")
-    scene_renderer.scene_name = scene_file_path.split('/')[-1].split('\\')[-1]
-    cle_parser.parse_file(scene_file_path)
-    physics.objects.clear()
-    scene_renderer.objects.clear()
-    for o in cle_parser.get_objects().values():
-        if isinstance(o, (tuple, list)):
-            obj = SceneObject(o[0], o[1], o[2], o[3])
-        else:
-            obj = SceneObject(o.name, o.type, o.position, o.scale, o.color, o.texture, o.material, o.emissive)
-        physics.add_object(obj)
-        scene_renderer.objects.append(obj)
+    if reloader.path != scene_file_path or streamer is not None:
+        print(f"Reloading scene from {scene_file_path}")
+        build_scene(scene_file_path)
+        return
+    start = time.perf_counter()
+    try:
+        changes, data = reloader.diff(scene_file_path)
+    except OSError as e:
+        print(f"Warning: could not reload {scene_file_path}: {e}")
+        return
+    with physics_lock():
+        added, patched, removed = apply_changes(changes, data)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Reloaded {scene_renderer.scene_name}: {added} added, {patched} changed, {removed} removed in {elapsed:.1f} ms")
 def reset_scene():
-    global physics
-    for obj in scene_renderer.objects:
-        if hasattr(obj, 'position') and hasattr(obj, 'scale'):
-            obj.position = (0, 0, 0)
-            obj.velocity = (0, 0, 0)
-    print("Scene reset: all objects moved to (0,0,0)")
+    if history is None:
+        reload_scene()
+        return
+    start = time.perf_counter()
+    with physics_lock():
+        tick = history.restore()
+    if tick is None:
+        print("No scene loaded to reset")
+        return
+    pacer.request_redraw()
+    print(f"Scene reset to its loaded state in {(time.perf_counter() - start) * 1000:.1f} ms")
+def scrub_history(seconds):
+    if history is None:
+        print("History needs numpy; rewind is unavailable")
+        return
+    steps = int(round(abs(seconds) / PHYSICS_STEP))
+    with physics_lock():
+        tick = history.rewind(steps) if seconds < 0 else history.fast_forward(steps)
+    if tick is None:
+        print("No history captured for this scene yet")
+        return
+    pacer.request_redraw()
+    print(f"History: tick {tick} ({tick * PHYSICS_STEP:.2f} s)")
+def rewind_history():
+    scrub_history(-SCRUB_SECONDS)
+def fast_forward_history():
+    scrub_history(SCRUB_SECONDS)
+def stream_world():
+    with physics_lock():
+        added, removed = streamer.update(renderer.camera_pos_x, renderer.camera_pos_z)
+        if not added and not removed:
+            return
+        if removed:
+            physics.remove_objects(removed)
+            gone = set(removed)
+            scene_renderer.objects[:] = [obj for obj in scene_renderer.objects if obj not in gone]
+            if scene_renderer.selected in gone:
+                scene_renderer.selected = None
+            for obj in removed:
+                registry.remove(obj)
+                obj.release()
+        for obj in added:
+            physics.add_object(obj)
+            registry.add(obj)
+        scene_renderer.objects.extend(added)
+    pacer.request_redraw()
+def focus_object(obj):
+    x, y, z = obj.position
+    renderer.camera_pos_x = x
+    renderer.camera_pos_y = y
+    renderer.camera_pos_z = z
+    pacer.request_redraw()
+    print(f"Camera focused on: {obj.name} at {obj.position}")
 def focus_first_object():
-    if scene_renderer.objects:
-        obj = scene_renderer.objects[0]
-        if hasattr(obj, 'position'):
-            x, y, z = obj.position
-            renderer.camera_pos_x = x
-            renderer.camera_pos_y = y
-            renderer.camera_pos_z = z
-            print(f"Camera focused on: {obj.name} at {obj.position}")
-    else:
+    obj = scene_renderer.selected
+    if obj is None or obj not in registry:
+        obj = scene_renderer.objects[0] if scene_renderer.objects else None
+    if obj is None:
         print("No objects to focus on")
+        return
+    focus_object(obj)
+def focus_by_name(name):
+    obj = registry.get(name)
+    if obj is None:
+        print(f"No object named {name!r}")
+        return False
+    scene_renderer.selected = obj
+    focus_object(obj)
+    return True
+def prompt_focus():
+    from tkinter import simpledialog, Tk
+    root = Tk()
+    root.withdraw()
+    name = simpledialog.askstring("Focus", "Object name:", parent=root)
+    root.destroy()
+    if name:
+        focus_by_name(name.strip())
 
 def toggle_lighting():
     renderer.use_lighting = not renderer.use_lighting
@@ -92,30 +279,112 @@ def toggle_textures():
     renderer.use_textures = not renderer.use_textures
     print(f"Textures: {'ON' if renderer.use_textures else 'OFF'}")
 
-def main():
-    global renderer
-    renderer = RenderEngine(scene_renderer, hotkeys=hotkeys)
+def toggle_culling():
+    scene_renderer.use_culling = not scene_renderer.use_culling
+    print(f"Frustum culling: {'ON' if scene_renderer.use_culling else 'OFF'}")
+
+def toggle_lod():
+    scene_renderer.use_lod = not scene_renderer.use_lod
+    print(f"Level of detail: {'ON' if scene_renderer.use_lod else 'OFF'}")
+
+def toggle_instancing():
+    scene_renderer.use_instancing = not scene_renderer.use_instancing
+    print(f"Instancing: {'ON' if scene_renderer.use_instancing else 'OFF'}")
+
+def toggle_profiler():
+    print(f"Profiler: {'ON' if profiler.toggle() else 'OFF'}")
+
+def dump_trace():
+    if not profiler.events:
+        print("Profiler has no frames captured; press 'g' first")
+        return
+    try:
+        print(f"Trace written to {profiler.dump_trace()}")
+    except OSError as e:
+        print(f"Warning: could not write trace: {e}")
+
+def track_startup():
+    startup.mark("first frame")
+    if scene_renderer.assets_ready():
+        startup.mark("assets")
+    if startup.has("first frame", "assets"):
+        startup.report()
+
+def scene_busy():
+    return ((physics_enabled and physics.awake_count > 0) or profiler.enabled
+            or scene_renderer.textures.pending > 0 or not startup.reported
+            or (streamer is not None and streamer.pending > 0))
+
+def main(threaded_physics=False, target_fps=TARGET_FPS, on_demand=False, stream_radius=None):
+    global renderer, simulation, pacer, streamer
+    # Render-on-demand is opt-in (--on-demand); by default every frame is drawn at target_fps.
+    pacer = FramePacer(target_fps, on_demand)
+    if stream_radius:
+        streamer = WorldStreamer(create_object, stream_radius)
+        scene_renderer.streamer = streamer
+    renderer = RenderEngine(scene_renderer, hotkeys=hotkeys, physics=physics, profiler=profiler, pacer=pacer)
     renderer.init_window()
+    startup.mark("gl init")
     scene_renderer.buttons_clear()
     scene_renderer.add_button("Toggle Physics", "toggle.png", toggle_physics)
     scene_renderer.add_button("Load Scene", "load.png", load_scene)
     hotkeys.register('r', reset_scene)
     hotkeys.register('f', focus_first_object)
+    hotkeys.register('n', prompt_focus)
     hotkeys.register('l', reload_scene)
     hotkeys.register('p', toggle_physics)
     hotkeys.register('L', toggle_lighting)
     hotkeys.register('w', toggle_wireframe)
     hotkeys.register('o', toggle_ortho)
     hotkeys.register('t', toggle_textures)
+    hotkeys.register('i', toggle_instancing)
+    hotkeys.register('c', toggle_culling)
+    hotkeys.register('d', toggle_lod)
+    hotkeys.register('g', toggle_profiler)
+    hotkeys.register('k', dump_trace)
+    hotkeys.register('[', rewind_history)
+    hotkeys.register(']', fast_forward_history)
+    if threaded_physics:
+        simulation = PhysicsThread(physics)
+        simulation.enabled = physics_enabled
+        scene_renderer.simulation = simulation
+        simulation.start()
     last_time = time.time()
     while not renderer.should_close():
+        profiler.begin_frame()
         now = time.time()
         dt = now - last_time
         last_time = now
-        if physics_enabled:
-            physics.update(dt)
-        renderer.render_frame()
-        renderer.poll_events()
+        if physics_enabled and not simulation:
+            with profiler.scope("physics"):
+                physics.update(dt)
+        if streamer is not None and streamer.active:
+            with profiler.scope("stream"):
+                stream_world()
+        if watcher is not None and watcher.poll():
+            with profiler.scope("reload"):
+                reload_scene()
+        if pacer.should_render(scene_busy()):
+            with profiler.scope("render"):
+                renderer.render_frame()
+        with profiler.scope("events"):
+            renderer.poll_events()
+        if not startup.reported:
+            track_startup()
+        pacer.wait()
+    if simulation:
+        simulation.stop()
+    if streamer is not None:
+        streamer.close()
     renderer.terminate()
+def option_value(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name) + 1
+        if index < len(sys.argv):
+            return sys.argv[index]
+    return default
 if __name__ == "__main__":
-    main()
+    watch_scene = "--watch" in sys.argv
+    stream_radius = float(option_value("--stream-radius", STREAM_RADIUS)) if "--stream" in sys.argv else None
+    main(threaded_physics="--threaded-physics" in sys.argv, target_fps=float(option_value("--fps", TARGET_FPS)),
+         on_demand="--on-demand" in sys.argv, stream_radius=stream_radius)
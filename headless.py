@@ -0,0 +1,97 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cle_lang import CleParser
+from physics import PHYSICS_STEP, create_physics_engine
+from scene_store import ObjectHandle, SceneStore
+
+DEFAULT_SECONDS = 10.0
+DEFAULT_OUTPUT = "{name}.states.csv"
+STATE_FIELDS = ("time", "name", "x", "y", "z", "vx", "vy", "vz", "sleeping")
+
+def load_objects(path, use_cache=True):
+    parser = CleParser(use_cache=use_cache, workers=1)
+    with parser.read_columns(path) as columns:
+        objects = ObjectHandle.from_columns(columns, SceneStore())
+    for error in parser.errors:
+        print(f"Warning: {path}:{error.line}: {error.message}")
+    return list(objects.values())
+
+def write_states(writer, sim_time, objects):
+    for obj in objects:
+        x, y, z = obj.position
+        vx, vy, vz = obj.velocity
+        writer.writerow((f"{sim_time:.6f}", obj.name, f"{x:.6g}", f"{y:.6g}", f"{z:.6g}",
+                         f"{vx:.6g}", f"{vy:.6g}", f"{vz:.6g}", int(obj.sleeping)))
+
+def output_path(template, path):
+    return template.format(name=os.path.splitext(os.path.basename(path))[0])
+
+def simulate(path, seconds=DEFAULT_SECONDS, every=None, output=DEFAULT_OUTPUT, backend="auto", use_cache=True):
+    start = time.perf_counter()
+    objects = load_objects(path, use_cache)
+    physics = create_physics_engine(backend)
+    for obj in objects:
+        physics.add_object(obj)
+    loaded = time.perf_counter()
+    steps = int(round(seconds / PHYSICS_STEP))
+    interval = max(1, int(round(every / PHYSICS_STEP))) if every else None
+    target = output_path(output, path) if output else None
+    f = open(target, 'w', newline='') if target else None
+    try:
+        writer = csv.writer(f) if f else None
+        if writer is not None:
+            writer.writerow(STATE_FIELDS)
+            if interval:
+                write_states(writer, 0.0, objects)
+        for step in range(1, steps + 1):
+            physics.update(PHYSICS_STEP)
+            if writer is not None and interval and step % interval == 0 and step != steps:
+                write_states(writer, step * PHYSICS_STEP, objects)
+        finished = time.perf_counter()
+        if writer is not None:
+            write_states(writer, steps * PHYSICS_STEP, objects)
+    finally:
+        if f is not None:
+            f.close()
+    wall = finished - loaded
+    return {"scene": path, "objects": len(objects), "steps": steps, "sim_seconds": steps * PHYSICS_STEP,
+            "load_seconds": loaded - start, "wall_seconds": wall, "output": target,
+            "awake": physics.awake_count, "rate": steps * PHYSICS_STEP / wall if wall > 0 else float("inf")}
+
+def _simulate_task(task):
+    return simulate(*task)
+
+def run_batch(paths, seconds=DEFAULT_SECONDS, every=None, output=DEFAULT_OUTPUT, backend="auto", workers=1, use_cache=True):
+    tasks = [(path, seconds, every, output, backend, use_cache) for path in paths]
+    if workers <= 1 or len(tasks) == 1:
+        yield from map(_simulate_task, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        yield from pool.map(_simulate_task, tasks)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CLE scenes headless, as fast as the physics allows.")
+    parser.add_argument("scenes", nargs="+", help=".cle files to simulate")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS, help="simulated seconds per scene")
+    parser.add_argument("--every", type=float, default=None, help="also write states every N simulated seconds")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="CSV path template, {name} is the scene name; empty to skip")
+    parser.add_argument("--backend", choices=("auto", "numpy", "python"), default="auto")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scenes simulated in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write .clec scene caches")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    total = 0.0
+    for result in run_batch(args.scenes, args.seconds, args.every, args.output, args.backend, args.workers, not args.no_cache):
+        total += result["sim_seconds"]
+        print(f"{result['scene']}: {result['objects']} objects, {result['sim_seconds']:.2f} s simulated in "
+              f"{result['wall_seconds']:.2f} s ({result['rate']:.1f} sim-s/s, load {result['load_seconds']:.2f} s, "
+              f"{result['awake']} awake){' -> ' + result['output'] if result['output'] else ''}")
+    wall = time.perf_counter() - start
+    print(f"Total: {len(args.scenes)} scenes, {total:.2f} s simulated in {wall:.2f} s ({total / wall if wall > 0 else 0:.1f} sim-s/s)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,142 @@
+import os
+import time
+
+WATCH_INTERVAL = 0.5
+DIFF_CHUNK = 1 << 16
+
+def create_name(line):
+    parts = line.split(None, 2)
+    if len(parts) >= 2 and parts[0].upper() == b"CREATE":
+        return parts[1].decode('utf-8', 'replace')
+    return None
+
+def read_source(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def index_lines(lines):
+    names = {}
+    creates = 0
+    for line in lines:
+        name = create_name(line)
+        if name is not None:
+            creates += 1
+            names[name] = line
+    return names, creates == len(names)
+
+def common_prefix(a, b, limit):
+    i = 0
+    while i < limit and a[i:i + DIFF_CHUNK] == b[i:i + DIFF_CHUNK]:
+        i += DIFF_CHUNK
+    end = min(i + DIFF_CHUNK, limit)
+    while i < end and a[i] == b[i]:
+        i += 1
+    return min(i, limit)
+
+def common_suffix(a, b, limit):
+    la, lb = len(a), len(b)
+    i = 0
+    while i < limit and a[max(la - i - DIFF_CHUNK, 0):la - i] == b[max(lb - i - DIFF_CHUNK, 0):lb - i]:
+        i += DIFF_CHUNK
+    while i < limit and a[la - i - 1] == b[lb - i - 1]:
+        i += 1
+    return min(i, limit)
+
+def changed_lines(old, new):
+    prefix = common_prefix(old, new, min(len(old), len(new)))
+    suffix = common_suffix(old, new, min(len(old), len(new)) - prefix)
+    start = old.rfind(b"\n", 0, prefix) + 1
+    old_end = len(old) - suffix
+    if old_end > 0 and old[old_end - 1:old_end] != b"\n":
+        newline = old.find(b"\n", old_end)
+        old_end = len(old) if newline == -1 else newline + 1
+    new_end = len(new) - (len(old) - old_end)
+    removed = old[start:old_end].splitlines()
+    added = new[start:new_end].splitlines()
+    kept = set(removed).intersection(added)
+    if kept:
+        removed = [line for line in removed if line not in kept]
+        added = [line for line in added if line not in kept]
+    return removed, added
+
+class SceneReloader:
+    def __init__(self):
+        self.path = None
+        self.data = b""
+        self.names = set()
+        self.exact = True
+
+    def track(self, path):
+        data = read_source(path)
+        names, self.exact = index_lines(data.splitlines())
+        self.path = path
+        self.data = data
+        self.names = set(names)
+
+    def diff(self, path=None):
+        path = path or self.path
+        data = read_source(path)
+        changes = None
+        if self.exact and path == self.path:
+            changes = self._line_diff(*changed_lines(self.data, data))
+        if changes is None:
+            old, _ = index_lines(self.data.splitlines()) if path == self.path else ({}, True)
+            names, exact = index_lines(data.splitlines())
+            changes = {name: (old.get(name), line) for name, line in names.items() if old.get(name) != line}
+            changes.update((name, (old[name], None)) for name in old.keys() - names.keys())
+            self.names, self.exact = set(names), exact
+        self.path = path
+        self.data = data
+        return changes, data
+
+    def _line_diff(self, removed, added):
+        changes = {}
+        for line in removed:
+            name = create_name(line)
+            if name is not None:
+                changes[name] = (line, None)
+        for line in added:
+            name = create_name(line)
+            if name is None:
+                continue
+            old, new = changes.get(name, (None, None))
+            if new is not None or (old is None and name in self.names):
+                return None
+            changes[name] = (old, line)
+        for name, (_, line) in changes.items():
+            if line is None:
+                self.names.discard(name)
+            else:
+                self.names.add(name)
+        return {name: change for name, change in changes.items() if change[0] != change[1]}
+
+class SceneWatcher:
+    def __init__(self, path, interval=WATCH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stamp = self._stamp()
+        self.pending = None
+        self.next_check = time.monotonic() + interval
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def poll(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.interval
+        stamp = self._stamp()
+        if stamp is None or stamp == self.stamp:
+            self.pending = None
+            return False
+        if stamp != self.pending:
+            self.pending = stamp
+            return False
+        self.stamp = stamp
+        self.pending = None
+        return True
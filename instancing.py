@@ -0,0 +1,276 @@
+import ctypes
+import math
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from physics import PositionReader
+
+DEFAULT_DETAIL = 16
+INSTANCE_FLOATS = 7
+BATCHED_TYPES = ("cube", "sphere", "plane", "cylinder")
+
+VERTEX_SHADER = """
+#version 120
+attribute vec3 instance_offset;
+attribute float instance_size;
+attribute vec3 instance_color;
+uniform int lighting;
+varying vec3 color;
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(gl_Vertex.xyz * instance_size + instance_offset, 1.0);
+    color = instance_color;
+    if (lighting != 0) {
+        vec3 normal = normalize(gl_NormalMatrix * gl_Normal);
+        float diffuse = max(dot(normal, normalize(gl_LightSource[0].position.xyz)), 0.0);
+        color *= gl_LightModel.ambient.rgb + gl_LightSource[0].diffuse.rgb * diffuse;
+    }
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+varying vec3 color;
+void main() {
+    gl_FragColor = vec4(color, 1.0);
+}
+"""
+
+def _quad(out, a, b, c, d):
+    out.extend((a, b, c, a, c, d))
+
+def mesh_triangles(kind, detail=DEFAULT_DETAIL):
+    tris = []
+    if kind == "sphere":
+        for i in range(detail):
+            lat0 = math.pi * (-0.5 + i / detail)
+            lat1 = math.pi * (-0.5 + (i + 1) / detail)
+            ring0 = (math.sin(lat0), math.cos(lat0))
+            ring1 = (math.sin(lat1), math.cos(lat1))
+            for j in range(detail):
+                points = []
+                for lng in (2 * math.pi * j / detail, 2 * math.pi * (j + 1) / detail):
+                    x, y = math.cos(lng), math.sin(lng)
+                    points.append((x * ring0[1], y * ring0[1], ring0[0]))
+                    points.append((x * ring1[1], y * ring1[1], ring1[0]))
+                _quad(tris, (points[0], points[0]), (points[2], points[2]), (points[3], points[3]), (points[1], points[1]))
+        return [(tuple(v * 0.5 for v in p), n) for p, n in tris]
+    if kind == "cylinder":
+        for i in range(detail):
+            a0 = 2 * math.pi * i / detail
+            a1 = 2 * math.pi * (i + 1) / detail
+            x0, z0 = math.cos(a0) * 0.5, math.sin(a0) * 0.5
+            x1, z1 = math.cos(a1) * 0.5, math.sin(a1) * 0.5
+            _quad(tris, ((x0, -0.5, z0), (x0, 0, z0)), ((x1, -0.5, z1), (x1, 0, z1)),
+                  ((x1, 0.5, z1), (x1, 0, z1)), ((x0, 0.5, z0), (x0, 0, z0)))
+            tris.extend((((0, 0.5, 0), (0, 1, 0)), ((x0, 0.5, z0), (0, 1, 0)), ((x1, 0.5, z1), (0, 1, 0))))
+            tris.extend((((0, -0.5, 0), (0, -1, 0)), ((x1, -0.5, z1), (0, -1, 0)), ((x0, -0.5, z0), (0, -1, 0))))
+        return tris
+    if kind == "plane":
+        up = (0, 1, 0)
+        _quad(tris, ((-0.5, 0, -0.5), up), ((0.5, 0, -0.5), up), ((0.5, 0, 0.5), up), ((-0.5, 0, 0.5), up))
+        return tris
+    for axis in range(3):
+        for sign in (-0.5, 0.5):
+            normal = tuple(sign * 2 if k == axis else 0 for k in range(3))
+            u, v = [k for k in range(3) if k != axis]
+            corners = []
+            for cu, cv in ((-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5)):
+                p = [0.0, 0.0, 0.0]
+                p[axis], p[u], p[v] = sign, cu, cv
+                corners.append((tuple(p), normal))
+            _quad(tris, *corners)
+    return tris
+
+def batch_kind(obj):
+    kind = obj.type.lower()
+    if kind == "light" or obj.texture:
+        return None
+    return kind if kind in BATCHED_TYPES else "cube"
+
+class InstanceBatch:
+    def __init__(self, kind, objects, indices, detail=DEFAULT_DETAIL):
+        self.kind = kind
+        self.objects = objects
+        self.indices = np.array(indices, dtype=np.int64)
+        self.reader = PositionReader(objects)
+        self.detail = detail
+        self.meshes = {}
+        self.data = np.zeros((len(objects), INSTANCE_FLOATS), dtype=np.float32)
+        for i, obj in enumerate(objects):
+            self.data[i, 3] = max(obj.scale) * 100
+            self.data[i, 4:7] = obj.color[:3]
+        self.data[:, :3] = self.reader.read()
+        self.instance_vbo, self.visible_vbo = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.data.nbytes, self.data, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.uploaded_rows = 0
+        self.visible_count = len(objects)
+        self.dirty = []
+
+    def mesh(self, detail):
+        mesh = self.meshes.get(detail)
+        if mesh is None:
+            triangles = mesh_triangles(self.kind, detail)
+            vertices = np.array([p + n for p, n in triangles], dtype=np.float32)
+            vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, vbo)
+            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+            mesh = self.meshes[detail] = (vbo, len(triangles))
+        return mesh
+
+    def patch(self, row, obj):
+        self.data[row, 3] = max(obj.scale) * 100
+        self.data[row, 4:7] = obj.color[:3]
+        self.dirty.append(row)
+
+    def sync(self, positions=None):
+        current = self.reader.read(positions).astype(np.float32)
+        moved = np.flatnonzero(np.any(self.data[:, :3] != current, axis=1))
+        self.uploaded_rows = len(moved)
+        if not len(moved) and not self.dirty:
+            return
+        rows = moved.tolist()[:1] + moved.tolist()[-1:] + self.dirty
+        first, last = min(rows), max(rows) + 1
+        self.dirty = []
+        self.data[first:last, :3] = current[first:last]
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        row = INSTANCE_FLOATS * 4
+        glBufferSubData(GL_ARRAY_BUFFER, first * row, (last - first) * row, self.data[first:last])
+
+    def draw(self, attributes, visible=None, details=None):
+        shown = None if visible is None else visible[self.indices]
+        self.visible_count = 0
+        if details is None:
+            return self._draw_rows(attributes, self.detail, shown)
+        mine = details[self.indices]
+        calls = 0
+        for detail in np.flatnonzero(np.bincount(mine if shown is None else mine[shown])).tolist():
+            rows = mine == detail
+            calls += self._draw_rows(attributes, detail, rows if shown is None else rows & shown)
+        return calls
+
+    def _draw_rows(self, attributes, detail, rows):
+        buffer = self.instance_vbo
+        count = len(self.objects)
+        if rows is not None:
+            shown = np.flatnonzero(rows)
+            if not len(shown):
+                return 0
+            if len(shown) < count:
+                count = len(shown)
+                data = np.ascontiguousarray(self.data[shown])
+                buffer = self.visible_vbo
+                glBindBuffer(GL_ARRAY_BUFFER, buffer)
+                glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        self.visible_count += count
+        mesh_vbo, vertex_count = self.mesh(detail)
+        glBindBuffer(GL_ARRAY_BUFFER, mesh_vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 24, ctypes.c_void_p(0))
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glNormalPointer(GL_FLOAT, 24, ctypes.c_void_p(12))
+        glBindBuffer(GL_ARRAY_BUFFER, buffer)
+        for location, size, offset in attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, INSTANCE_FLOATS * 4, ctypes.c_void_p(offset))
+            glVertexAttribDivisor(location, 1)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, vertex_count, count)
+        for location, size, offset in attributes:
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return 1
+
+    def release(self):
+        glDeleteBuffers(2, [self.instance_vbo, self.visible_vbo])
+        if self.meshes:
+            glDeleteBuffers(len(self.meshes), [vbo for vbo, _ in self.meshes.values()])
+            self.meshes.clear()
+
+class InstancedRenderer:
+    def __init__(self, detail=DEFAULT_DETAIL):
+        self.detail = detail
+        self.program = None
+        self.failed = np is None
+        self.objects = []
+        self.batches = []
+        self.singles = []
+        self.rows = {}
+        self.draw_calls = 0
+
+    def available(self):
+        if self.program is None and not self.failed:
+            try:
+                self.program = shaders.compileProgram(
+                    shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+                    shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+                self.lighting_location = glGetUniformLocation(self.program, "lighting")
+                self.attributes = [
+                    (glGetAttribLocation(self.program, "instance_offset"), 3, 0),
+                    (glGetAttribLocation(self.program, "instance_size"), 1, 12),
+                    (glGetAttribLocation(self.program, "instance_color"), 3, 16),
+                ]
+            except Exception as e:
+                print(f"Warning: instanced rendering unavailable: {e}")
+                self.failed = True
+        return not self.failed
+
+    def invalidate(self):
+        self.objects = []
+
+    def refresh(self, objects):
+        for obj in objects:
+            entry = self.rows.get(obj)
+            if batch_kind(obj) != (entry[0].kind if entry is not None else None):
+                self.invalidate()
+                return
+            if entry is not None:
+                entry[0].patch(entry[1], obj)
+
+    def draw(self, objects, positions=None, visible=None, details=None):
+        if objects != self.objects:
+            self._rebuild(objects)
+        glUseProgram(self.program)
+        glUniform1i(self.lighting_location, 1 if glIsEnabled(GL_LIGHTING) else 0)
+        self.draw_calls = 0
+        for batch in self.batches:
+            batch.sync(positions)
+            self.draw_calls += batch.draw(self.attributes, visible, details)
+        glUseProgram(0)
+        if visible is None:
+            return [index for index, _ in self.singles]
+        return [index for index, _ in self.singles if visible[index]]
+
+    def _rebuild(self, objects):
+        self.release_batches()
+        groups = {}
+        singles = []
+        for index, obj in enumerate(objects):
+            kind = batch_kind(obj)
+            if kind is None:
+                singles.append((index, obj))
+            else:
+                members = groups.setdefault(kind, ([], []))
+                members[0].append(obj)
+                members[1].append(index)
+        self.batches = [InstanceBatch(kind, members, indices, self.detail) for kind, (members, indices) in groups.items()]
+        self.rows = {obj: (batch, row) for batch in self.batches for row, obj in enumerate(batch.objects)}
+        self.singles = singles
+        self.objects = list(objects)
+
+    def release_batches(self):
+        for batch in self.batches:
+            batch.release()
+        self.batches = []
+
+    def release(self):
+        self.release_batches()
+        if self.program is not None:
+            glDeleteProgram(self.program)
+            self.program = None
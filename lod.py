@@ -0,0 +1,62 @@
+import numpy as np
+from camera import NEAR_PLANE, pixel_scale, view_matrix
+
+LOD_DETAILS = (16, 10, 6, 4)
+LOD_PIXELS = (96, 32, 10)
+LOD_HYSTERESIS = 1.25
+LOD_KINDS = ("sphere", "cylinder", "light")
+
+def lod_levels(pixels, thresholds=LOD_PIXELS):
+    return (pixels[:, None] < np.asarray(thresholds, dtype=np.float64)).sum(axis=1)
+
+def projected_pixels(camera, centers, sizes):
+    pixels = sizes * pixel_scale(camera)
+    if camera.ortho_mode:
+        return pixels
+    row = view_matrix(camera)[2]
+    depth = -(centers @ np.array(row[:3], dtype=np.float64) + row[3])
+    return np.where(depth > NEAR_PLANE, pixels / np.maximum(depth, NEAR_PLANE), np.inf)
+
+class LodSelector:
+    def __init__(self, reader_factory, details=LOD_DETAILS, thresholds=LOD_PIXELS, hysteresis=LOD_HYSTERESIS):
+        self.reader_factory = reader_factory
+        self.details = np.array(details, dtype=np.int64)
+        self.thresholds = thresholds
+        self.hysteresis = hysteresis
+        self.objects = []
+        self.index = {}
+        self.reader = None
+        self.sizes = None
+        self.curved = None
+        self.levels = None
+        self.counts = [0] * len(details)
+
+    def invalidate(self):
+        self.objects = []
+
+    def refresh(self, objects):
+        for obj in objects:
+            row = self.index.get(obj)
+            if row is not None:
+                self.sizes[row] = max(obj.scale) * 100
+                self.curved[row] = obj.type.lower() in LOD_KINDS
+
+    def select(self, objects, camera, positions=None):
+        if objects != self.objects:
+            self.objects = list(objects)
+            self.index = {obj: i for i, obj in enumerate(self.objects)}
+            self.reader = self.reader_factory(self.objects)
+            self.sizes = np.array([max(o.scale) * 100 for o in self.objects], dtype=np.float64)
+            self.curved = np.array([o.type.lower() in LOD_KINDS for o in self.objects], dtype=bool)
+            self.levels = None
+        pixels = projected_pixels(camera, self.reader.read(positions), self.sizes)
+        if self.levels is None:
+            self.levels = lod_levels(pixels, self.thresholds)
+        else:
+            finer = lod_levels(pixels * self.hysteresis, self.thresholds)
+            coarser = lod_levels(pixels / self.hysteresis, self.thresholds)
+            self.levels = np.clip(self.levels, finer, coarser)
+        self.counts = np.bincount(self.levels[self.curved], minlength=len(self.details)).tolist()
+        details = self.details[self.levels]
+        details[~self.curved] = self.details[0]
+        return details
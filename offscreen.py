@@ -0,0 +1,375 @@
+import os
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+import argparse
+import ctypes
+import math
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from OpenGL.GL import *
+from camera import FIELD_OF_VIEW, FAR_PLANE, view_matrix
+from cle_lang import CleParser
+from physics import create_physics_engine
+from renderer import RenderEngine
+from sceneSet import SceneRenderer, SceneObject
+
+DEFAULT_FRAMES = 120
+DEFAULT_SIZE = "1280x720"
+DEFAULT_OUTPUT = "{name}_{frame:05d}.png"
+DEFAULT_PITCH = 20.0
+DEFAULT_FPS = 30.0
+READBACK_BUFFERS = 2
+WRITER_QUEUE = 8
+PNG_COMPRESS_LEVEL = 1
+TEXTURE_WAIT_SECONDS = 10.0
+
+class OffscreenContext:
+    def __init__(self):
+        self.platform = os.environ.get("PYOPENGL_PLATFORM")
+        if self.platform == "egl":
+            self._create_egl()
+        elif self.platform == "osmesa":
+            self._create_osmesa()
+        else:
+            raise RuntimeError(f"offscreen rendering needs PYOPENGL_PLATFORM=egl or osmesa, not {self.platform!r}")
+
+    def _create_egl(self):
+        from OpenGL import EGL
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self.display, None, None):
+            raise RuntimeError("eglInitialize failed")
+        attributes = (EGL.EGLint * 13)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RED_SIZE, 8,
+                                       EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8, EGL.EGL_DEPTH_SIZE, 24,
+                                       EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+            raise RuntimeError("no EGL config with OpenGL and pbuffer support")
+        self.surface = EGL.eglCreatePbufferSurface(self.display, config, (EGL.EGLint * 5)(EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not self.context or not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            raise RuntimeError("could not make an EGL OpenGL context current")
+
+    def _create_osmesa(self):
+        from OpenGL import arrays, osmesa
+        self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        self.surface = arrays.GLubyteArray.zeros((1, 1, 4))
+        if not self.context or not osmesa.OSMesaMakeCurrent(self.context, self.surface, GL_UNSIGNED_BYTE, 1, 1):
+            raise RuntimeError("could not make an OSMesa context current")
+
+    def release(self):
+        if self.platform == "egl":
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroySurface(self.display, self.surface)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
+
+class Framebuffer:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fbo = glGenFramebuffers(1)
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"framebuffer incomplete: 0x{status:x}")
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+
+    def release(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glDeleteRenderbuffers(2, [self.color, self.depth])
+        glDeleteFramebuffers(1, [self.fbo])
+
+class PixelReader:
+    def __init__(self, width, height, buffers=READBACK_BUFFERS):
+        self.width = width
+        self.height = height
+        self.size = width * height * 4
+        self.buffers = [int(buffer) for buffer in glGenBuffers(buffers)] if buffers > 1 else [int(glGenBuffers(1))] if buffers else []
+        for buffer in self.buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 4)
+        self.pending = deque()
+        self.next = 0
+        self.map_seconds = 0.0
+
+    def read(self, tag):
+        if not self.buffers:
+            start = time.perf_counter()
+            data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+            self.map_seconds += time.perf_counter() - start
+            return [(tag, bytes(data))]
+        buffer = self.buffers[self.next]
+        self.next = (self.next + 1) % len(self.buffers)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending.append((buffer, tag))
+        return [self._collect()] if len(self.pending) >= len(self.buffers) else []
+
+    def flush(self):
+        return [self._collect() for _ in range(len(self.pending))]
+
+    def _collect(self):
+        buffer, tag = self.pending.popleft()
+        start = time.perf_counter()
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+        pointer = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.size, GL_MAP_READ_BIT)
+        data = ctypes.string_at(pointer, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.map_seconds += time.perf_counter() - start
+        return tag, data
+
+    def release(self):
+        if self.buffers:
+            glDeleteBuffers(len(self.buffers), self.buffers)
+        self.buffers = []
+
+class FrameWriter:
+    def __init__(self, width, height, name="frame", template=DEFAULT_OUTPUT, raw_path=None, depth=WRITER_QUEUE):
+        self.width = width
+        self.height = height
+        self.name = name
+        self.template = template
+        self.raw = open(raw_path, 'wb') if raw_path else None
+        self.queue = queue.Queue(maxsize=depth)
+        self.directories = set()
+        self.written = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, frame, data):
+        start = time.perf_counter()
+        self.queue.put((frame, data))
+        self.wait_seconds += time.perf_counter() - start
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.raw is not None:
+            self.raw.close()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+                self.written += 1
+            except OSError as e:
+                self.failed += 1
+                print(f"Warning: could not write frame {item[0]}: {e}")
+
+    def _write(self, frame, data):
+        stride = self.width * 4
+        if self.raw is not None:
+            view = memoryview(data)
+            self.raw.write(b"".join(view[row * stride:(row + 1) * stride] for row in range(self.height - 1, -1, -1)))
+            return
+        from PIL import Image
+        path = self.template.format(name=self.name, frame=frame)
+        directory = os.path.dirname(path)
+        if directory and directory not in self.directories:
+            os.makedirs(directory, exist_ok=True)
+            self.directories.add(directory)
+        image = Image.frombuffer("RGBA", (self.width, self.height), data, "raw", "RGBA", 0, -1)
+        image.convert("RGB").save(path, compress_level=PNG_COMPRESS_LEVEL)
+
+def scene_bounds(objects):
+    if not objects:
+        return (0.0, 0.0, 0.0), 1.0
+    lo = [min(float(obj.position[axis]) for obj in objects) for axis in range(3)]
+    hi = [max(float(obj.position[axis]) for obj in objects) for axis in range(3)]
+    center = tuple((a + b) / 2 for a, b in zip(lo, hi))
+    radius = math.dist(lo, hi) / 2 + max(max(obj.scale) for obj in objects) * 50
+    return center, radius
+
+def fit_distance(radius):
+    return max(min(radius / math.sin(math.radians(FIELD_OF_VIEW) / 2), FAR_PLANE - radius), radius)
+
+def orbit_keys(frames, center, distance, pitch=DEFAULT_PITCH):
+    return [(0, pitch, 0.0, distance, *center), (frames, pitch, 360.0, distance, *center)]
+
+def read_camera_script(path):
+    keys = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                frame, pitch, yaw, distance, x, y, z = map(float, line.split())
+            except ValueError:
+                print(f"Warning: {path}:{line_number}: expected FRAME PITCH YAW DISTANCE X Y Z")
+                continue
+            keys.append((frame, pitch, yaw, distance, x, y, z))
+    keys.sort()
+    return keys
+
+def camera_at(keys, frame):
+    if frame <= keys[0][0]:
+        return keys[0][1:]
+    for a, b in zip(keys, keys[1:]):
+        if frame <= b[0]:
+            t = (frame - a[0]) / (b[0] - a[0]) if b[0] > a[0] else 1.0
+            return tuple(u + (v - u) * t for u, v in zip(a[1:], b[1:]))
+    return keys[-1][1:]
+
+class OffscreenRenderer(RenderEngine):
+    def __init__(self, scene_renderer, width, height, buffers=READBACK_BUFFERS, **options):
+        super().__init__(scene_renderer, width, height, **options)
+        self.buffers = buffers
+        self.context = None
+        self.framebuffer = None
+        self.reader = None
+
+    def init_window(self):
+        self.context = OffscreenContext()
+        self.framebuffer = Framebuffer(self.width, self.height)
+        self.reader = PixelReader(self.width, self.height, self.buffers)
+        self.setup_gl()
+        self.initialized = True
+
+    def look_at(self, pitch, yaw, distance, x, y, z):
+        self.camera_rot_x = pitch
+        self.camera_rot_y = yaw
+        self.camera_distance = distance
+        view = view_matrix(self)
+        self.camera_pos_x, self.camera_pos_y, self.camera_pos_z = (sum(view[i][j] * v for j, v in enumerate((x, y, z))) for i in range(3))
+
+    def render_frame(self, tag=None):
+        self.framebuffer.bind()
+        self.draw_world()
+        return self.reader.read(tag)
+
+    def wait_for_textures(self, timeout=TEXTURE_WAIT_SECONDS):
+        textures = self.scene_renderer.textures
+        self.framebuffer.bind()
+        self.draw_world()
+        deadline = time.perf_counter() + timeout
+        while textures.pending and time.perf_counter() < deadline:
+            textures.update()
+            time.sleep(0.005)
+        if textures.pending:
+            print(f"Warning: {textures.pending} textures still loading after {timeout:.0f} s")
+
+    def flush(self):
+        return self.reader.flush()
+
+    def terminate(self):
+        self.reader.release()
+        self.framebuffer.release()
+        super().terminate()
+        self.context.release()
+
+def load_scene(path, scene_renderer):
+    parser = CleParser()
+    with parser.read_columns(path) as columns:
+        objects = SceneObject.from_columns(columns)
+    for error in parser.errors:
+        print(f"Warning: {path}:{error.line}: {error.message}")
+    scene_renderer.objects[:] = objects.values()
+    for obj in scene_renderer.objects:
+        scene_renderer.registry.add(obj)
+    scene_renderer.scene_name = os.path.basename(path)
+    scene_renderer.set_texture_root(os.path.dirname(os.path.abspath(path)))
+
+def render_sequence(path, frames=DEFAULT_FRAMES, width=1280, height=720, output=DEFAULT_OUTPUT, raw_path=None,
+                    camera_script=None, pitch=DEFAULT_PITCH, distance=None, buffers=READBACK_BUFFERS,
+                    simulate=False, fps=DEFAULT_FPS):
+    scene_renderer = SceneRenderer()
+    load_scene(path, scene_renderer)
+    physics = None
+    if simulate:
+        physics = create_physics_engine()
+        for obj in scene_renderer.objects:
+            physics.add_object(obj)
+    if camera_script:
+        keys = read_camera_script(camera_script)
+        if not keys:
+            raise ValueError(f"{camera_script} has no camera keys")
+    else:
+        center, radius = scene_bounds(scene_renderer.objects)
+        keys = orbit_keys(frames, center, distance or fit_distance(radius), pitch)
+    renderer = OffscreenRenderer(scene_renderer, width, height, buffers, physics=physics)
+    renderer.init_window()
+    writer = FrameWriter(width, height, os.path.splitext(os.path.basename(path))[0], output, raw_path)
+    try:
+        renderer.wait_for_textures()
+        start = time.perf_counter()
+        for frame in range(frames):
+            if physics is not None:
+                physics.update(1.0 / fps)
+            renderer.look_at(*camera_at(keys, frame))
+            for tag, data in renderer.render_frame(frame):
+                writer.put(tag, data)
+        for tag, data in renderer.flush():
+            writer.put(tag, data)
+        rendered = time.perf_counter()
+        writer.close()
+        finished = time.perf_counter()
+    finally:
+        renderer.terminate()
+    return {"scene": path, "objects": len(scene_renderer.objects), "frames": frames, "size": (width, height),
+            "render_seconds": rendered - start, "total_seconds": finished - start,
+            "readback_seconds": renderer.reader.map_seconds, "writer_wait_seconds": writer.wait_seconds,
+            "written": writer.written, "failed": writer.failed,
+            "output": raw_path or output}
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a CLE scene offscreen into an image sequence.")
+    parser.add_argument("scene", help=".cle file to render")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--size", type=parse_size, default=parse_size(DEFAULT_SIZE), help="WIDTHxHEIGHT")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="PNG path template with {name} and {frame}")
+    parser.add_argument("--raw", default=None, help="write top-down RGBA frames into one raw video file instead")
+    parser.add_argument("--camera", default=None, help="camera keys, one 'FRAME PITCH YAW DISTANCE X Y Z' per line")
+    parser.add_argument("--pitch", type=float, default=DEFAULT_PITCH, help="turntable pitch without --camera")
+    parser.add_argument("--distance", type=float, default=None, help="turntable distance, fitted to the scene by default")
+    parser.add_argument("--buffers", type=int, default=READBACK_BUFFERS, help="pixel buffers for readback, 0 for plain glReadPixels")
+    parser.add_argument("--physics", action="store_true", help="advance physics by 1/FPS between frames")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS)
+    args = parser.parse_args(argv)
+    width, height = args.size
+    result = render_sequence(args.scene, args.frames, width, height, args.output, args.raw, args.camera, args.pitch,
+                             args.distance, args.buffers, args.physics, args.fps)
+    render = result["render_seconds"]
+    total = result["total_seconds"]
+    print(f"{result['scene']}: {result['written']} of {result['frames']} frames at {width}x{height} -> {result['output']}")
+    print(f"Rendered in {render:.2f} s ({result['frames'] / render if render > 0 else 0:.1f} FPS, readback {result['readback_seconds']:.2f} s, "
+          f"writer backpressure {result['writer_wait_seconds']:.2f} s), written in {total:.2f} s "
+          f"({result['frames'] / total if total > 0 else 0:.1f} FPS)")
+    if args.raw:
+        print(f"Play with: ffmpeg -f rawvideo -pixel_format rgba -video_size {width}x{height} -framerate {args.fps:g} -i {args.raw} out.mp4")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
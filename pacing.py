@@ -0,0 +1,80 @@
+import threading
+import time
+from array import array
+
+TARGET_FPS = 60
+SPIN_MARGIN = 0.001
+IDLE_TIMEOUT = 0.02
+JITTER_HISTORY = 240
+
+def sleep_until(deadline, margin=SPIN_MARGIN):
+    remaining = deadline - time.perf_counter()
+    if remaining > margin:
+        time.sleep(remaining - margin)
+    while time.perf_counter() < deadline:
+        pass
+
+class FramePacer:
+    def __init__(self, target_fps=TARGET_FPS, on_demand=False, margin=SPIN_MARGIN, history=JITTER_HISTORY, idle_timeout=IDLE_TIMEOUT):
+        self.on_demand = on_demand
+        self.margin = margin
+        self.idle_timeout = idle_timeout
+        self.wakeup = threading.Event()
+        self.period = 1.0 / target_fps if target_fps else 0.0
+        self.deadline = None
+        self.redraw_requested = True
+        self.rendered = False
+        self.last_frame = None
+        self.history = history
+        self.intervals = array('d', [0.0] * history)
+        self.interval_count = 0
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def target_fps(self):
+        return 1.0 / self.period if self.period else 0
+
+    def request_redraw(self):
+        self.redraw_requested = True
+        self.wakeup.set()
+
+    def should_render(self, busy=False):
+        self.rendered = not self.on_demand or busy or self.redraw_requested
+        self.redraw_requested = False
+        if self.rendered:
+            self.frames += 1
+        else:
+            self.skipped += 1
+        return self.rendered
+
+    def wait(self):
+        now = time.perf_counter()
+        if self.period:
+            if self.deadline is None or now - self.deadline > self.period:
+                self.deadline = now
+            self.deadline += self.period
+            if self.rendered:
+                sleep_until(self.deadline, self.margin)
+            else:
+                self.idle(self.deadline - now)
+        elif not self.rendered:
+            self.idle(self.idle_timeout)
+        now = time.perf_counter()
+        if self.rendered and self.last_frame is not None:
+            self.intervals[self.interval_count % self.history] = now - self.last_frame
+            self.interval_count += 1
+        self.last_frame = now if self.rendered else None
+
+    def idle(self, timeout):
+        if not self.redraw_requested:
+            self.wakeup.wait(max(timeout, 0.0))
+        self.wakeup.clear()
+
+    def jitter(self):
+        count = min(self.interval_count, self.history)
+        if count == 0:
+            return 0.0, 0.0
+        target = self.period or sum(self.intervals[:count]) / count
+        deviations = sorted(abs(self.intervals[i] - target) for i in range(count))
+        return sum(deviations) / count, deviations[min(count - 1, int(count * 0.99))]
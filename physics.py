@@ -1,25 +1,169 @@
+import threading
+from array import array
+import time
+from contextlib import contextmanager
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from collision import CollisionStage, GridIndex, RestingIndex, SpatialHash, auto_cell_size, body_shape, grid_pairs, is_solid, is_static
+
 GRAVITY = -981.0
 PHYSICS_STEP = 1 / 120
+WORLD_MIN_X = -5000
+WORLD_MAX_X = 5000
+SLEEP_SPEED = 10.0
+SLEEP_STEPS = 60
+MAX_CATCHUP_STEPS = 8
 
 class PhysicsEngine:
-    def __init__(self):
+    def __init__(self, collisions=True, cell_size=None, sleeping=True, sleep_steps=SLEEP_STEPS):
         self.objects = []
+        self.awake = {}
+        self.resting = RestingIndex()
+        self.collisions_enabled = collisions
+        self.collisions = CollisionStage(cell_size)
+        self.sleeping_enabled = sleeping
+        self.sleep_steps = sleep_steps
+        self.layout = 0
+        self.tick = 0
+        self.history = None
+        self._cell_size = None
+        self._snapshot_objects = None
+
+    @property
+    def collision_stats(self):
+        return self.collisions.stats
+
+    @property
+    def awake_count(self):
+        return len(self.awake)
+
+    @property
+    def sleeping_count(self):
+        return len(self.objects) - self.awake_count
 
     def add_object(self, obj):
+        assert obj.body is None and obj.row is not None, "python physics steps handles through their store rows"
         self.objects.append(obj)
+        obj.physics = self
+        obj.sleeping = False
+        obj.rest_steps = 0
+        self.awake[obj] = None
+        self._cell_size = None
+        self.layout += 1
+
+    def remove_object(self, obj):
+        self.objects.remove(obj)
+        self.awake.pop(obj, None)
+        self.resting.remove(obj)
+        obj.physics = None
+        obj.sleeping = False
+        self._cell_size = None
+        self.layout += 1
+
+    def remove_objects(self, objects):
+        removed = set(objects)
+        self.objects[:] = [obj for obj in self.objects if obj not in removed]
+        for obj in removed:
+            self.awake.pop(obj, None)
+            self.resting.remove(obj)
+            obj.physics = None
+            obj.sleeping = False
+        self._cell_size = None
+        self.layout += 1
+
+    def clear(self):
+        for obj in self.objects:
+            obj.physics = None
+            obj.sleeping = False
+        self.objects.clear()
+        self.awake.clear()
+        self.resting.clear()
+        self._cell_size = None
+        self.layout += 1
+
+    def wake(self, obj):
+        if not obj.sleeping:
+            return
+        obj.sleeping = False
+        obj.rest_steps = 0
+        self.resting.remove(obj)
+        self.awake[obj] = None
+
+    def refresh_object(self, obj):
+        self.wake(obj)
+        self._cell_size = None
+
+    def wake_all(self):
+        for obj in self.objects:
+            self.wake(obj)
+
+    def sleep(self, obj):
+        if obj.sleeping:
+            return
+        obj.velocity = (0.0, 0.0, 0.0)
+        obj.sleeping = True
+        del self.awake[obj]
+        self.resting.insert(obj)
+
+    def snapshot(self):
+        if self._snapshot_objects is None or self._snapshot_objects[0] != self.layout:
+            self._snapshot_objects = (self.layout, tuple(self.objects))
+        objects = self._snapshot_objects[1]
+        return PhysicsSnapshot(self.layout, objects, [tuple(o.position) for o in objects])
+
+    def read_state(self):
+        positions = np.empty((3, len(self.objects)))
+        velocities = np.empty((3, len(self.objects)))
+        for i, obj in enumerate(self.objects):
+            store, j = obj.store, obj.row * 3
+            positions[:, i] = store.positions[j:j + 3]
+            velocities[:, i] = store.velocities[j:j + 3]
+        return positions, velocities
+
+    def write_state(self, positions, velocities):
+        for obj, position, velocity in zip(self.objects, positions.T.tolist(), velocities.T.tolist()):
+            store, j = obj.store, obj.row * 3
+            store.positions[j:j + 3] = array('d', position)
+            store.velocities[j:j + 3] = array('d', velocity)
+        self.wake_all()
+
+    def cell_size(self):
+        if self.collisions.cell_size:
+            return self.collisions.cell_size
+        if self._cell_size is None:
+            self._cell_size = self._auto_cell_size()
+        return self._cell_size
+
+    def _auto_cell_size(self):
+        return auto_cell_size(self.objects)
 
     def update(self, dt):
         steps = int(dt // PHYSICS_STEP)
         remainder = dt % PHYSICS_STEP
         for _ in range(steps):
-            self._step(PHYSICS_STEP)
+            self.step(PHYSICS_STEP)
         if remainder > 0:
-            self._step(remainder)
+            self.step(remainder)
+
+    def step(self, dt):
+        if self.history is not None:
+            self.history.stepping()
+        self._step(dt)
+        self.tick += 1
+        if self.history is not None:
+            self.history.stepped(self.tick)
 
     def _step(self, dt):
-        for obj in self.objects:
-            vx, vy, vz = getattr(obj, "velocity", (0, 0, 0))
-            x, y, z = obj.position
+        if not self.awake:
+            return
+        # Bodies here never carry a BodyArrays slot, so a handle's state is its store row (see add_object).
+        for obj in self.awake:
+            store, j = obj.store, obj.row * 3
+            positions, velocities = store.positions, store.velocities
+            vx, vy, vz = velocities[j], velocities[j + 1], velocities[j + 2]
+            x, y, z = positions[j], positions[j + 1], positions[j + 2]
 
             vy += GRAVITY * dt
             x += vx * dt
@@ -30,12 +174,454 @@ class PhysicsEngine:
                 y = 0
                 vy = 0
 
-            if x < -5000:
-                x = -5000
+            if x < WORLD_MIN_X:
+                x = WORLD_MIN_X
                 vx = 0
-            elif x > 5000:
-                x = 5000
+            elif x > WORLD_MAX_X:
+                x = WORLD_MAX_X
                 vx = 0
 
-            obj.velocity = (vx, vy, vz)
-            obj.position = (x, y, z)
+            velocities[j], velocities[j + 1], velocities[j + 2] = vx, vy, vz
+            positions[j], positions[j + 1], positions[j + 2] = x, y, z
+
+        if self.collisions_enabled:
+            self._collide()
+        if self.sleeping_enabled:
+            self._update_sleep()
+
+    def _collide(self):
+        cell_size = self.cell_size()
+        self.collisions.run(cell_size, self._find_pairs, self.wake)
+
+    def _find_pairs(self, cell_size):
+        awake = list(self.awake)
+        pairs = SpatialHash(cell_size).pairs(awake)
+        if len(self.resting):
+            if self.resting.cell_size != cell_size:
+                self.resting.rebuild(cell_size)
+            pairs += self.resting.pairs(awake)
+        return pairs
+
+    def _update_sleep(self):
+        threshold = SLEEP_SPEED * SLEEP_SPEED
+        settled = []
+        for obj in self.awake:
+            velocities, j = obj.store.velocities, obj.row * 3
+            vx, vy, vz = velocities[j], velocities[j + 1], velocities[j + 2]
+            if vx * vx + vy * vy + vz * vz < threshold:
+                obj.rest_steps += 1
+                if obj.rest_steps >= self.sleep_steps:
+                    settled.append(obj)
+            else:
+                obj.rest_steps = 0
+        for obj in settled:
+            self.sleep(obj)
+
+class BodyArrays:
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.awake = 0
+        self.layout = 0
+        self.owners = []
+        self.positions = np.zeros((3, capacity))
+        self.velocities = np.zeros((3, capacity))
+        self.scratch = np.zeros((3, capacity))
+        self.extents = np.zeros((3, capacity))
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.solid = np.zeros(capacity, dtype=bool)
+        self.static = np.zeros(capacity, dtype=bool)
+        self.rest_steps = np.zeros(capacity, dtype=np.int32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+
+    def position_of(self, slot):
+        return tuple(self.positions[:, slot].tolist())
+
+    def velocity_of(self, slot):
+        return tuple(self.velocities[:, slot].tolist())
+
+    def set_position(self, slot, value):
+        self.positions[:, slot] = value
+
+    def set_velocity(self, slot, value):
+        self.velocities[:, slot] = value
+
+    def attach(self, obj):
+        position = obj.position
+        velocity = getattr(obj, "velocity", (0.0, 0.0, 0.0))
+        if self.count == self.positions.shape[1]:
+            self._grow(self.count * 2)
+        slot = self.count
+        self.positions[:, slot] = position
+        self.velocities[:, slot] = velocity
+        self.kinds[slot], self.extents[:, slot] = body_shape(obj)
+        self.solid[slot] = is_solid(obj)
+        self.static[slot] = is_static(obj)
+        self.rest_steps[slot] = 0
+        self.ids[slot] = slot
+        self.owners.append(obj)
+        self.count += 1
+        self.layout += 1
+        obj.body = self
+        obj.slot = slot
+        self.wake_slot(slot)
+
+    def detach(self, obj, renumber=True):
+        if obj.slot < self.awake:
+            self.sleep_slot(obj.slot)
+        self._swap(obj.slot, self.count - 1)
+        self._unbind(obj)
+        self.owners.pop()
+        self.count -= 1
+        self.layout += 1
+        if renumber:
+            ids = self.ids[:self.count]
+            ids[ids > self.ids[self.count]] -= 1
+
+    def renumber(self, objects):
+        self.ids[[obj.slot for obj in objects]] = np.arange(len(objects))
+
+    def sleep_slot(self, slot):
+        self.awake -= 1
+        self._swap(slot, self.awake)
+
+    def wake_slot(self, slot):
+        self._swap(slot, self.awake)
+        self.rest_steps[self.awake] = 0
+        self.awake += 1
+
+    def wake_all(self):
+        self.rest_steps[:self.count] = 0
+        self.awake = self.count
+        self.layout += 1
+
+    def clear(self):
+        for obj in self.owners:
+            self._unbind(obj)
+        self.owners.clear()
+        self.count = 0
+        self.awake = 0
+        self.layout += 1
+
+    def _swap(self, i, j):
+        if i == j:
+            return
+        self.layout += 1
+        for column in (self.positions, self.velocities, self.extents):
+            column[:, [i, j]] = column[:, [j, i]]
+        for column in (self.kinds, self.solid, self.static, self.rest_steps, self.ids):
+            column[[i, j]] = column[[j, i]]
+        owners = self.owners
+        owners[i], owners[j] = owners[j], owners[i]
+        owners[i].slot = i
+        owners[j].slot = j
+
+    def _unbind(self, obj):
+        position = tuple(self.positions[:, obj.slot].tolist())
+        velocity = tuple(self.velocities[:, obj.slot].tolist())
+        obj.body = None
+        obj.slot = None
+        obj.position = position
+        obj.velocity = velocity
+
+    def _grow(self, capacity):
+        for name in ("positions", "velocities", "scratch", "extents", "kinds", "solid", "static", "rest_steps", "ids"):
+            old = getattr(self, name)
+            new = np.zeros(old.shape[:-1] + (capacity,), dtype=old.dtype)
+            new[..., :self.count] = old[..., :self.count]
+            setattr(self, name, new)
+
+class ArrayPhysicsEngine(PhysicsEngine):
+    def __init__(self, capacity=1024, collisions=True, cell_size=None, sleeping=True, sleep_steps=SLEEP_STEPS):
+        super().__init__(collisions, cell_size, sleeping, sleep_steps)
+        self.bodies = BodyArrays(capacity)
+        self.resting = None
+
+    @property
+    def awake_count(self):
+        return self.bodies.awake
+
+    def add_object(self, obj):
+        self.objects.append(obj)
+        obj.physics = self
+        obj.sleeping = False
+        self.bodies.attach(obj)
+        self._cell_size = None
+        self.resting = None
+        self.layout += 1
+
+    def remove_object(self, obj):
+        self.objects.remove(obj)
+        obj.physics = None
+        obj.sleeping = False
+        self.bodies.detach(obj)
+        self._cell_size = None
+        self.resting = None
+        self.layout += 1
+
+    def remove_objects(self, objects):
+        removed = set(objects)
+        self.objects[:] = [obj for obj in self.objects if obj not in removed]
+        for obj in removed:
+            obj.physics = None
+            obj.sleeping = False
+            self.bodies.detach(obj, renumber=False)
+        self.bodies.renumber(self.objects)
+        self._cell_size = None
+        self.resting = None
+        self.layout += 1
+
+    def clear(self):
+        for obj in self.objects:
+            obj.physics = None
+            obj.sleeping = False
+        self.objects.clear()
+        self.bodies.clear()
+        self._cell_size = None
+        self.resting = None
+        self.layout += 1
+
+    def wake(self, obj):
+        if not obj.sleeping:
+            return
+        obj.sleeping = False
+        self.bodies.wake_slot(obj.slot)
+        self.resting = None
+
+    def refresh_object(self, obj):
+        self.wake(obj)
+        bodies = self.bodies
+        bodies.kinds[obj.slot], bodies.extents[:, obj.slot] = body_shape(obj)
+        bodies.solid[obj.slot] = is_solid(obj)
+        bodies.static[obj.slot] = is_static(obj)
+        self._cell_size = None
+        self.resting = None
+
+    def sleep(self, obj):
+        if obj.sleeping:
+            return
+        self.bodies.velocities[:, obj.slot] = 0
+        self.bodies.sleep_slot(obj.slot)
+        obj.sleeping = True
+        self.resting = None
+
+    def snapshot(self):
+        bodies = self.bodies
+        if self._snapshot_objects is None or self._snapshot_objects[0] != bodies.layout:
+            self._snapshot_objects = (bodies.layout, tuple(bodies.owners))
+        return PhysicsSnapshot(bodies.layout, self._snapshot_objects[1], bodies.positions[:, :bodies.count].copy())
+
+    def read_state(self):
+        bodies = self.bodies
+        n = bodies.count
+        ids = bodies.ids[:n]
+        positions = np.empty((3, n))
+        velocities = np.empty((3, n))
+        for axis in range(3):
+            positions[axis, ids] = bodies.positions[axis, :n]
+            velocities[axis, ids] = bodies.velocities[axis, :n]
+        return positions, velocities
+
+    def write_state(self, positions, velocities):
+        bodies = self.bodies
+        n = bodies.count
+        ids = bodies.ids[:n]
+        for axis in range(3):
+            bodies.positions[axis, :n] = positions[axis, ids]
+            bodies.velocities[axis, :n] = velocities[axis, ids]
+        for obj in bodies.owners[bodies.awake:n]:
+            obj.sleeping = False
+        bodies.wake_all()
+        self.resting = None
+
+    def _auto_cell_size(self):
+        bodies = self.bodies
+        n = bodies.count
+        dynamic = bodies.solid[:n] & ~bodies.static[:n]
+        return float(bodies.extents[:, :n][:, dynamic].max()) * 2 if dynamic.any() else 100.0
+
+    def _step(self, dt):
+        n = self.bodies.awake
+        if n == 0:
+            return
+        pos = self.bodies.positions[:, :n]
+        vel = self.bodies.velocities[:, :n]
+        delta = self.bodies.scratch[:, :n]
+
+        vel[1] += GRAVITY * dt
+        np.multiply(vel, dt, out=delta)
+        pos += delta
+
+        grounded = pos[1] < 0
+        pos[1][grounded] = 0
+        vel[1][grounded] = 0
+
+        walled = (pos[0] < WORLD_MIN_X) | (pos[0] > WORLD_MAX_X)
+        np.clip(pos[0], WORLD_MIN_X, WORLD_MAX_X, out=pos[0])
+        vel[0][walled] = 0
+
+        if self.collisions_enabled:
+            self._collide()
+        if self.sleeping_enabled:
+            self._update_sleep()
+
+    def _collide(self):
+        self.collisions.run_arrays(self.cell_size(), self._find_slot_pairs, self.bodies, self._wake_pairs)
+
+    def _find_pairs(self, cell_size):
+        owners = self.bodies.owners
+        first, second = self._find_slot_pairs(cell_size)
+        return [(owners[i], owners[j]) for i, j in zip(first.tolist(), second.tolist())]
+
+    def _find_slot_pairs(self, cell_size):
+        bodies = self.bodies
+        n = bodies.count
+        awake = bodies.awake
+        positions = bodies.positions[:, :n]
+        extents = bodies.extents[:, :n]
+        solid = bodies.solid[:n]
+        first, second = grid_pairs(positions[:, :awake], extents[:, :awake], solid[:awake], cell_size)
+        if n > awake:
+            if self.resting is None or self.resting.cell_size != cell_size:
+                self.resting = GridIndex(np.arange(awake, n), positions, extents, solid, cell_size)
+            more = self.resting.query(np.arange(awake), positions, extents, solid)
+            first, second = np.concatenate((first, more[0])), np.concatenate((second, more[1]))
+        return first, second
+
+    def _wake_pairs(self, first, second, slots):
+        bodies = self.bodies
+        involved = np.unique(np.concatenate((first, second)))
+        objects = [bodies.owners[i] for i in involved.tolist()]
+        for i in np.unique(slots).tolist():
+            if not bodies.static[i]:
+                self.wake(bodies.owners[i])
+        moved = np.array([obj.slot for obj in objects], dtype=np.int64)
+        return moved[np.searchsorted(involved, first)], moved[np.searchsorted(involved, second)]
+
+    def _update_sleep(self):
+        bodies = self.bodies
+        n = bodies.awake
+        vel = bodies.velocities[:, :n]
+        rest = bodies.rest_steps[:n]
+        still = np.einsum("ij,ij->j", vel, vel) < SLEEP_SPEED * SLEEP_SPEED
+        rest += still
+        rest[~still] = 0
+        settled = np.flatnonzero(rest >= self.sleep_steps)
+        for obj in [bodies.owners[i] for i in settled.tolist()]:
+            self.sleep(obj)
+
+class PhysicsSnapshot:
+    def __init__(self, layout, objects, positions):
+        self.layout = layout
+        self.objects = objects
+        self.positions = positions
+        self.time = time.perf_counter()
+
+    def blend(self, previous, alpha):
+        same = previous is not None and previous.objects is self.objects
+        if np is not None and isinstance(self.positions, np.ndarray):
+            if same:
+                return (previous.positions + (self.positions - previous.positions) * alpha).T.tolist()
+            return self.positions.T.tolist()
+        if not same:
+            return self.positions
+        return [(px + (x - px) * alpha, py + (y - py) * alpha, pz + (z - pz) * alpha)
+                for (px, py, pz), (x, y, z) in zip(previous.positions, self.positions)]
+
+class PositionReader:
+    def __init__(self, objects):
+        self.objects = objects
+        self.body = None
+        self.layout = None
+        self.slots = None
+
+    def read(self, positions=None):
+        if positions is not None:
+            return np.array([positions.get(o) or tuple(o.position) for o in self.objects], dtype=np.float64).reshape(-1, 3)
+        body = self.body
+        if body is None or body.layout != self.layout:
+            body = self.objects[0].body if self.objects else None
+            if body is not None and all(o.body is body for o in self.objects):
+                self.slots = np.array([o.slot for o in self.objects], dtype=np.int64)
+                self.layout = body.layout
+            else:
+                body = None
+            self.body = body
+        if body is not None:
+            return body.positions[:, self.slots].T
+        return np.array([tuple(o.position) for o in self.objects], dtype=np.float64).reshape(-1, 3)
+
+class PhysicsThread:
+    def __init__(self, physics, step=PHYSICS_STEP, max_catchup=MAX_CATCHUP_STEPS):
+        self.physics = physics
+        self.step = step
+        self.max_catchup = max_catchup
+        self.enabled = True
+        self.lock = threading.RLock()
+        self.snapshots = (None, None)
+        self.ticks = 0
+        self.dropped_steps = 0
+        self._dirty = True
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="physics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    @contextmanager
+    def synchronized(self):
+        with self.lock:
+            yield self.physics
+            self._dirty = True
+
+    def interpolated_positions(self):
+        previous, current = self.snapshots
+        if current is None:
+            return None
+        alpha = min(1.0, (time.perf_counter() - current.time) / self.step)
+        return dict(zip(current.objects, current.blend(previous, alpha)))
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if now < next_tick:
+                self._stop.wait(next_tick - now)
+                continue
+            due = int((now - next_tick) / self.step) + 1
+            steps = min(due, self.max_catchup)
+            with self.lock:
+                if self.enabled:
+                    for _ in range(steps):
+                        self.physics.step(self.step)
+                if self.enabled or self._dirty:
+                    self._publish()
+            self.ticks += steps
+            next_tick += steps * self.step
+            if due > steps:
+                self.dropped_steps += due - steps
+                next_tick = now + self.step
+
+    def _publish(self):
+        self._dirty = False
+        snapshot = self.physics.snapshot()
+        self.snapshots = (self.snapshots[1], snapshot)
+
+def create_physics_engine(backend="auto"):
+    if backend == "auto":
+        backend = "numpy" if np is not None else "python"
+    if backend == "numpy":
+        if np is None:
+            raise RuntimeError("NumPy physics backend requested but numpy is not installed")
+        return ArrayPhysicsEngine()
+    return PhysicsEngine()
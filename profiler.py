@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from contextlib import nullcontext
+
+FRAME_HISTORY = 240
+TRACE_EVENTS = 200000
+NULL_SCOPE = nullcontext()
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+class Profiler:
+    def __init__(self, history=FRAME_HISTORY, trace_events=TRACE_EVENTS):
+        self.enabled = False
+        self.history = history
+        self.frames = array('d', [0.0] * history)
+        self.stages = {}
+        self.frame_count = 0
+        self.frame_start = None
+        self.current = {}
+        self.events = deque(maxlen=trace_events)
+        self.origin = time.perf_counter()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.frame_start = None
+        self.current = {}
+        return self.enabled
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return _Scope(self, name)
+
+    def record(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + end - start
+        self.events.append((name, start, end, threading.get_ident()))
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self._end_frame(now)
+        self.frame_start = now
+
+    def _end_frame(self, now):
+        slot = self.frame_count % self.history
+        self.frames[slot] = now - self.frame_start
+        for name in self.stages.keys() | self.current.keys():
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = array('d', [0.0] * self.history)
+            stage[slot] = self.current.get(name, 0.0)
+        self.events.append(("frame", self.frame_start, now, threading.get_ident()))
+        self.current = {}
+        self.frame_count += 1
+
+    def frame_times(self):
+        count = min(self.frame_count, self.history)
+        start = self.frame_count - count
+        return [self.frames[(start + i) % self.history] for i in range(count)]
+
+    def percentiles(self, points=(50, 95, 99)):
+        times = sorted(self.frame_times())
+        if not times:
+            return {point: 0.0 for point in points}
+        return {point: times[min(len(times) - 1, int(len(times) * point / 100))] for point in points}
+
+    def stage_means(self):
+        count = min(self.frame_count, self.history)
+        if count == 0:
+            return {}
+        return {name: sum(stage[:count]) / count for name, stage in self.stages.items()}
+
+    def trace(self):
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6,
+                   "pid": pid, "tid": tid, "cat": "frame" if name == "frame" else "stage"}
+                  for name, start, end, tid in list(self.events)]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_trace(self, path=None):
+        path = path or time.strftime("trace-%Y%m%d-%H%M%S.json")
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+        return path
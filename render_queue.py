@@ -0,0 +1,113 @@
+from OpenGL.GL import *
+from camera import view_matrix
+
+PRIMITIVES = ("cube", "sphere", "plane", "cylinder", "light")
+SORT_SUBSET_FRACTION = 0.25
+
+def primitive_kind(obj):
+    kind = obj.type.lower()
+    return kind if kind in PRIMITIVES else "cube"
+
+def is_blended(obj):
+    return obj.emissive > 0 and obj.type.lower() == "light"
+
+def state_key(obj):
+    return primitive_kind(obj), obj.texture or "", obj.material, is_blended(obj)
+
+class RenderQueue:
+    def __init__(self):
+        self.objects = []
+        self.keys = []
+        self.opaque = []
+        self.blended = []
+        self.key = None
+        self.color = None
+        self.texture = None
+        self.textured = False
+        self.draw_calls = 0
+        self.state_changes = 0
+
+    def invalidate(self):
+        self.objects = []
+
+    def refresh(self, objects):
+        if objects:
+            self.invalidate()
+
+    def draw(self, scene, indices, positions=None, details=None, camera=None, use_textures=True):
+        objects = scene.objects
+        if objects != self.objects:
+            self._rebuild(objects)
+        opaque = self._select(self.opaque, indices)
+        blended = self._select(self.blended, indices)
+        self.key = None
+        self.color = None
+        self.draw_calls = 0
+        self.state_changes = 0
+        self._pass(scene, opaque, positions, details, use_textures, False)
+        if blended:
+            if camera is not None:
+                row = view_matrix(camera)[2]
+                depths = {}
+                for i in blended:
+                    obj = objects[i]
+                    x, y, z = (positions.get(obj) if positions else None) or obj.position
+                    depths[i] = row[0] * x + row[1] * y + row[2] * z
+                blended.sort(key=depths.__getitem__)
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+            glDepthMask(GL_FALSE)
+            self._pass(scene, blended, positions, details, use_textures, True)
+            glDepthMask(GL_TRUE)
+            glDisable(GL_BLEND)
+            self.state_changes += 2
+        self._bind(scene.textures, None, False)
+
+    def _rebuild(self, objects):
+        self.keys = [state_key(obj) for obj in objects]
+        order = sorted(range(len(objects)), key=self.keys.__getitem__)
+        self.opaque = [i for i in order if not self.keys[i][3]]
+        self.blended = [i for i in order if self.keys[i][3]]
+        self.objects = list(objects)
+
+    def _select(self, order, indices):
+        if len(indices) == len(self.objects):
+            return list(order)
+        if len(indices) < len(self.objects) * SORT_SUBSET_FRACTION:
+            blended = order is self.blended
+            return sorted((i for i in indices if self.keys[i][3] == blended), key=self.keys.__getitem__)
+        mask = bytearray(len(self.objects))
+        for i in indices:
+            mask[i] = 1
+        return [i for i in order if mask[i]]
+
+    def _pass(self, scene, order, positions, details, use_textures, blended):
+        objects = scene.objects
+        for i in order:
+            obj = objects[i]
+            key = self.keys[i]
+            if key != self.key:
+                self.key = key
+                self.state_changes += 1
+                texture = scene.texture_for(obj) if use_textures and key[1] else None
+                self._bind(scene.textures, texture, key[0] == "plane")
+            color = obj.color
+            if blended:
+                glColor4f(*color, obj.emissive)
+            elif color != self.color:
+                glColor3f(*color)
+                self.color = color
+            position = positions.get(obj) if positions else None
+            if details is None:
+                obj.draw_geometry(position)
+            else:
+                obj.draw_geometry(position, int(details[i]))
+            self.draw_calls += 1
+
+    def _bind(self, textures, texture, planar):
+        if self.texture == (texture, planar):
+            return
+        if self.textured:
+            textures.end_object()
+        self.textured = texture is not None and textures.begin_object(texture, planar)
+        self.texture = (texture, planar)
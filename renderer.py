@@ -3,10 +3,23 @@ from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
 import time
+from camera import FIELD_OF_VIEW, NEAR_PLANE, FAR_PLANE, ORTHO_VIEW_SIZE, ORTHO_DEPTH
+from profiler import Profiler
+from pacing import FramePacer
+from physics import PHYSICS_STEP
+
+GRAPH_WIDTH = 240
+GRAPH_HEIGHT = 80
+GRAPH_MAX_MS = 50.0
+PICK_SLOP = 4
+HUD_LINE_HEIGHT = 20
 
 class RenderEngine:
-    def __init__(self, scene_renderer, width=800, height=600, hotkeys=None):
+    def __init__(self, scene_renderer, width=800, height=600, hotkeys=None, physics=None, profiler=None, pacer=None):
         self.scene_renderer = scene_renderer
+        self.physics = physics
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.pacer = pacer if pacer is not None else FramePacer()
         self.width = width
         self.height = height
         self.window = None
@@ -22,6 +35,8 @@ class RenderEngine:
         self.mouse_x = 0
         self.mouse_y = 0
         self.mouse_dragging = False
+        self.click_x = 0
+        self.click_y = 0
         self.middle_mouse_dragging = False
         self.fps_counter = 0
         self.fps_time = time.time()
@@ -37,15 +52,8 @@ class RenderEngine:
             glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGBA | GLUT_DEPTH)
             glutInitWindowSize(self.width, self.height)
             self.window = glutCreateWindow(b"CleEngine")
-            glClearColor(0.1, 0.1, 0.1, 1.0)
-            glEnable(GL_DEPTH_TEST)
-            glEnable(GL_COLOR_MATERIAL)
-            glEnable(GL_NORMALIZE)
-            self.setup_lighting()
-            self.set_projection()
-            glMatrixMode(GL_MODELVIEW)
+            self.setup_gl()
             glutDisplayFunc(self.display)
-            glutIdleFunc(self.display)
             glutReshapeFunc(self.reshape)
             glutMouseFunc(self.mouse_click)
             glutMotionFunc(self.mouse_motion)
@@ -57,15 +65,24 @@ class RenderEngine:
             print(f"Error initializing OpenGL: {e}")
             self.should_close_flag = True
 
+    def setup_gl(self):
+        glClearColor(0.1, 0.1, 0.1, 1.0)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_COLOR_MATERIAL)
+        glEnable(GL_NORMALIZE)
+        self.setup_lighting()
+        self.set_projection()
+        glMatrixMode(GL_MODELVIEW)
+
     def set_projection(self):
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
         aspect = self.width / self.height if self.height != 0 else 1
         if self.ortho_mode:
-            view_size = 1000
-            glOrtho(-view_size * aspect, view_size * aspect, -view_size, view_size, -10000, 10000)
+            view_size = ORTHO_VIEW_SIZE
+            glOrtho(-view_size * aspect, view_size * aspect, -view_size, view_size, -ORTHO_DEPTH, ORTHO_DEPTH)
         else:
-            gluPerspective(45, aspect, 0.1, 10000.0)
+            gluPerspective(FIELD_OF_VIEW, aspect, NEAR_PLANE, FAR_PLANE)
         glMatrixMode(GL_MODELVIEW)
 
     def setup_lighting(self):
@@ -83,16 +100,7 @@ class RenderEngine:
         if not self.initialized:
             return
         try:
-            glViewport(0, 0, self.width, self.height)
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-            glLoadIdentity()
-            glTranslatef(-self.camera_pos_x, -self.camera_pos_y, -self.camera_distance - self.camera_pos_z)
-            glRotatef(self.camera_rot_x, 1, 0, 0)
-            glRotatef(self.camera_rot_y, 0, 1, 0)
-            self.setup_lighting()
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE if self.wireframe_mode else GL_FILL)
-            self.scene_renderer.draw_scene(window_width=self.width, window_height=self.height)
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            self.draw_world()
             glDisable(GL_LIGHTING)
             glMatrixMode(GL_PROJECTION)
             glPushMatrix()
@@ -101,39 +109,122 @@ class RenderEngine:
             glMatrixMode(GL_MODELVIEW)
             glPushMatrix()
             glLoadIdentity()
-            self.scene_renderer.draw_buttons(self.width, self.height)
-            self.draw_debug_info()
+            with self.profiler.scope("draw_buttons"):
+                self.scene_renderer.draw_buttons(self.width, self.height)
+            with self.profiler.scope("draw_debug_info"):
+                self.draw_debug_info()
+                if self.profiler.enabled:
+                    self.draw_frame_graph()
             glMatrixMode(GL_MODELVIEW)
             glPopMatrix()
             glMatrixMode(GL_PROJECTION)
             glPopMatrix()
             glMatrixMode(GL_MODELVIEW)
-            glutSwapBuffers()
+            with self.profiler.scope("swap"):
+                glutSwapBuffers()
         except Exception as e:
             print(f"Error in display: {e}")
             self.should_close_flag = True
 
+    def draw_world(self):
+        glViewport(0, 0, self.width, self.height)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glLoadIdentity()
+        glTranslatef(-self.camera_pos_x, -self.camera_pos_y, -self.camera_distance - self.camera_pos_z)
+        glRotatef(self.camera_rot_x, 1, 0, 0)
+        glRotatef(self.camera_rot_y, 0, 1, 0)
+        self.setup_lighting()
+        glPolygonMode(GL_FRONT_AND_BACK, GL_LINE if self.wireframe_mode else GL_FILL)
+        with self.profiler.scope("draw_scene"):
+            self.scene_renderer.draw_scene(window_width=self.width, window_height=self.height, camera=self)
+        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+
     def draw_debug_info(self):
-        glColor3f(1.0, 1.0, 1.0)
-        glRasterPos2f(10, self.height - 20)
-        glutBitmapString(GLUT_BITMAP_9_BY_15, f"FPS: {self.current_fps}".encode())
-        glRasterPos2f(10, self.height - 40)
-        glutBitmapString(GLUT_BITMAP_9_BY_15, f"OBJECTS: {len(self.scene_renderer.objects)}".encode())
-        glRasterPos2f(10, self.height - 60)
-        glutBitmapString(GLUT_BITMAP_9_BY_15, f"SCENE: {self.scene_renderer.scene_name if hasattr(self.scene_renderer, 'scene_name') else 'None'}".encode())
-        glRasterPos2f(10, self.height - 80)
-        glutBitmapString(GLUT_BITMAP_9_BY_15, f"XYZ CAMERA: {self.camera_pos_x:.1f}, {self.camera_pos_y:.1f}, {self.camera_pos_z:.1f}".encode())
-        glRasterPos2f(10, self.height - 100)
+        lines = [f"FPS: {self.current_fps}",
+                 f"OBJECTS: {len(self.scene_renderer.objects)}",
+                 f"SCENE: {self.scene_renderer.scene_name if hasattr(self.scene_renderer, 'scene_name') else 'None'}",
+                 f"XYZ CAMERA: {self.camera_pos_x:.1f}, {self.camera_pos_y:.1f}, {self.camera_pos_z:.1f}"]
         physics_status = "ON" if hasattr(self.scene_renderer, 'physics_enabled') and self.scene_renderer.physics_enabled else "OFF"
-        glutBitmapString(GLUT_BITMAP_9_BY_15, f"PHYSICS: {physics_status}".encode())
+        lines.append(f"PHYSICS: {physics_status}")
+        if self.physics is not None:
+            lines.append(f"BODIES: {self.physics.awake_count} awake / {self.physics.sleeping_count} sleeping")
+        lines.append(f"VISIBLE: {self.scene_renderer.visible_count} / {len(self.scene_renderer.objects)}")
+        lod = getattr(self.scene_renderer, 'lod', None)
+        if lod is not None and self.scene_renderer.use_lod:
+            levels = " ".join(f"{detail}:{count}" for detail, count in zip(lod.details.tolist(), lod.counts))
+            lines.append(f"LOD: {levels}")
+        textures = getattr(self.scene_renderer, 'textures', None)
+        if textures is not None:
+            lines.append(f"TEXTURES: {len(textures.textures)} ({textures.pending} pending, {textures.gpu_bytes / 1048576:.1f} MB)")
+        lines.append(self.pacing_info())
+        history = getattr(self.physics, 'history', None)
+        if history is not None:
+            seconds = (history.newest_tick - history.oldest_tick) * PHYSICS_STEP
+            lines.append(f"HISTORY: {seconds:.1f} s, tick {self.physics.tick}, {history.memory / 1048576:.1f} MB")
+        streamer = getattr(self.scene_renderer, 'streamer', None)
+        if streamer is not None and streamer.active:
+            lines.append(f"STREAMING: {streamer.loaded} chunks loaded, {streamer.pending} loading, {len(streamer.counts)} total")
+        selected = getattr(self.scene_renderer, 'selected', None)
+        if selected is not None:
+            lines.append(f"SELECTED: {selected.name} ({selected.type})")
+        lines.append(f"DRAWS: {self.scene_renderer.draw_calls} calls, {self.scene_renderer.state_changes} state changes")
+        glColor3f(1.0, 1.0, 1.0)
+        for line, text in enumerate(lines, 1):
+            glRasterPos2f(10, self.height - HUD_LINE_HEIGHT * line)
+            glutBitmapString(GLUT_BITMAP_9_BY_15, text.encode())
+
+    def pacing_info(self):
+        pacer = self.pacer
+        average, worst = pacer.jitter()
+        cap = f"{pacer.target_fps:.0f} FPS cap" if pacer.period else "uncapped"
+        mode = f", on demand ({pacer.skipped} skipped)" if pacer.on_demand else ""
+        return f"PACING: {cap}{mode}, jitter {average * 1000:.2f} / p99 {worst * 1000:.2f} ms"
+
+    def draw_frame_graph(self):
+        times = self.profiler.frame_times()
+        x0 = self.width - GRAPH_WIDTH - 10
+        y0 = 10
+        glColor3f(0.15, 0.15, 0.15)
+        glBegin(GL_LINE_LOOP)
+        glVertex2f(x0, y0)
+        glVertex2f(x0 + GRAPH_WIDTH, y0)
+        glVertex2f(x0 + GRAPH_WIDTH, y0 + GRAPH_HEIGHT)
+        glVertex2f(x0, y0 + GRAPH_HEIGHT)
+        glEnd()
+        for budget, color in ((1000 / 60, (0.2, 0.6, 0.2)), (1000 / 30, (0.6, 0.5, 0.1))):
+            y = y0 + GRAPH_HEIGHT * budget / GRAPH_MAX_MS
+            glColor3f(*color)
+            glBegin(GL_LINES)
+            glVertex2f(x0, y)
+            glVertex2f(x0 + GRAPH_WIDTH, y)
+            glEnd()
+        if times:
+            step = GRAPH_WIDTH / max(len(times) - 1, 1)
+            glColor3f(1.0, 1.0, 1.0)
+            glBegin(GL_LINE_STRIP)
+            for i, frame in enumerate(times):
+                glVertex2f(x0 + i * step, y0 + GRAPH_HEIGHT * min(frame * 1000 / GRAPH_MAX_MS, 1.0))
+            glEnd()
+        stats = self.profiler.percentiles()
+        lines = [f"FRAME p50 {stats[50] * 1000:.1f} p95 {stats[95] * 1000:.1f} p99 {stats[99] * 1000:.1f} ms"]
+        lines += [f"{name}: {mean * 1000:.2f} ms" for name, mean in sorted(self.profiler.stage_means().items())]
+        glColor3f(1.0, 1.0, 1.0)
+        for i, line in enumerate(lines):
+            glRasterPos2f(x0, y0 + GRAPH_HEIGHT + 10 + 18 * (len(lines) - 1 - i))
+            glutBitmapString(GLUT_BITMAP_9_BY_15, line.encode())
+
+    def request_redraw(self):
+        self.pacer.request_redraw()
 
     def reshape(self, width, height):
         self.width = width
         self.height = height
+        self.request_redraw()
         glViewport(0, 0, width, height)
         self.set_projection()
 
     def mouse_click(self, button, state, x, y):
+        self.request_redraw()
         if button == GLUT_LEFT_BUTTON:
             if state == GLUT_DOWN:
                 py = self.height - y
@@ -142,7 +233,11 @@ class RenderEngine:
                 self.mouse_dragging = True
                 self.mouse_x = x
                 self.mouse_y = y
+                self.click_x = x
+                self.click_y = y
             else:
+                if self.mouse_dragging and abs(x - self.click_x) + abs(y - self.click_y) <= PICK_SLOP:
+                    self.pick_object(x, y)
                 self.mouse_dragging = False
         elif button == GLUT_MIDDLE_BUTTON:
             if state == GLUT_DOWN:
@@ -152,6 +247,12 @@ class RenderEngine:
             else:
                 self.middle_mouse_dragging = False
 
+    def pick_object(self, x, y):
+        obj, distance = self.scene_renderer.pick(self, x, y)
+        self.scene_renderer.selected = obj
+        if obj is not None:
+            print(f"Picked: {obj.name} ({obj.type}) at {tuple(round(float(v), 1) for v in obj.position)}, distance {distance:.1f}")
+
     def mouse_motion(self, x, y):
         if self.mouse_dragging:
             dx = x - self.mouse_x
@@ -168,8 +269,12 @@ class RenderEngine:
             self.camera_pos_y += dy * 5.0
             self.mouse_x = x
             self.mouse_y = y
+        else:
+            return
+        self.request_redraw()
 
     def keyboard_down(self, key, x, y):
+        self.request_redraw()
         if self.hotkeys:
             try:
                 self.hotkeys.handle(key.decode())
@@ -1,190 +1,224 @@
 import zipfile
-import io
-from PIL import Image
+import os
+import threading
 from OpenGL.GL import *
 import math
+from instancing import InstancedRenderer
+from render_queue import RenderQueue, primitive_kind
+from camera import frustum_planes, pick_ray
+from scene_registry import SceneRegistry
+from scene_store import ObjectHandle
+from textures import TextureManager
+try:
+    from bvh import FrustumCuller
+    from lod import LodSelector
+    from physics import PositionReader
+except ImportError:
+    FrustumCuller = None
+    LodSelector = None
 
-class SceneObject:
-    def __init__(self, name, obj_type, position, scale, color=(1.0, 1.0, 1.0), texture=None, material="default", emissive=0.0):
-        self.name = name
-        self.type = obj_type
-        self.position = position
-        self.scale = scale
-        self.color = color
-        self.texture = texture
-        self.material = material
-        self.emissive = emissive
-        self.velocity = (0.0, 0.0, 0.0)
-        self.texture_id = None
+def _emit_cube(detail):
+    glBegin(GL_QUADS)
+    glNormal3f(0, 0, 1)
+    glVertex3f(-0.5, -0.5, 0.5)
+    glVertex3f(0.5, -0.5, 0.5)
+    glVertex3f(0.5, 0.5, 0.5)
+    glVertex3f(-0.5, 0.5, 0.5)
 
-    def draw(self, renderer=None):
-        x, y, z = self.position
-        size = max(self.scale) * 100
-        
+    glNormal3f(0, 0, -1)
+    glVertex3f(-0.5, -0.5, -0.5)
+    glVertex3f(0.5, -0.5, -0.5)
+    glVertex3f(0.5, 0.5, -0.5)
+    glVertex3f(-0.5, 0.5, -0.5)
+
+    glNormal3f(0, 1, 0)
+    glVertex3f(-0.5, 0.5, -0.5)
+    glVertex3f(0.5, 0.5, -0.5)
+    glVertex3f(0.5, 0.5, 0.5)
+    glVertex3f(-0.5, 0.5, 0.5)
+
+    glNormal3f(0, -1, 0)
+    glVertex3f(-0.5, -0.5, -0.5)
+    glVertex3f(0.5, -0.5, -0.5)
+    glVertex3f(0.5, -0.5, 0.5)
+    glVertex3f(-0.5, -0.5, 0.5)
+
+    glNormal3f(-1, 0, 0)
+    glVertex3f(-0.5, -0.5, -0.5)
+    glVertex3f(-0.5, 0.5, -0.5)
+    glVertex3f(-0.5, 0.5, 0.5)
+    glVertex3f(-0.5, -0.5, 0.5)
+
+    glNormal3f(1, 0, 0)
+    glVertex3f(0.5, -0.5, -0.5)
+    glVertex3f(0.5, 0.5, -0.5)
+    glVertex3f(0.5, 0.5, 0.5)
+    glVertex3f(0.5, -0.5, 0.5)
+    glEnd()
+
+def _emit_sphere(detail):
+    slices = detail
+    stacks = detail
+    for i in range(stacks):
+        lat0 = math.pi * (-0.5 + float(i) / stacks)
+        z0 = math.sin(lat0)
+        zr0 = math.cos(lat0)
+        lat1 = math.pi * (-0.5 + float(i + 1) / stacks)
+        z1 = math.sin(lat1)
+        zr1 = math.cos(lat1)
+        glBegin(GL_QUAD_STRIP)
+        for j in range(slices + 1):
+            lng = 2 * math.pi * float(j) / slices
+            x = math.cos(lng)
+            y = math.sin(lng)
+            glNormal3f(x * zr0, y * zr0, z0)
+            glVertex3f(x * zr0 * 0.5, y * zr0 * 0.5, z0 * 0.5)
+            glNormal3f(x * zr1, y * zr1, z1)
+            glVertex3f(x * zr1 * 0.5, y * zr1 * 0.5, z1 * 0.5)
+        glEnd()
+
+def _emit_plane(detail):
+    glBegin(GL_QUADS)
+    glNormal3f(0, 1, 0)
+    glVertex3f(-0.5, 0, -0.5)
+    glVertex3f(0.5, 0, -0.5)
+    glVertex3f(0.5, 0, 0.5)
+    glVertex3f(-0.5, 0, 0.5)
+    glEnd()
+
+def _emit_cylinder(detail):
+    slices = detail
+    glBegin(GL_QUAD_STRIP)
+    for i in range(slices + 1):
+        angle = 2 * math.pi * i / slices
+        x = math.cos(angle) * 0.5
+        z = math.sin(angle) * 0.5
+        glNormal3f(x, 0, z)
+        glVertex3f(x, -0.5, z)
+        glVertex3f(x, 0.5, z)
+    glEnd()
+
+    glBegin(GL_TRIANGLE_FAN)
+    glNormal3f(0, 1, 0)
+    glVertex3f(0, 0.5, 0)
+    for i in range(slices + 1):
+        angle = 2 * math.pi * i / slices
+        x = math.cos(angle) * 0.5
+        z = math.sin(angle) * 0.5
+        glVertex3f(x, 0.5, z)
+    glEnd()
+
+    glBegin(GL_TRIANGLE_FAN)
+    glNormal3f(0, -1, 0)
+    glVertex3f(0, -0.5, 0)
+    for i in range(slices + 1):
+        angle = 2 * math.pi * i / slices
+        x = math.cos(angle) * 0.5
+        z = math.sin(angle) * 0.5
+        glVertex3f(x, -0.5, z)
+    glEnd()
+
+DEFAULT_DETAIL = 16
+
+MESH_BUILDERS = {
+    "cube": _emit_cube,
+    "sphere": _emit_sphere,
+    "plane": _emit_plane,
+    "cylinder": _emit_cylinder,
+}
+
+class GeometryCache:
+    def __init__(self):
+        self.lists = {}
+
+    def get(self, kind, detail=DEFAULT_DETAIL):
+        key = (kind, detail)
+        list_id = self.lists.get(key)
+        if list_id is None:
+            list_id = glGenLists(1)
+            glNewList(list_id, GL_COMPILE)
+            MESH_BUILDERS[kind](detail)
+            glEndList()
+            self.lists[key] = list_id
+        return list_id
+
+    def draw(self, kind, detail=DEFAULT_DETAIL):
+        glCallList(self.get(kind, detail))
+
+    def release(self):
+        for list_id in self.lists.values():
+            glDeleteLists(list_id, 1)
+        self.lists.clear()
+
+geometry_cache = GeometryCache()
+
+class SceneObject(ObjectHandle):
+    __slots__ = ()
+
+    def draw(self, renderer=None, position=None, detail=DEFAULT_DETAIL):
         glColor3f(*self.color)
+        if primitive_kind(self) == "light":
+            self.draw_light(position, detail)
+        else:
+            self.draw_geometry(position, detail)
+
+    def draw_geometry(self, position=None, detail=DEFAULT_DETAIL):
+        x, y, z = self.position if position is None else position
+        size = max(self.scale) * 100
         glPushMatrix()
         glTranslatef(x, y, z)
         glScalef(size, size, size)
-        
-        if self.type.lower() == "cube":
-            self.draw_cube()
-        elif self.type.lower() == "sphere":
-            self.draw_sphere()
-        elif self.type.lower() == "plane":
+        kind = primitive_kind(self)
+        if kind == "sphere" or kind == "light":
+            self.draw_sphere(detail)
+        elif kind == "plane":
             self.draw_plane()
-        elif self.type.lower() == "cylinder":
-            self.draw_cylinder()
-        elif self.type.lower() == "light":
-            self.draw_light()
+        elif kind == "cylinder":
+            self.draw_cylinder(detail)
         else:
             self.draw_cube()
-        
         glPopMatrix()
 
     def draw_cube(self):
-        glBegin(GL_QUADS)
-        glNormal3f(0, 0, 1)
-        glVertex3f(-0.5, -0.5, 0.5)
-        glVertex3f(0.5, -0.5, 0.5)
-        glVertex3f(0.5, 0.5, 0.5)
-        glVertex3f(-0.5, 0.5, 0.5)
-        
-        glNormal3f(0, 0, -1)
-        glVertex3f(-0.5, -0.5, -0.5)
-        glVertex3f(0.5, -0.5, -0.5)
-        glVertex3f(0.5, 0.5, -0.5)
-        glVertex3f(-0.5, 0.5, -0.5)
-        
-        glNormal3f(0, 1, 0)
-        glVertex3f(-0.5, 0.5, -0.5)
-        glVertex3f(0.5, 0.5, -0.5)
-        glVertex3f(0.5, 0.5, 0.5)
-        glVertex3f(-0.5, 0.5, 0.5)
-        
-        glNormal3f(0, -1, 0)
-        glVertex3f(-0.5, -0.5, -0.5)
-        glVertex3f(0.5, -0.5, -0.5)
-        glVertex3f(0.5, -0.5, 0.5)
-        glVertex3f(-0.5, -0.5, 0.5)
-        
-        glNormal3f(-1, 0, 0)
-        glVertex3f(-0.5, -0.5, -0.5)
-        glVertex3f(-0.5, 0.5, -0.5)
-        glVertex3f(-0.5, 0.5, 0.5)
-        glVertex3f(-0.5, -0.5, 0.5)
-        
-        glNormal3f(1, 0, 0)
-        glVertex3f(0.5, -0.5, -0.5)
-        glVertex3f(0.5, 0.5, -0.5)
-        glVertex3f(0.5, 0.5, 0.5)
-        glVertex3f(0.5, -0.5, 0.5)
-        glEnd()
+        geometry_cache.draw("cube")
 
-    def draw_sphere(self):
-        slices = 16
-        stacks = 16
-        for i in range(stacks):
-            lat0 = math.pi * (-0.5 + float(i) / stacks)
-            z0 = math.sin(lat0)
-            zr0 = math.cos(lat0)
-            lat1 = math.pi * (-0.5 + float(i + 1) / stacks)
-            z1 = math.sin(lat1)
-            zr1 = math.cos(lat1)
-            glBegin(GL_QUAD_STRIP)
-            for j in range(slices + 1):
-                lng = 2 * math.pi * float(j) / slices
-                x = math.cos(lng)
-                y = math.sin(lng)
-                glNormal3f(x * zr0, y * zr0, z0)
-                glVertex3f(x * zr0 * 0.5, y * zr0 * 0.5, z0 * 0.5)
-                glNormal3f(x * zr1, y * zr1, z1)
-                glVertex3f(x * zr1 * 0.5, y * zr1 * 0.5, z1 * 0.5)
-            glEnd()
+    def draw_sphere(self, detail=DEFAULT_DETAIL):
+        geometry_cache.draw("sphere", detail)
 
     def draw_plane(self):
-        glBegin(GL_QUADS)
-        glNormal3f(0, 1, 0)
-        glVertex3f(-0.5, 0, -0.5)
-        glVertex3f(0.5, 0, -0.5)
-        glVertex3f(0.5, 0, 0.5)
-        glVertex3f(-0.5, 0, 0.5)
-        glEnd()
+        geometry_cache.draw("plane")
 
-    def draw_cylinder(self):
-        slices = 16
-        glBegin(GL_QUAD_STRIP)
-        for i in range(slices + 1):
-            angle = 2 * math.pi * i / slices
-            x = math.cos(angle) * 0.5
-            z = math.sin(angle) * 0.5
-            glNormal3f(x, 0, z)
-            glVertex3f(x, -0.5, z)
-            glVertex3f(x, 0.5, z)
-        glEnd()
-        
-        glBegin(GL_TRIANGLE_FAN)
-        glNormal3f(0, 1, 0)
-        glVertex3f(0, 0.5, 0)
-        for i in range(slices + 1):
-            angle = 2 * math.pi * i / slices
-            x = math.cos(angle) * 0.5
-            z = math.sin(angle) * 0.5
-            glVertex3f(x, 0.5, z)
-        glEnd()
-        
-        glBegin(GL_TRIANGLE_FAN)
-        glNormal3f(0, -1, 0)
-        glVertex3f(0, -0.5, 0)
-        for i in range(slices + 1):
-            angle = 2 * math.pi * i / slices
-            x = math.cos(angle) * 0.5
-            z = math.sin(angle) * 0.5
-            glVertex3f(x, -0.5, z)
-        glEnd()
+    def draw_cylinder(self, detail=DEFAULT_DETAIL):
+        geometry_cache.draw("cylinder", detail)
 
-    def draw_light(self):
+    def draw_light(self, position=None, detail=DEFAULT_DETAIL):
         if self.emissive > 0:
             glEnable(GL_BLEND)
             glBlendFunc(GL_SRC_ALPHA, GL_ONE)
             glColor4f(*self.color, self.emissive)
-        self.draw_sphere()
+        self.draw_geometry(position, detail)
         if self.emissive > 0:
             glDisable(GL_BLEND)
             glColor3f(*self.color)
 
 class Button:
-    def __init__(self, x, y, width, height, label, image_data, callback=None):
+    def __init__(self, x, y, width, height, label, texture=None, callback=None):
         self.x = x
         self.y = y
         self.width = width
         self.height = height
         self.label = label
         self.callback = callback
-        self.texture_id = self._load_texture(image_data) if image_data else None
-
-    def _load_texture(self, image_data):
-        try:
-            image = Image.open(io.BytesIO(image_data)).convert("RGBA")
-            ix, iy = image.size
-            image_data = image.tobytes("raw", "RGBA", 0, -1)
-            tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ix, iy, 0, GL_RGBA, GL_UNSIGNED_BYTE, image_data)
-            return tex_id
-        except Exception as e:
-            print(f"Warning: Failed to load texture: {e}")
-            return None
+        self.texture = texture
 
-    def draw(self, renderer=None):
+    def draw(self, renderer=None, textures=None):
         button_size = min(self.width, self.height)
         x = self.x
         y = self.y
         use_textures = True
         if renderer and hasattr(renderer, 'use_textures'):
             use_textures = renderer.use_textures
-        if self.texture_id is None or not use_textures:
+        if not use_textures or textures is None or not textures.bind(self.texture):
             glColor3f(0.2, 0.2, 0.2)
             glBegin(GL_QUADS)
             glVertex2f(x, y)
@@ -194,16 +228,15 @@ class Button:
             glEnd()
         else:
             glEnable(GL_TEXTURE_2D)
-            glBindTexture(GL_TEXTURE_2D, self.texture_id)
             glColor3f(1, 1, 1)
             glBegin(GL_QUADS)
-            glTexCoord2f(0, 1)
+            glTexCoord2f(*self.texture.coords(0, 1))
             glVertex2f(x, y)
-            glTexCoord2f(1, 1)
+            glTexCoord2f(*self.texture.coords(1, 1))
             glVertex2f(x + button_size, y)
-            glTexCoord2f(1, 0)
+            glTexCoord2f(*self.texture.coords(1, 0))
             glVertex2f(x + button_size, y + button_size)
-            glTexCoord2f(0, 0)
+            glTexCoord2f(*self.texture.coords(0, 0))
             glVertex2f(x, y + button_size)
             glEnd()
             glDisable(GL_TEXTURE_2D)
@@ -216,29 +249,122 @@ class Button:
 class SceneRenderer:
     def __init__(self):
         self.objects = []
+        self.registry = SceneRegistry()
         self.buttons = []
-        self.assets = zipfile.ZipFile("assets.pack", "r")
+        self.assets = None
+        self.assets_path = "assets.pack"
+        self.assets_lock = threading.Lock()
         self.scene_name = "None"
         self.physics_enabled = False
+        self.simulation = None
+        self.use_instancing = True
+        self.instancing = InstancedRenderer()
+        self.render_queue = RenderQueue()
+        self.draw_calls = 0
+        self.state_changes = 0
+        self.use_culling = FrustumCuller is not None
+        self.culler = FrustumCuller(PositionReader) if FrustumCuller is not None else None
+        self.visible_count = 0
+        self.frame_index = 0
+        self.index_frame = -1
+        self.selected = None
+        self.use_lod = LodSelector is not None
+        self.lod = LodSelector(PositionReader) if LodSelector is not None else None
+        self.textures = TextureManager()
+        self.texture_root = ""
+        self.texture_handles = {}
+
+    def set_texture_root(self, path):
+        self.texture_root = path
+        self.texture_handles = {}
+
+    def texture_for(self, obj):
+        name = obj.texture
+        if not name:
+            return None
+        texture = self.texture_handles.get(name)
+        if texture is None:
+            texture = self.texture_handles[name] = self.textures.load(os.path.join(self.texture_root, name))
+        return texture
+
+    def refresh_objects(self, objects):
+        self.instancing.refresh(objects)
+        self.render_queue.refresh(objects)
+        if self.culler is not None:
+            self.culler.refresh(objects)
+        if self.lod is not None:
+            self.lod.refresh(objects)
+
+    def spatial_index(self):
+        if self.culler is None:
+            return None
+        if self.index_frame != self.frame_index:
+            self.culler.sync(self.objects, self.simulation.interpolated_positions() if self.simulation else None)
+            self.index_frame = self.frame_index
+        return self.culler
+
+    def pick(self, camera, x, y):
+        index = self.spatial_index()
+        if index is None:
+            return None, None
+        origin, direction = pick_ray(camera, x, y)
+        return index.pick(origin, direction)
+
+    def objects_near(self, point, radius):
+        index = self.spatial_index()
+        return index.within(point, radius) if index is not None else []
+
+    def objects_in_box(self, lo, hi):
+        index = self.spatial_index()
+        return index.in_box(lo, hi) if index is not None else []
+
+    def nearest_objects(self, point, k=1):
+        index = self.spatial_index()
+        return index.nearest(point, k) if index is not None else []
 
     def buttons_clear(self):
         self.buttons.clear()
 
+    def read_asset(self, name):
+        with self.assets_lock:
+            if self.assets is None:
+                self.assets = zipfile.ZipFile(self.assets_path, "r")
+            return self.assets.read(name)
+
+    def assets_ready(self):
+        return all(btn.texture is None or btn.texture.state != "pending" for btn in self.buttons)
+
     def add_button(self, label, image_name, callback=None):
         btn = Button(0, 0, 0, 0, label, None, callback)
-        try:
-            image_data = self.assets.read(image_name)
-            print(f"Successfully loaded texture: {image_name} ({len(image_data)} bytes)")
-            btn.texture_id = btn._load_texture(image_data)
-        except KeyError:
-            print(f"Warning: {image_name} not found in assets.pack")
-        except Exception as e:
-            print(f"Error loading {image_name}: {e}")
+        btn.texture = self.textures.request(f"{self.assets_path}/{image_name}", lambda: self.read_asset(image_name))
         self.buttons.append(btn)
 
-    def draw_scene(self, window_width=None, window_height=None):
-        for obj in self.objects:
-            obj.draw(renderer=getattr(self, 'renderer', None))
+    def draw_scene(self, window_width=None, window_height=None, camera=None):
+        self.textures.update()
+        use_textures = getattr(camera, 'use_textures', True)
+        positions = self.simulation.interpolated_positions() if self.simulation else None
+        visible = None
+        self.frame_index += 1
+        if self.use_culling and self.culler is not None and camera is not None and self.objects:
+            visible = self.culler.visible(self.objects, frustum_planes(camera), positions)
+            self.index_frame = self.frame_index
+            self.visible_count = int(visible.sum())
+        else:
+            self.visible_count = len(self.objects)
+        details = None
+        if self.use_lod and self.lod is not None and camera is not None and self.objects:
+            details = self.lod.select(self.objects, camera, positions)
+        instanced = 0
+        if self.use_instancing and self.instancing.available():
+            indices = self.instancing.draw(self.objects, positions, visible, details)
+            instanced = self.instancing.draw_calls
+        elif visible is not None:
+            indices = visible.nonzero()[0].tolist()
+        else:
+            indices = range(len(self.objects))
+        self.render_queue.draw(self, indices, positions, details, camera, use_textures)
+        self.draw_calls = instanced + self.render_queue.draw_calls
+        self.state_changes = instanced + self.render_queue.state_changes
 
     def draw_buttons(self, window_width, window_height):
         btn_size = int(min(window_width, window_height) * 0.12)
@@ -248,7 +374,7 @@ class SceneRenderer:
             btn.y = margin
             btn.width = btn_size
             btn.height = btn_size
-            btn.draw()
+            btn.draw(textures=self.textures)
 
     def handle_click(self, x, y):
         for btn in self.buttons:
@@ -258,4 +384,8 @@ class SceneRenderer:
         return False
 
     def close(self):
-        self.assets.close()
+        self.instancing.release()
+        self.textures.release()
+        geometry_cache.release()
+        if self.assets is not None:
+            self.assets.close()
@@ -0,0 +1,220 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from itertools import chain
+from operator import itemgetter
+
+CACHE_SUFFIX = ".clec"
+CACHE_MAGIC = b"CLEC"
+CACHE_VERSION = 2
+HEADER = struct.Struct("<4sIIIIIQqq16s")
+NO_STRING = 0xFFFFFFFF
+HASH_CHUNK = 1 << 20
+
+def cache_path(source):
+    return source + CACHE_SUFFIX
+
+def source_stamp(source):
+    st = os.stat(source)
+    return st.st_mtime_ns, st.st_size
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+def file_digest(path):
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            hasher.update(chunk)
+    return hasher.digest()
+
+class SceneColumns:
+    stamp = (0, 0)
+    line_count = 0
+
+    @property
+    def count(self):
+        return len(self.lines)
+
+    def string(self, index):
+        return None if index == NO_STRING else self.strings[index]
+
+    def records(self, record_type):
+        strings, names = self.strings, self.names
+        positions, scales, colors = self.positions, self.scales, self.colors
+        for i in range(self.count):
+            j = i * 3
+            texture = self.textures[i]
+            yield record_type(names[i], strings[self.types[i]],
+                              (positions[j], positions[j + 1], positions[j + 2]),
+                              (scales[j], scales[j + 1], scales[j + 2]),
+                              (colors[j], colors[j + 1], colors[j + 2]),
+                              None if texture == NO_STRING else strings[texture],
+                              strings[self.materials[i]], self.emissive[i], self.lines[i])
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CacheWriter(SceneColumns):
+    def __init__(self):
+        self.names = []
+        self.positions = array('d')
+        self.scales = array('d')
+        self.colors = array('d')
+        self.emissive = array('d')
+        self.lines = array('I')
+        self.types = array('I')
+        self.textures = array('I')
+        self.materials = array('I')
+        self.strings = []
+        self.string_index = {}
+
+    def intern(self, text):
+        if text is None:
+            return NO_STRING
+        index = self.string_index.get(text)
+        if index is None:
+            index = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def intern_column(self, texts):
+        index = {text: self.intern(text) for text in dict.fromkeys(texts)}
+        return array('I', map(index.__getitem__, texts))
+
+    def extend(self, records):
+        if not records:
+            return
+        names, types, positions, scales, colors, textures, materials, emissive, lines = (list(map(itemgetter(i), records)) for i in range(9))
+        self.names += names
+        self.positions.fromlist(list(chain.from_iterable(positions)))
+        self.scales.fromlist(list(chain.from_iterable(scales)))
+        self.colors.fromlist(list(chain.from_iterable(colors)))
+        self.emissive.fromlist(emissive)
+        self.lines.fromlist(lines)
+        self.types += self.intern_column(types)
+        self.textures += self.intern_column(textures)
+        self.materials += self.intern_column(materials)
+
+    def merge(self, part):
+        self.names += part.names
+        self.positions += part.positions
+        self.scales += part.scales
+        self.colors += part.colors
+        self.emissive += part.emissive
+        self.lines += part.lines
+        remap = [self.intern(text) for text in part.strings]
+        for column, source in ((self.types, part.types), (self.textures, part.textures), (self.materials, part.materials)):
+            column.fromlist([NO_STRING if index == NO_STRING else remap[index] for index in source])
+
+    def write(self, path, stamp, digest, errors=()):
+        error_columns = [array('I') for _ in range(3)]
+        for error in errors:
+            error_columns[0].append(error.line)
+            error_columns[1].append(self.intern(error.message))
+            error_columns[2].append(self.intern(error.text))
+        names = "\n".join(self.names).encode('utf-8')
+        blobs = [text.encode('utf-8') for text in self.strings]
+        offsets = array('I', [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        header = HEADER.pack(CACHE_MAGIC, CACHE_VERSION, self.count, len(errors), len(blobs), self.line_count, len(names),
+                             stamp[0], stamp[1], digest)
+        temp = path + ".tmp"
+        with open(temp, 'wb') as f:
+            f.write(header)
+            for column in (self.positions, self.scales, self.colors, self.emissive, self.lines,
+                           self.types, self.textures, self.materials, *error_columns, offsets):
+                column.tofile(f)
+            f.write(b"".join(blobs))
+            f.write(names)
+        os.replace(temp, path)
+
+class SceneCache(SceneColumns):
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            view = memoryview(self.buffer)
+            self._views.append(view)
+            if len(view) < HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            magic, version, count, errors, strings, line_count, names, mtime_ns, size, digest = HEADER.unpack_from(view)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                raise ValueError(f"{path} is not a CLE cache (version {CACHE_VERSION})")
+            self.error_count = errors
+            self.line_count = line_count
+            self.stamp = (mtime_ns, size)
+            self.digest = digest
+            offset = HEADER.size
+            def column(fmt, length):
+                nonlocal offset
+                width = struct.calcsize(fmt)
+                if offset + width * length > len(view):
+                    raise ValueError(f"{path} is truncated")
+                part = view[offset:offset + width * length].cast(fmt)
+                self._views.append(part)
+                offset += width * length
+                return part
+            self.positions = column('d', count * 3)
+            self.scales = column('d', count * 3)
+            self.colors = column('d', count * 3)
+            self.emissive = column('d', count)
+            self.lines = column('I', count)
+            self.types, self.textures, self.materials = (column('I', count) for _ in range(3))
+            self.error_lines, self.error_messages, self.error_texts = (column('I', errors) for _ in range(3))
+            offsets = column('I', strings + 1)
+            if offset + offsets[strings] + names > len(view):
+                raise ValueError(f"{path} is truncated")
+            blob = bytes(view[offset:offset + offsets[strings]])
+            self.strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(strings)]
+            offset += offsets[strings]
+            self.names = str(view[offset:offset + names], 'utf-8').split("\n") if count else []
+        except Exception:
+            self.close()
+            raise
+
+    def errors(self, error_type):
+        return [error_type(self.error_lines[i], self.strings[self.error_messages[i]], self.strings[self.error_texts[i]])
+                for i in range(self.error_count)]
+
+    def close(self):
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+def open_cache(source):
+    path = cache_path(source)
+    if not os.path.exists(path):
+        return None
+    try:
+        cache = SceneCache(path)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring scene cache {path}: {e}")
+        return None
+    stamp = source_stamp(source)
+    if cache.stamp == stamp:
+        return cache
+    if cache.stamp[1] == stamp[1] and cache.digest == file_digest(source):
+        cache.close()
+        try:
+            with open(path, 'r+b') as f:
+                f.seek(HEADER.size - 32)
+                f.write(struct.pack("<qq", *stamp))
+        except OSError:
+            pass
+        return SceneCache(path)
+    cache.close()
+    return None
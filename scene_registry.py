@@ -0,0 +1,77 @@
+class SceneRegistry:
+    def __init__(self):
+        self.by_name = {}
+        self.by_type = {}
+        self.by_material = {}
+        self.emissive = {}
+        self.keys = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, obj):
+        return obj in self.keys
+
+    def clear(self):
+        self.by_name.clear()
+        self.by_type.clear()
+        self.by_material.clear()
+        self.emissive.clear()
+        self.keys.clear()
+
+    def add(self, obj):
+        if obj in self.keys:
+            self.remove(obj)
+        obj_type, material = obj.type.lower(), obj.material
+        self.keys[obj] = (obj.name, obj_type, material)
+        self.by_name[obj.name] = obj
+        self.by_type.setdefault(obj_type, {})[obj] = None
+        self.by_material.setdefault(material, {})[obj] = None
+        if obj.emissive > 0:
+            self.emissive[obj] = None
+
+    def remove(self, obj):
+        keys = self.keys.pop(obj, None)
+        if keys is None:
+            return
+        name, obj_type, material = keys
+        if self.by_name.get(name) is obj:
+            del self.by_name[name]
+        _discard(self.by_type, obj_type, obj)
+        _discard(self.by_material, material, obj)
+        self.emissive.pop(obj, None)
+
+    def update(self, obj):
+        self.add(obj)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def of_type(self, obj_type):
+        return list(self.by_type.get(obj_type.lower(), ()))
+
+    def with_material(self, material):
+        return list(self.by_material.get(material, ()))
+
+    def find(self, obj_type=None, material=None, emissive=None):
+        groups = []
+        if obj_type is not None:
+            groups.append(self.by_type.get(obj_type.lower(), {}))
+        if material is not None:
+            groups.append(self.by_material.get(material, {}))
+        if emissive:
+            groups.append(self.emissive)
+        if not groups:
+            groups.append(self.keys)
+        groups.sort(key=len)
+        found = [obj for obj in groups[0] if all(obj in group for group in groups[1:])]
+        if emissive is not None and not emissive:
+            found = [obj for obj in found if obj not in self.emissive]
+        return found
+
+def _discard(index, key, obj):
+    group = index.get(key)
+    if group is not None:
+        group.pop(obj, None)
+        if not group:
+            del index[key]
@@ -0,0 +1,255 @@
+import sys
+from array import array
+from itertools import chain
+
+NO_STRING = 0xFFFFFFFF
+
+class SceneStore:
+    def __init__(self):
+        self.names = []
+        self.positions = array('d')
+        self.velocities = array('d')
+        self.scales = array('d')
+        self.colors = array('d')
+        self.emissive = array('d')
+        self.types = array('I')
+        self.textures = array('I')
+        self.materials = array('I')
+        self.strings = []
+        self.string_index = {}
+        self.free = []
+
+    def __len__(self):
+        return len(self.names) - len(self.free)
+
+    def intern(self, text):
+        if text is None:
+            return NO_STRING
+        index = self.string_index.get(text)
+        if index is None:
+            index = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def string(self, index):
+        return None if index == NO_STRING else self.strings[index]
+
+    def allocate(self, name, obj_type, position, scale, color, texture, material, emissive):
+        if self.free:
+            row = self.free.pop()
+            self.names[row] = name
+            self.set_vector(self.positions, row, position)
+            self.set_vector(self.velocities, row, (0.0, 0.0, 0.0))
+            self.set_vector(self.scales, row, scale)
+            self.set_vector(self.colors, row, color)
+            self.emissive[row] = emissive
+            self.types[row] = self.intern(obj_type)
+            self.textures[row] = self.intern(texture)
+            self.materials[row] = self.intern(material)
+            return row
+        row = len(self.names)
+        self.names.append(name)
+        self.positions.extend(position)
+        self.velocities.extend((0.0, 0.0, 0.0))
+        self.scales.extend(scale)
+        self.colors.extend(color)
+        self.emissive.append(emissive)
+        self.types.append(self.intern(obj_type))
+        self.textures.append(self.intern(texture))
+        self.materials.append(self.intern(material))
+        return row
+
+    def extend(self, records):
+        records = list(records)
+        if self.free and not len(self):
+            self.clear()
+        start = len(self.names)
+        intern = self.intern
+        self.names.extend(record[0] for record in records)
+        self.positions.extend(chain.from_iterable(record[2] for record in records))
+        self.velocities.frombytes(bytes(len(records) * 24))
+        self.scales.extend(chain.from_iterable(record[3] for record in records))
+        self.colors.extend(chain.from_iterable(record[4] for record in records))
+        self.emissive.extend(record[7] for record in records)
+        self.types.extend(intern(record[1]) for record in records)
+        self.textures.extend(intern(record[5]) for record in records)
+        self.materials.extend(intern(record[6]) for record in records)
+        return range(start, len(self.names))
+
+    def extend_columns(self, columns):
+        if self.free and not len(self):
+            self.clear()
+        start = len(self.names)
+        self.names += columns.names
+        for column, source in ((self.positions, columns.positions), (self.scales, columns.scales),
+                               (self.colors, columns.colors), (self.emissive, columns.emissive)):
+            with memoryview(source) as view, view.cast('B') as raw:
+                column.frombytes(raw)
+        self.velocities.frombytes(bytes(columns.count * 24))
+        for column, source in ((self.types, columns.types), (self.textures, columns.textures), (self.materials, columns.materials)):
+            index = {i: self.intern(columns.string(i)) for i in set(source)}
+            column.fromlist(list(map(index.__getitem__, source)))
+        return range(start, len(self.names))
+
+    def release(self, row):
+        self.names[row] = None
+        self.free.append(row)
+
+    def clear(self):
+        self.names = []
+        for column in (self.positions, self.velocities, self.scales, self.colors, self.emissive, self.types, self.textures, self.materials):
+            del column[:]
+        self.strings = []
+        self.string_index = {}
+        self.free = []
+
+    def vector(self, column, row):
+        j = row * 3
+        return (column[j], column[j + 1], column[j + 2])
+
+    def set_vector(self, column, row, value):
+        j = row * 3
+        column[j], column[j + 1], column[j + 2] = value
+
+    def memory(self):
+        columns = (self.positions, self.velocities, self.scales, self.colors, self.emissive, self.types, self.textures, self.materials)
+        total = sum(column.buffer_info()[1] * column.itemsize for column in columns)
+        total += sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names if name is not None)
+        return total + sum(sys.getsizeof(text) for text in self.strings)
+
+default_store = SceneStore()
+
+class ObjectHandle:
+    __slots__ = ("store", "row", "body", "slot", "physics", "sleeping", "rest_steps", "texture_id")
+
+    def __init__(self, name, obj_type, position, scale, color=(1.0, 1.0, 1.0), texture=None, material="default", emissive=0.0, store=None):
+        self.body = None
+        self.slot = None
+        self.physics = None
+        self.sleeping = False
+        self.rest_steps = 0
+        self.texture_id = None
+        self.store = default_store if store is None else store
+        self.row = self.store.allocate(name, obj_type, position, scale, color, texture, material, emissive)
+
+    @classmethod
+    def from_rows(cls, rows, store=None):
+        store = default_store if store is None else store
+        names = store.names
+        objects = {}
+        for row in rows:
+            obj = cls.__new__(cls)
+            obj.store = store
+            obj.row = row
+            obj.body = None
+            obj.slot = None
+            obj.physics = None
+            obj.sleeping = False
+            obj.rest_steps = 0
+            obj.texture_id = None
+            previous = objects.get(names[row])
+            if previous is not None:
+                previous.release()
+            objects[names[row]] = obj
+        return objects
+
+    @classmethod
+    def from_records(cls, records, store=None):
+        store = default_store if store is None else store
+        return cls.from_rows(store.extend(records), store)
+
+    @classmethod
+    def from_columns(cls, columns, store=None):
+        store = default_store if store is None else store
+        return cls.from_rows(store.extend_columns(columns), store)
+
+    def release(self):
+        if self.row is not None:
+            self.store.release(self.row)
+            self.row = None
+
+    @property
+    def name(self):
+        return self.store.names[self.row]
+
+    @name.setter
+    def name(self, value):
+        self.store.names[self.row] = value
+
+    @property
+    def type(self):
+        return self.store.strings[self.store.types[self.row]]
+
+    @type.setter
+    def type(self, value):
+        self.store.types[self.row] = self.store.intern(value)
+
+    @property
+    def texture(self):
+        return self.store.string(self.store.textures[self.row])
+
+    @texture.setter
+    def texture(self, value):
+        self.store.textures[self.row] = self.store.intern(value)
+
+    @property
+    def material(self):
+        return self.store.string(self.store.materials[self.row])
+
+    @material.setter
+    def material(self, value):
+        self.store.materials[self.row] = self.store.intern(value)
+
+    @property
+    def scale(self):
+        return self.store.vector(self.store.scales, self.row)
+
+    @scale.setter
+    def scale(self, value):
+        self.store.set_vector(self.store.scales, self.row, value)
+
+    @property
+    def color(self):
+        return self.store.vector(self.store.colors, self.row)
+
+    @color.setter
+    def color(self, value):
+        self.store.set_vector(self.store.colors, self.row, value)
+
+    @property
+    def emissive(self):
+        return self.store.emissive[self.row]
+
+    @emissive.setter
+    def emissive(self, value):
+        self.store.emissive[self.row] = value
+
+    @property
+    def position(self):
+        if self.body is None:
+            return self.store.vector(self.store.positions, self.row)
+        return self.body.position_of(self.slot)
+
+    @position.setter
+    def position(self, value):
+        if self.body is None:
+            self.store.set_vector(self.store.positions, self.row, value)
+        else:
+            self.body.set_position(self.slot, value)
+        if self.sleeping:
+            self.physics.wake(self)
+
+    @property
+    def velocity(self):
+        if self.body is None:
+            return self.store.vector(self.store.velocities, self.row)
+        return self.body.velocity_of(self.slot)
+
+    @velocity.setter
+    def velocity(self, value):
+        if self.body is None:
+            self.store.set_vector(self.store.velocities, self.row, value)
+        else:
+            self.body.set_velocity(self.slot, value)
+        if self.sleeping:
+            self.physics.wake(self)
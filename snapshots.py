@@ -0,0 +1,235 @@
+from bisect import bisect_right
+from collections import deque
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SNAPSHOT_INTERVAL = 4
+KEYFRAME_EVERY = 64
+HISTORY_BYTES = 64 * 1024 * 1024
+POSITION_QUANTUM = 1 / 256
+VELOCITY_QUANTUM = 1 / 16
+DELTA_LIMIT = 32767
+
+class SnapshotHistory:
+    def __init__(self, physics, interval=SNAPSHOT_INTERVAL, budget_bytes=HISTORY_BYTES, keyframe_every=KEYFRAME_EVERY,
+                 position_quantum=POSITION_QUANTUM, velocity_quantum=VELOCITY_QUANTUM):
+        self.physics = physics
+        self.interval = interval
+        self.keyframe_every = keyframe_every
+        self.position_quantum = position_quantum
+        self.velocity_quantum = velocity_quantum
+        self.arena = np.empty(budget_bytes, dtype=np.uint8)
+        self.frames = deque()
+        self.head = 0
+        self.layout = None
+        self.objects = ()
+        self.initial = None
+        self.initial_tick = 0
+        self.positions = None
+        self.velocities = None
+        self.since_key = 0
+        self.cursor = None
+        self.captures = 0
+        self.skipped = 0
+        physics.history = self
+
+    @property
+    def memory(self):
+        if not self.frames:
+            return 0
+        start, end = self.frames[0][1], self.head
+        return end - start if end > start else self.arena.size - start + end
+
+    @property
+    def oldest_tick(self):
+        return self.frames[0][0] if self.frames else self.initial_tick
+
+    @property
+    def newest_tick(self):
+        return self.frames[-1][0] if self.frames else self.initial_tick
+
+    def authored(self):
+        if self.initial is None:
+            return {}
+        positions, velocities = self.initial
+        return {obj: (positions[:, i], velocities[:, i]) for i, obj in enumerate(self.objects)}
+
+    def reset(self, authored=None):
+        self._seed(authored)
+        self.initial_tick = self.physics.tick
+        self.frames.clear()
+        self.head = 0
+        self.since_key = self.keyframe_every
+        self.cursor = None
+
+    def relayout(self):
+        self._seed(self.authored())
+
+    def _seed(self, authored):
+        positions, velocities = self.physics.read_state()
+        self.layout = self.physics.layout
+        self.objects = tuple(self.physics.objects)
+        self.initial = (positions.copy(), velocities.copy())
+        if authored:
+            for i, obj in enumerate(self.objects):
+                state = authored.get(obj)
+                if state is not None:
+                    self.initial[0][:, i], self.initial[1][:, i] = state
+        self.positions = positions
+        self.velocities = velocities
+
+    def stepping(self):
+        if self.initial is not None and self.physics.layout != self.layout:
+            self.relayout()
+
+    def stepped(self, tick):
+        if tick % self.interval == 0:
+            self.capture()
+
+    def capture(self):
+        if self.initial is None:
+            self.reset()
+            return
+        if self.physics.layout != self.layout:
+            self.relayout()
+        if self.cursor is not None:
+            self._truncate(self.cursor)
+        positions, velocities = self.physics.read_state()
+        tick = self.physics.tick
+        if self.since_key < self.keyframe_every and self.frames and self.frames[-1][4] is self.objects:
+            qp = np.rint((positions - self.positions) / self.position_quantum)
+            qv = np.rint((velocities - self.velocities) / self.velocity_quantum)
+            changed = np.flatnonzero(qp.any(axis=0) | qv.any(axis=0))
+            qp, qv = qp[:, changed], qv[:, changed]
+            if max(np.abs(qp).max(initial=0), np.abs(qv).max(initial=0)) <= DELTA_LIMIT:
+                if self._write_delta(tick, changed, qp, qv):
+                    return
+        self._write_keyframe(tick, positions, velocities)
+
+    def _write_keyframe(self, tick, positions, velocities):
+        n = positions.shape[1]
+        offset = self._allocate(n * 24)
+        if offset is None:
+            return
+        block = self.arena[offset:offset + n * 24].view(np.float32).reshape(2, 3, n)
+        block[0] = positions
+        block[1] = velocities
+        self.positions = block[0].astype(np.float64)
+        self.velocities = block[1].astype(np.float64)
+        self.frames.append((tick, offset, n, True, self.objects))
+        self.since_key = 0
+        self.captures += 1
+
+    def _write_delta(self, tick, changed, qp, qv):
+        m = len(changed)
+        offset = self._allocate(m * 16)
+        if offset is None:
+            return True
+        if not self.frames:
+            self.head = offset
+            return False
+        self.arena[offset:offset + m * 4].view(np.int32)[:] = changed
+        block = self.arena[offset + m * 4:offset + m * 16].view(np.int16).reshape(2, 3, m)
+        block[0] = qp
+        block[1] = qv
+        self._apply_delta(self.positions, self.velocities, changed, block)
+        self.frames.append((tick, offset, m, False, self.objects))
+        self.since_key += 1
+        self.captures += 1
+        return True
+
+    def _apply_delta(self, positions, velocities, changed, block):
+        positions[:, changed] += block[0] * self.position_quantum
+        velocities[:, changed] += block[1] * self.velocity_quantum
+
+    def _allocate(self, size):
+        frames = self.frames
+        if size > self.arena.size:
+            self.skipped += 1
+            return None
+        if self.head + size > self.arena.size:
+            while frames and frames[0][1] >= self.head:
+                frames.popleft()
+            self.head = 0
+        while frames and self.head <= frames[0][1] < self.head + size:
+            frames.popleft()
+        while frames and not frames[0][3]:
+            frames.popleft()
+        offset = self.head
+        self.head += size
+        return offset
+
+    def _truncate(self, tick):
+        self.cursor = None
+        frames = self.frames
+        while frames and frames[-1][0] > tick:
+            frames.pop()
+        if not frames:
+            self.head = 0
+            self.since_key = self.keyframe_every
+            return
+        tick, offset, count, key, _ = frames[-1]
+        self.head = offset + (count * 24 if key else count * 16)
+        self.since_key = 0
+        for i in range(len(frames) - 1, -1, -1):
+            if frames[i][3]:
+                break
+            self.since_key += 1
+
+    def _decode(self, index):
+        key = index
+        while not self.frames[key][3]:
+            key -= 1
+        tick, offset, n, _, objects = self.frames[key]
+        block = self.arena[offset:offset + n * 24].view(np.float32).reshape(2, 3, n)
+        positions = block[0].astype(np.float64)
+        velocities = block[1].astype(np.float64)
+        for i in range(key + 1, index + 1):
+            tick, offset, m, _, _ = self.frames[i]
+            changed = self.arena[offset:offset + m * 4].view(np.int32)
+            self._apply_delta(positions, velocities, changed, self.arena[offset + m * 4:offset + m * 16].view(np.int16).reshape(2, 3, m))
+        if objects is not self.objects:
+            positions, velocities = self._remap(objects, positions, velocities)
+        return tick, positions, velocities
+
+    def _remap(self, objects, positions, velocities):
+        columns = {obj: i for i, obj in enumerate(self.objects)}
+        pairs = [(i, columns[obj]) for i, obj in enumerate(objects) if obj in columns]
+        source = np.array([i for i, _ in pairs], dtype=np.int64)
+        target = np.array([j for _, j in pairs], dtype=np.int64)
+        result = self.initial[0].copy(), self.initial[1].copy()
+        result[0][:, target] = positions[:, source]
+        result[1][:, target] = velocities[:, source]
+        return result
+
+    def restore(self, tick=None):
+        if self.initial is None:
+            return None
+        if self.physics.layout != self.layout:
+            self.relayout()
+        index = -1 if tick is None else bisect_right(self.frames, (tick, float("inf"))) - 1
+        if tick is not None and tick > self.initial_tick and index < 0 and self.frames:
+            index = 0
+        if index < 0:
+            tick, positions, velocities = self.initial_tick, self.initial[0].copy(), self.initial[1].copy()
+        else:
+            tick, positions, velocities = self._decode(index)
+        self.physics.write_state(positions, velocities)
+        self.physics.tick = tick
+        self.positions = positions
+        self.velocities = velocities
+        self.cursor = tick
+        return tick
+
+    def rewind(self, steps):
+        return self.restore(max(self.physics.tick - steps, self.initial_tick))
+
+    def fast_forward(self, steps):
+        return self.restore(self.physics.tick + steps)
+
+def create_history(physics, **options):
+    if np is None:
+        return None
+    return SnapshotHistory(physics, **options)
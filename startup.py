@@ -0,0 +1,26 @@
+import time
+
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+        self.reported = False
+
+    def mark(self, phase):
+        if phase not in self.marks:
+            self.marks[phase] = time.perf_counter()
+
+    def elapsed(self, phase):
+        return (self.marks[phase] - self.start) * 1000
+
+    def has(self, *phases):
+        return all(phase in self.marks for phase in phases)
+
+    def report(self):
+        self.reported = True
+        parts = []
+        previous = self.start
+        for phase, at in sorted(self.marks.items(), key=lambda item: item[1]):
+            parts.append(f"{phase} +{(at - previous) * 1000:.0f} ms")
+            previous = at
+        print(f"Startup: {', '.join(parts)} (total {(previous - self.start) * 1000:.0f} ms)")
@@ -0,0 +1,306 @@
+import json
+import math
+import os
+import queue
+import shutil
+import threading
+import time
+from array import array
+from cle_lang import CleParser, CleRecord, format_record
+from scene_cache import source_stamp
+
+CHUNK_SIZE = 2000.0
+STREAM_RADIUS = 6000.0
+UNLOAD_MARGIN = 1000.0
+STREAM_BUDGET_MS = 4.0
+REPLAN_FRACTION = 0.25
+INDEX_FLUSH_LINES = 100000
+CHUNKS_SUFFIX = ".chunks"
+MANIFEST_NAME = "manifest.json"
+SESSION_NAME = "session"
+MANIFEST_VERSION = 1
+
+def chunk_key(position, size=CHUNK_SIZE):
+    return math.floor(position[0] / size), math.floor(position[2] / size)
+
+def chunk_distance(key, x, z, size=CHUNK_SIZE):
+    x0, z0 = key[0] * size, key[1] * size
+    dx = max(x0 - x, 0.0, x - x0 - size)
+    dz = max(z0 - z, 0.0, z - z0 - size)
+    return math.hypot(dx, dz)
+
+def object_record(obj):
+    return CleRecord(obj.name, obj.type, tuple(map(float, obj.position)), obj.scale, obj.color,
+                     obj.texture, obj.material, obj.emissive, 0)
+
+class ChunkIndex:
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.directory = source + CHUNKS_SUFFIX
+        self.session = os.path.join(self.directory, SESSION_NAME)
+        self.counts = {}
+        self.errors = []
+        self.dirty = set()
+
+    def path(self, key, suffix=".cle"):
+        return os.path.join(self.directory, f"{key[0]}_{key[1]}{suffix}")
+
+    def session_path(self, key, suffix=".cle"):
+        return os.path.join(self.session, f"{key[0]}_{key[1]}{suffix}")
+
+    def clear_session(self):
+        if os.path.isdir(self.session):
+            shutil.rmtree(self.session)
+        self.dirty = set()
+
+    def open(self, progress=None):
+        manifest = self._read_manifest()
+        if (manifest is not None and manifest.get("version") == MANIFEST_VERSION
+                and manifest.get("source") == list(source_stamp(self.source))
+                and manifest.get("chunk_size") == self.chunk_size):
+            self.counts = {tuple(map(int, key.split("_"))): count for key, count in manifest["chunks"].items()}
+            return False
+        self.build(progress)
+        return True
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def manifest(self):
+        return {"version": MANIFEST_VERSION, "source": list(source_stamp(self.source)), "chunk_size": self.chunk_size,
+                "chunks": {f"{cx}_{cz}": count for (cx, cz), count in self.counts.items()}}
+
+    def save(self):
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(self.manifest(), f)
+        os.replace(path + ".tmp", path)
+
+    def build(self, progress=None):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        parser = CleParser(use_cache=False)
+        self.counts = {}
+        pending = {}
+        buffered = 0
+        for record in parser.iter_file(self.source, progress):
+            pending.setdefault(chunk_key(record.position, self.chunk_size), []).append(format_record(record))
+            buffered += 1
+            if buffered >= INDEX_FLUSH_LINES:
+                self._flush(pending)
+                buffered = 0
+        self._flush(pending)
+        self.errors = parser.errors
+        self.save()
+
+    def _flush(self, pending):
+        for key, lines in pending.items():
+            with open(self.path(key), 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            self.counts[key] = self.counts.get(key, 0) + len(lines)
+        pending.clear()
+
+    def read(self, key):
+        parser = CleParser(use_cache=False, workers=1)
+        path = self.session_path(key) if key in self.dirty else self.path(key)
+        if not os.path.exists(path):
+            return [], None, []
+        records = list(parser.iter_file(path))
+        velocities = array('d')
+        if key in self.dirty:
+            try:
+                with open(self.session_path(key, ".state"), 'rb') as f:
+                    velocities.frombytes(f.read())
+            except OSError:
+                pass
+        missing = len(records) * 3 - len(velocities)
+        if missing < 0:
+            velocities = None
+        elif missing:
+            velocities = array('d', bytes(missing * 8)) + velocities
+        return records, velocities, parser.errors
+
+    def write(self, key, records, velocities, append=False):
+        path = self.session_path(key)
+        state = self.session_path(key, ".state")
+        if key not in self.dirty:
+            os.makedirs(self.session, exist_ok=True)
+            if append and os.path.exists(self.path(key)):
+                shutil.copyfile(self.path(key), path)
+            self.dirty.add(key)
+        if not records:
+            if not append:
+                for target in (path, state):
+                    if os.path.exists(target):
+                        os.remove(target)
+            return
+        mode = 'a' if append else 'w'
+        with open(path, mode, encoding='utf-8') as f:
+            f.write("".join(format_record(record) + "\n" for record in records))
+        with open(state, mode + 'b') as f:
+            array('d', velocities).tofile(f)
+
+class Chunk:
+    def __init__(self, key):
+        self.key = key
+        self.state = "loading"
+        self.objects = []
+
+class WorldStreamer:
+    def __init__(self, create_object, radius=STREAM_RADIUS, chunk_size=CHUNK_SIZE, margin=UNLOAD_MARGIN, budget_ms=STREAM_BUDGET_MS):
+        self.create_object = create_object
+        self.radius = radius
+        self.chunk_size = chunk_size
+        self.margin = margin
+        self.budget_ms = budget_ms
+        self.index = None
+        self.counts = {}
+        self.chunks = {}
+        self.center = None
+        self.tasks = queue.SimpleQueue()
+        self.results = queue.SimpleQueue()
+        self.thread = None
+        self.errors = []
+        self.loads = 0
+        self.unloads = 0
+
+    @property
+    def active(self):
+        return self.index is not None
+
+    @property
+    def loaded(self):
+        return sum(1 for chunk in self.chunks.values() if chunk.state == "loaded")
+
+    @property
+    def pending(self):
+        return sum(1 for chunk in self.chunks.values() if chunk.state == "loading")
+
+    @property
+    def object_count(self):
+        return sum(len(chunk.objects) for chunk in self.chunks.values())
+
+    def open(self, source, progress=None):
+        self.close()
+        self.index = ChunkIndex(source, self.chunk_size)
+        start = time.perf_counter()
+        if self.index.open(progress):
+            print(f"Indexed {sum(self.index.counts.values())} objects into {len(self.index.counts)} chunks "
+                  f"in {time.perf_counter() - start:.2f} s")
+        self.index.clear_session()
+        self.errors = self.index.errors
+        self.counts = dict(self.index.counts)
+        self.chunks = {}
+        self.center = None
+        self.tasks = queue.SimpleQueue()
+        self.results = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="streaming", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        if self.index is None:
+            return []
+        removed = []
+        for chunk in list(self.chunks.values()):
+            self._unload(chunk, removed)
+        self.tasks.put(None)
+        self.thread.join()
+        self.thread = None
+        self.index.clear_session()
+        self.index = None
+        self.counts = {}
+        self.chunks = {}
+        return removed
+
+    def update(self, x, z):
+        removed = []
+        if self.index is None:
+            return [], removed
+        if self.center is None or math.hypot(x - self.center[0], z - self.center[1]) > self.chunk_size * REPLAN_FRACTION:
+            self.center = (x, z)
+            self._plan(x, z, removed)
+        return self._integrate(), removed
+
+    def _plan(self, x, z, removed):
+        size = self.chunk_size
+        reach = int(math.ceil(self.radius / size))
+        cx, cz = chunk_key((x, 0.0, z), size)
+        for key in [(cx + i, cz + j) for i in range(-reach, reach + 1) for j in range(-reach, reach + 1)]:
+            if key in self.counts and key not in self.chunks and chunk_distance(key, x, z, size) <= self.radius:
+                self.chunks[key] = Chunk(key)
+                self.tasks.put(("read", key))
+        limit = self.radius + self.margin
+        for chunk in [chunk for key, chunk in self.chunks.items()
+                      if chunk.state == "loaded" and chunk_distance(key, x, z, size) > limit]:
+            self._unload(chunk, removed)
+
+    def _unload(self, chunk, removed):
+        del self.chunks[chunk.key]
+        groups = {}
+        for obj in chunk.objects:
+            key = chunk_key(obj.position, self.chunk_size)
+            target = self.chunks.get(key)
+            if key != chunk.key and target is not None:
+                target.objects.append(obj)
+                continue
+            groups.setdefault(key, []).append(obj)
+            removed.append(obj)
+        if chunk.key not in groups:
+            groups[chunk.key] = []
+        counts = self.counts
+        for key, objects in groups.items():
+            records = [object_record(obj) for obj in objects]
+            velocities = [v for obj in objects for v in map(float, obj.velocity)]
+            append = key != chunk.key or chunk.state != "loaded"
+            counts[key] = (counts.get(key, 0) if append else 0) + len(records)
+            if not counts[key]:
+                del counts[key]
+            self.tasks.put(("write", key, records, velocities, append))
+        chunk.objects = []
+        self.unloads += 1
+
+    def _integrate(self):
+        added = []
+        start = time.perf_counter()
+        budget = self.budget_ms / 1000.0
+        while time.perf_counter() - start < budget:
+            try:
+                key, records, velocities, errors = self.results.get_nowait()
+            except queue.Empty:
+                break
+            chunk = self.chunks.get(key)
+            if chunk is None or chunk.state != "loading":
+                continue
+            for error in errors:
+                print(f"Warning: {self.index.path(key)}:{error.line}: {error.message}")
+            objects = [self.create_object(record) for record in records]
+            if velocities is not None:
+                for i, obj in enumerate(objects):
+                    obj.velocity = tuple(velocities[i * 3:i * 3 + 3])
+            chunk.objects.extend(objects)
+            chunk.state = "loaded"
+            added += objects
+            self.loads += 1
+        return added
+
+    def _run(self):
+        index = self.index
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            try:
+                if task[0] == "read":
+                    self.results.put((task[1], *index.read(task[1])))
+                else:
+                    index.write(*task[1:])
+            except OSError as e:
+                print(f"Warning: streaming {task[0]} failed: {e}")
+                if task[0] == "read":
+                    self.results.put((task[1], [], None, []))
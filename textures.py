@@ -0,0 +1,242 @@
+import io
+import os
+import queue
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from OpenGL.GL import *
+
+TEXTURE_WORKERS = 4
+UPLOAD_BUDGET_MS = 2.0
+GPU_BUDGET_BYTES = 256 * 1024 * 1024
+ATLAS_BUDGET_BYTES = 64 * 1024 * 1024
+ATLAS_SIZE = 1024
+ATLAS_MAX_IMAGE = 256
+ATLAS_PADDING = 1
+
+def decode_image(source):
+    from PIL import Image
+    data = source() if callable(source) else None
+    image = Image.open(io.BytesIO(data) if data is not None else source).convert("RGBA")
+    width, height = image.size
+    return width, height, image.tobytes("raw", "RGBA", 0, -1)
+
+class Texture:
+    def __init__(self, key, source):
+        self.key = key
+        self.source = source
+        self.state = "pending"
+        self.texture_id = None
+        self.atlas = None
+        self.uv = (0.0, 0.0, 1.0, 1.0)
+        self.width = 0
+        self.height = 0
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    @property
+    def size(self):
+        return self.width * self.height * 4
+
+    def coords(self, s, t):
+        u0, v0, u1, v1 = self.uv
+        return u0 + s * (u1 - u0), v0 + t * (v1 - v0)
+
+class AtlasPage:
+    def __init__(self, size=ATLAS_SIZE):
+        self.size = size
+        self.texture_id = glGenTextures(1)
+        self.shelf_y = 0
+        self.shelf_height = 0
+        self.cursor_x = 0
+        self.entries = 0
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, size, size, 0, GL_RGBA, GL_UNSIGNED_BYTE, bytes(size * size * 4))
+
+    @property
+    def bytes(self):
+        return self.size * self.size * 4
+
+    def place(self, width, height):
+        width += ATLAS_PADDING * 2
+        height += ATLAS_PADDING * 2
+        if self.cursor_x + width > self.size:
+            self.shelf_y += self.shelf_height
+            self.shelf_height = 0
+            self.cursor_x = 0
+        if self.cursor_x + width > self.size or self.shelf_y + height > self.size:
+            return None
+        x, y = self.cursor_x + ATLAS_PADDING, self.shelf_y + ATLAS_PADDING
+        self.cursor_x += width
+        self.shelf_height = max(self.shelf_height, height)
+        self.entries += 1
+        return x, y
+
+    def upload(self, texture, x, y, pixels):
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, texture.width, texture.height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        texture.texture_id = self.texture_id
+        texture.atlas = self
+        size = float(self.size)
+        texture.uv = (x / size, y / size, (x + texture.width) / size, (y + texture.height) / size)
+
+    def release(self):
+        glDeleteTextures([self.texture_id])
+
+class TextureManager:
+    def __init__(self, workers=TEXTURE_WORKERS, budget_ms=UPLOAD_BUDGET_MS, max_bytes=GPU_BUDGET_BYTES, atlas_bytes=ATLAS_BUDGET_BYTES):
+        self.budget_ms = budget_ms
+        self.max_bytes = max_bytes
+        self.max_atlas_bytes = atlas_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="texture")
+        self.decoded = queue.SimpleQueue()
+        self.textures = {}
+        self.resident = OrderedDict()
+        self.pages = []
+        self.atlas_bytes = 0
+        self.resident_bytes = 0
+        self.bound = None
+        self.uploads = 0
+        self.evictions = 0
+        self.binds = 0
+
+    @property
+    def gpu_bytes(self):
+        return self.atlas_bytes + self.resident_bytes
+
+    @property
+    def pending(self):
+        return sum(1 for texture in self.textures.values() if texture.state == "pending")
+
+    def request(self, key, source=None):
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = self.textures[key] = Texture(key, key if source is None else source)
+            self._decode(texture)
+        return texture
+
+    def load(self, path):
+        return self.request(os.path.abspath(path))
+
+    def _decode(self, texture):
+        texture.state = "pending"
+        future = self.executor.submit(decode_image, texture.source)
+        future.add_done_callback(lambda done: self.decoded.put((texture, done)))
+
+    def update(self, budget_ms=None):
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        start = time.perf_counter()
+        uploaded = 0
+        while uploaded == 0 or time.perf_counter() - start < budget:
+            try:
+                texture, done = self.decoded.get_nowait()
+            except queue.Empty:
+                break
+            if texture.state != "pending":
+                continue
+            try:
+                texture.width, texture.height, pixels = done.result()
+            except Exception as e:
+                texture.state = "failed"
+                print(f"Warning: Failed to load texture {texture.key}: {e}")
+                continue
+            self._upload(texture, pixels)
+            uploaded += 1
+        self.uploads += uploaded
+        self._evict()
+        self.bound = None
+        return uploaded
+
+    def _upload(self, texture, pixels):
+        if texture.width <= ATLAS_MAX_IMAGE and texture.height <= ATLAS_MAX_IMAGE:
+            for page in self.pages:
+                spot = page.place(texture.width, texture.height)
+                if spot is not None:
+                    page.upload(texture, *spot, pixels)
+                    texture.state = "ready"
+                    return
+            if self.atlas_bytes + ATLAS_SIZE * ATLAS_SIZE * 4 <= self.max_atlas_bytes:
+                page = AtlasPage()
+                self.pages.append(page)
+                self.atlas_bytes += page.bytes
+                page.upload(texture, *page.place(texture.width, texture.height), pixels)
+                texture.state = "ready"
+                return
+        texture.texture_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, texture.texture_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, texture.width, texture.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        texture.state = "ready"
+        self.resident[texture.key] = texture
+        self.resident_bytes += texture.size
+
+    def _evict(self):
+        while self.resident_bytes > self.max_bytes and self.resident:
+            _, texture = self.resident.popitem(last=False)
+            glDeleteTextures([texture.texture_id])
+            self.resident_bytes -= texture.size
+            texture.texture_id = None
+            texture.state = "evicted"
+            self.evictions += 1
+
+    def bind(self, texture):
+        if texture is None:
+            return False
+        if texture.state == "evicted":
+            self._decode(texture)
+        if texture.state != "ready":
+            return False
+        if texture.key in self.resident:
+            self.resident.move_to_end(texture.key)
+        if self.bound != texture.texture_id:
+            glBindTexture(GL_TEXTURE_2D, texture.texture_id)
+            self.bound = texture.texture_id
+            self.binds += 1
+        return True
+
+    def begin_object(self, texture, planar=False):
+        if not self.bind(texture):
+            return False
+        glEnable(GL_TEXTURE_2D)
+        glTexGeni(GL_S, GL_TEXTURE_GEN_MODE, GL_OBJECT_LINEAR)
+        glTexGeni(GL_T, GL_TEXTURE_GEN_MODE, GL_OBJECT_LINEAR)
+        glTexGenfv(GL_S, GL_OBJECT_PLANE, (1.0, 0.0, 0.0, 0.5))
+        glTexGenfv(GL_T, GL_OBJECT_PLANE, (0.0, 0.0, 1.0, 0.5) if planar else (0.0, 1.0, 0.0, 0.5))
+        glEnable(GL_TEXTURE_GEN_S)
+        glEnable(GL_TEXTURE_GEN_T)
+        u0, v0, u1, v1 = texture.uv
+        glMatrixMode(GL_TEXTURE)
+        glLoadIdentity()
+        glTranslatef(u0, v0, 0)
+        glScalef(u1 - u0, v1 - v0, 1)
+        glMatrixMode(GL_MODELVIEW)
+        return True
+
+    def end_object(self):
+        glMatrixMode(GL_TEXTURE)
+        glLoadIdentity()
+        glMatrixMode(GL_MODELVIEW)
+        glDisable(GL_TEXTURE_GEN_S)
+        glDisable(GL_TEXTURE_GEN_T)
+        glDisable(GL_TEXTURE_2D)
+
+    def release(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for texture in self.resident.values():
+            glDeleteTextures([texture.texture_id])
+        for page in self.pages:
+            page.release()
+        for texture in self.textures.values():
+            texture.texture_id = None
+            texture.state = "evicted"
+        self.resident.clear()
+        self.pages = []
+        self.textures.clear()
+        self.atlas_bytes = 0
+        self.resident_bytes = 0
+        self.bound = None